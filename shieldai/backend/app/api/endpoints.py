@@ -1,5 +1,4 @@
 from fastapi import APIRouter, Depends, HTTPException, BackgroundTasks, Query
-from fastapi_limiter.depends import RateLimiter
 from typing import List, Optional
 import logging
 
@@ -13,6 +12,7 @@ from app.schemas import (
 )
 from app.services.ai_engine import ShieldAIEngine
 from app.services.analytics import AnalyticsService
+from app.services.stats_snapshot import stats_snapshot
 from app.api.dependencies import get_ai_engine, get_analytics_service
 
 router = APIRouter()
@@ -22,8 +22,7 @@ logger = logging.getLogger(__name__)
     "/analyze",
     response_model=AnalyzeResponse,
     summary="Analyze text for toxicity",
-    description="Analyze text content for harmful language with African context awareness",
-    dependencies=[Depends(RateLimiter(times=settings.RATE_LIMIT_PER_MINUTE, minutes=1))]
+    description="Analyze text content for harmful language with African context awareness"
 )
 async def analyze_text(
     request: AnalyzeRequest,
@@ -58,8 +57,7 @@ async def analyze_text(
 @router.post(
     "/analyze/batch",
     summary="Batch analyze texts",
-    description="Analyze multiple texts in a single request for efficiency",
-    dependencies=[Depends(RateLimiter(times=10, minutes=1))]
+    description="Analyze multiple texts in a single request for efficiency"
 )
 async def analyze_batch(
     request: BatchAnalyzeRequest,
@@ -91,15 +89,15 @@ async def analyze_batch(
     summary="Get system statistics",
     description="Retrieve real-time statistics about the ShieldAI system"
 )
-async def get_statistics(
-    analytics: AnalyticsService = Depends(get_analytics_service)
-):
+async def get_statistics():
     """
     Get comprehensive system statistics and analytics.
     """
+    stats = stats_snapshot.data
+    if stats is None:
+        raise HTTPException(status_code=503, detail="Statistics unavailable")
     try:
-        stats = await analytics.get_system_stats()
-        return stats
+        return {**stats, "average_response_time": stats["avg_response_time"]}
     except Exception as e:
         logger.error(f"Stats retrieval failed: {str(e)}")
         raise HTTPException(status_code=500, detail="Statistics unavailable")
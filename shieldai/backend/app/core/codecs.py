@@ -0,0 +1,109 @@
+import json
+import logging
+import zlib
+from typing import Any, Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+# msgpack is optional - binary codecs fall back to tagged JSON without it
+try:
+    import msgpack
+    MSGPACK_AVAILABLE = True
+except ImportError:
+    msgpack = None
+    MSGPACK_AVAILABLE = False
+
+# First byte of every encoded value. Format in the low bits, compression flag on top.
+# All tags are control characters, so they never collide with legacy plain-text values.
+TAG_STR = 0x01
+TAG_JSON = 0x02
+TAG_MSGPACK = 0x03
+FLAG_ZLIB = 0x10
+_FORMAT_MASK = 0x0F
+
+class Codec:
+    """Encodes values with a type tag byte and optional compression above a size threshold"""
+
+    def __init__(self, name: str, binary: bool = False, compress: bool = False,
+                 compress_threshold: int = 512, compress_level: int = 1):
+        self.name = name
+        self.binary = binary and MSGPACK_AVAILABLE
+        self.compress = compress
+        self.compress_threshold = compress_threshold
+        self.compress_level = compress_level
+
+    def encode(self, value: Any) -> bytes:
+        if isinstance(value, str):
+            tag, payload = TAG_STR, value.encode("utf-8")
+        elif self.binary:
+            tag, payload = TAG_MSGPACK, msgpack.packb(value, use_bin_type=True)
+        else:
+            tag, payload = TAG_JSON, json.dumps(value, separators=(",", ":")).encode("utf-8")
+
+        if self.compress and len(payload) >= self.compress_threshold:
+            compressed = zlib.compress(payload, self.compress_level)
+            if len(compressed) < len(payload):
+                tag, payload = tag | FLAG_ZLIB, compressed
+
+        return bytes((tag,)) + payload
+
+    def decode(self, data: Any) -> Any:
+        if data is None:
+            return None
+        if isinstance(data, str):
+            data = data.encode("utf-8")
+        if not data:
+            return ""
+
+        tag = data[0]
+        fmt = tag & _FORMAT_MASK
+        if tag & ~(_FORMAT_MASK | FLAG_ZLIB) or fmt not in (TAG_STR, TAG_JSON, TAG_MSGPACK):
+            return decode_legacy(data)
+
+        payload = data[1:]
+        if tag & FLAG_ZLIB:
+            payload = zlib.decompress(payload)
+        if fmt == TAG_STR:
+            return payload.decode("utf-8")
+        if fmt == TAG_JSON:
+            return json.loads(payload)
+        if not MSGPACK_AVAILABLE:
+            raise ValueError(f"Value encoded with msgpack but msgpack is not installed ({self.name} codec)")
+        return msgpack.unpackb(payload, raw=False)
+
+def decode_legacy(data: bytes) -> Any:
+    """Values written before codecs existed: plain text or JSON"""
+    text = data.decode("utf-8")
+    try:
+        return json.loads(text)
+    except json.JSONDecodeError:
+        return text
+
+def parse_codec_config(spec: str, compress_threshold: int) -> Dict[str, Codec]:
+    """
+    Parse `namespace:format[+zlib]` pairs, e.g. "cache:msgpack+zlib,rules:json+zlib".
+    Namespaces not listed keep the legacy untagged text format.
+    """
+    codecs = {}
+    for entry in filter(None, (part.strip() for part in spec.split(","))):
+        try:
+            namespace, options = entry.split(":", 1)
+            parts = options.split("+")
+            if parts[0] not in ("json", "msgpack") or any(p != "zlib" for p in parts[1:]):
+                raise ValueError(options)
+        except ValueError:
+            logger.warning(f"Ignoring invalid Redis codec setting: {entry}")
+            continue
+        codecs[namespace] = Codec(
+            name=options,
+            binary=parts[0] == "msgpack",
+            compress="zlib" in parts[1:],
+            compress_threshold=compress_threshold
+        )
+    return codecs
+
+def namespace_of(key: str) -> str:
+    return key.split(":", 1)[0]
+
+def codec_for(codecs: Dict[str, Codec], key: str) -> Optional[Codec]:
+    return codecs.get(namespace_of(key)) if codecs else None
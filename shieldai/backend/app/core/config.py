@@ -1,18 +1,415 @@
 import os
 
 class Settings:
-    # Database URL for Docker
+    # Database URL (Render injects DATABASE_URL, Docker sets POSTGRES_*, local runs use SQLite)
     @property
     def DATABASE_URL(self):
-        return f"postgresql://{os.getenv('POSTGRES_USER')}:{os.getenv('POSTGRES_PASSWORD')}@db:5432/{os.getenv('POSTGRES_DB')}"
+        if os.getenv("DATABASE_URL"):
+            return os.getenv("DATABASE_URL")
+        if os.getenv("POSTGRES_DB"):
+            return f"postgresql://{os.getenv('POSTGRES_USER')}:{os.getenv('POSTGRES_PASSWORD')}@db:5432/{os.getenv('POSTGRES_DB')}"
+        return "sqlite:///./shieldai.db"
     
-    # Redis URL for Docker
+    # Async engine connection pool
+    @property
+    def DATABASE_POOL_SIZE(self):
+        return int(os.getenv("DATABASE_POOL_SIZE", "10"))
+    
+    @property
+    def DATABASE_MAX_OVERFLOW(self):
+        return int(os.getenv("DATABASE_MAX_OVERFLOW", "20"))
+    
+    @property
+    def DATABASE_POOL_TIMEOUT(self):
+        return float(os.getenv("DATABASE_POOL_TIMEOUT", "30"))
+    
+    @property
+    def DATABASE_POOL_RECYCLE(self):
+        return int(os.getenv("DATABASE_POOL_RECYCLE", "1800"))
+    
+    @property
+    def DATABASE_POOL_PRE_PING(self):
+        return os.getenv("DATABASE_POOL_PRE_PING", "true").lower() == "true"
+    
+    @property
+    def DATABASE_ECHO(self):
+        return os.getenv("DATABASE_ECHO", "false").lower() == "true"
+    
+    # SQLite connection pragmas
+    @property
+    def SQLITE_JOURNAL_MODE(self):
+        return os.getenv("SQLITE_JOURNAL_MODE", "WAL")
+    
+    @property
+    def SQLITE_SYNCHRONOUS(self):
+        return os.getenv("SQLITE_SYNCHRONOUS", "NORMAL")
+    
+    @property
+    def SQLITE_MMAP_SIZE(self):
+        return int(os.getenv("SQLITE_MMAP_SIZE", str(256 * 1024 * 1024)))
+    
+    @property
+    def SQLITE_BUSY_TIMEOUT_MS(self):
+        return int(os.getenv("SQLITE_BUSY_TIMEOUT_MS", "5000"))
+    
+    # Redis URL (Render injects REDIS_URL, Docker falls back to the redis service)
     @property
     def REDIS_URL(self):
-        return f"redis://:{os.getenv('REDIS_PASSWORD')}@redis:6379"
+        return os.getenv("REDIS_URL") or f"redis://:{os.getenv('REDIS_PASSWORD')}@redis:6379"
+    
+    # Comma-separated Redis URLs to shard keys across by consistent hashing; defaults to REDIS_URL
+    @property
+    def REDIS_NODES(self):
+        return [url.strip() for url in os.getenv("REDIS_NODES", "").split(",") if url.strip()] or [self.REDIS_URL]
     
     # Parse CORS origins
     @property
     def BACKEND_CORS_ORIGINS(self):
         origins = os.getenv("BACKEND_CORS_ORIGINS", "http://localhost:3000")
-        return [origin.strip() for origin in origins.split(",")]
\ No newline at end of file
+        return [origin.strip() for origin in origins.split(",")]
+    
+    # Keys requested per SCAN call when walking the keyspace
+    @property
+    def REDIS_SCAN_COUNT(self):
+        return int(os.getenv("REDIS_SCAN_COUNT", "1000"))
+    
+    # Coalesce commands issued in the same event-loop tick into one pipeline
+    @property
+    def REDIS_AUTO_PIPELINE(self):
+        return os.getenv("REDIS_AUTO_PIPELINE", "false").lower() in ("1", "true", "yes")
+    
+    @property
+    def REDIS_AUTO_PIPELINE_MAX_BATCH(self):
+        return int(os.getenv("REDIS_AUTO_PIPELINE_MAX_BATCH", "1000"))
+    
+    # Value codecs per key namespace: namespace:json|msgpack[+zlib]
+    @property
+    def REDIS_CODECS(self):
+        return os.getenv("REDIS_CODECS", "cache:msgpack+zlib,jobs:msgpack+zlib,rules:json+zlib")
+    
+    @property
+    def REDIS_COMPRESS_THRESHOLD(self):
+        return int(os.getenv("REDIS_COMPRESS_THRESHOLD", "512"))
+    
+    # Fail fast instead of waiting on a flapping connection
+    @property
+    def REDIS_SOCKET_TIMEOUT(self):
+        return float(os.getenv("REDIS_SOCKET_TIMEOUT", "2.0"))
+    
+    # Circuit breaker: consecutive failures before opening, seconds before a half-open probe
+    @property
+    def REDIS_BREAKER_FAILURE_THRESHOLD(self):
+        return int(os.getenv("REDIS_BREAKER_FAILURE_THRESHOLD", "5"))
+    
+    @property
+    def REDIS_BREAKER_RECOVERY_TIMEOUT(self):
+        return float(os.getenv("REDIS_BREAKER_RECOVERY_TIMEOUT", "10"))
+    
+    # Near cache: comma-separated key namespaces served from an in-process LRU
+    # kept coherent by Redis client tracking (or pub/sub invalidation). Empty disables.
+    @property
+    def REDIS_NEAR_CACHE_NAMESPACES(self):
+        return [ns.strip() for ns in os.getenv("REDIS_NEAR_CACHE_NAMESPACES", "").split(",") if ns.strip()]
+    
+    # "tracking" (falls back to pub/sub if unsupported) or "pubsub"
+    @property
+    def REDIS_NEAR_CACHE_MODE(self):
+        return os.getenv("REDIS_NEAR_CACHE_MODE", "tracking")
+    
+    @property
+    def REDIS_NEAR_CACHE_MAX_KEYS(self):
+        return int(os.getenv("REDIS_NEAR_CACHE_MAX_KEYS", "10000"))
+    
+    # Upper bound on entry age, covering expirations pub/sub mode is not told about
+    @property
+    def REDIS_NEAR_CACHE_MAX_AGE(self):
+        return float(os.getenv("REDIS_NEAR_CACHE_MAX_AGE", "300"))
+    
+    # In-memory backend used while the breaker is open
+    @property
+    def REDIS_FALLBACK_ENABLED(self):
+        return os.getenv("REDIS_FALLBACK_ENABLED", "true").lower() in ("1", "true", "yes")
+    
+    @property
+    def REDIS_FALLBACK_MAX_KEYS(self):
+        return int(os.getenv("REDIS_FALLBACK_MAX_KEYS", "100000"))
+    
+    # Writes journaled during an outage and replayed once Redis is back
+    @property
+    def REDIS_FALLBACK_JOURNAL_MAX(self):
+        return int(os.getenv("REDIS_FALLBACK_JOURNAL_MAX", "50000"))
+    
+    # Analytics writes are combined in memory and flushed every N ms or M events
+    @property
+    def ANALYTICS_FLUSH_INTERVAL_MS(self):
+        return int(os.getenv("ANALYTICS_FLUSH_INTERVAL_MS", "1000"))
+    
+    @property
+    def ANALYTICS_FLUSH_EVENTS(self):
+        return int(os.getenv("ANALYTICS_FLUSH_EVENTS", "1000"))
+    
+    # Secret for the stable keyed hash that anonymizes user IDs and texts in analytics.
+    # Required in production; elsewhere a generated key is shared through Redis.
+    @property
+    def ANALYTICS_HASH_KEY(self):
+        return os.getenv("ANALYTICS_HASH_KEY", "")
+    
+    # Daily unique-user / unique-text HyperLogLogs
+    @property
+    def ANALYTICS_HLL_RETENTION_DAYS(self):
+        return int(os.getenv("ANALYTICS_HLL_RETENTION_DAYS", "90"))
+    
+    # Retention of the minute / hourly / daily analytics rollups (applied as TTLs on write)
+    @property
+    def ANALYTICS_MINUTE_RETENTION_HOURS(self):
+        return int(os.getenv("ANALYTICS_MINUTE_RETENTION_HOURS", "48"))
+    
+    @property
+    def ANALYTICS_HOURLY_RETENTION_DAYS(self):
+        return int(os.getenv("ANALYTICS_HOURLY_RETENTION_DAYS", "35"))
+    
+    @property
+    def ANALYTICS_DAILY_RETENTION_DAYS(self):
+        return int(os.getenv("ANALYTICS_DAILY_RETENTION_DAYS", "400"))
+    
+    # Trending items: Top-K sketch size per series and per-minute sorted sets in Redis
+    @property
+    def TRENDING_CAPACITY(self):
+        return int(os.getenv("TRENDING_CAPACITY", "100"))
+    
+    @property
+    def TRENDING_SKETCH_WIDTH(self):
+        return int(os.getenv("TRENDING_SKETCH_WIDTH", "2048"))
+    
+    @property
+    def TRENDING_SKETCH_DEPTH(self):
+        return int(os.getenv("TRENDING_SKETCH_DEPTH", "4"))
+    
+    @property
+    def TRENDING_RETENTION_MINUTES(self):
+        return int(os.getenv("TRENDING_RETENTION_MINUTES", "120"))
+    
+    @property
+    def TRENDING_KEEP_PER_MINUTE(self):
+        return int(os.getenv("TRENDING_KEEP_PER_MINUTE", "500"))
+    
+    # Seconds between background rebuilds of the /stats snapshot
+    @property
+    def STATS_SNAPSHOT_INTERVAL(self):
+        return float(os.getenv("STATS_SNAPSHOT_INTERVAL", "5"))
+    
+    # Per-minute latency histograms kept in Redis for rolling-window percentiles
+    @property
+    def LATENCY_RETENTION_MINUTES(self):
+        return int(os.getenv("LATENCY_RETENTION_MINUTES", "1440"))
+    
+    # Two-tier cache: Redis entries live TTL + stale window; L1 copies at most CACHE_L1_TTL
+    @property
+    def CACHE_DEFAULT_TTL(self):
+        return int(os.getenv("CACHE_DEFAULT_TTL", "300"))
+    
+    @property
+    def CACHE_STALE_TTL(self):
+        return int(os.getenv("CACHE_STALE_TTL", "60"))
+    
+    @property
+    def CACHE_NEGATIVE_TTL(self):
+        return int(os.getenv("CACHE_NEGATIVE_TTL", "30"))
+    
+    @property
+    def CACHE_L1_TTL(self):
+        return float(os.getenv("CACHE_L1_TTL", "5"))
+    
+    @property
+    def CACHE_L1_MAX_KEYS(self):
+        return int(os.getenv("CACHE_L1_MAX_KEYS", "5000"))
+    
+    # Lifetime of a cache tag's key set after its last addition
+    @property
+    def CACHE_TAG_TTL(self):
+        return int(os.getenv("CACHE_TAG_TTL", "86400"))
+    
+    # Hot-key snapshots for warm starts (file path, or Redis when empty) and warm-up budget
+    @property
+    def CACHE_SNAPSHOT_INTERVAL(self):
+        return float(os.getenv("CACHE_SNAPSHOT_INTERVAL", "60"))
+    
+    @property
+    def CACHE_SNAPSHOT_MAX_KEYS(self):
+        return int(os.getenv("CACHE_SNAPSHOT_MAX_KEYS", "1000"))
+    
+    @property
+    def CACHE_SNAPSHOT_PATH(self):
+        return os.getenv("CACHE_SNAPSHOT_PATH", "")
+    
+    @property
+    def CACHE_WARM_MAX_SECONDS(self):
+        return float(os.getenv("CACHE_WARM_MAX_SECONDS", "10"))
+    
+    @property
+    def CACHE_WARM_MAX_MB(self):
+        return int(os.getenv("CACHE_WARM_MAX_MB", "50"))
+    
+    # Cached analysis verdicts (0 disables)
+    @property
+    def VERDICT_CACHE_TTL(self):
+        return int(os.getenv("VERDICT_CACHE_TTL", "3600"))
+    
+    # Static catalogs (resources, languages, cultural context)
+    @property
+    def CATALOG_DATA_DIR(self):
+        default_dir = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "data")
+        return os.getenv("CATALOG_DATA_DIR", default_dir)
+    
+    @property
+    def CATALOG_MAX_AGE(self):
+        return int(os.getenv("CATALOG_MAX_AGE", "3600"))
+    
+    @property
+    def CATALOG_RELOAD_INTERVAL(self):
+        return float(os.getenv("CATALOG_RELOAD_INTERVAL", "5"))
+    
+    # Write-behind persistence of analysis results (to DATABASE_URL)
+    @property
+    def RESULTS_PERSISTENCE_ENABLED(self):
+        return os.getenv("RESULTS_PERSISTENCE_ENABLED", "true").lower() == "true"
+    
+    @property
+    def RESULTS_QUEUE_SIZE(self):
+        return int(os.getenv("RESULTS_QUEUE_SIZE", "10000"))
+    
+    @property
+    def RESULTS_BATCH_SIZE(self):
+        return int(os.getenv("RESULTS_BATCH_SIZE", "500"))
+    
+    @property
+    def RESULTS_FLUSH_INTERVAL_MS(self):
+        return int(os.getenv("RESULTS_FLUSH_INTERVAL_MS", "200"))
+    
+    @property
+    def RESULTS_ENQUEUE_TIMEOUT_MS(self):
+        return int(os.getenv("RESULTS_ENQUEUE_TIMEOUT_MS", "50"))
+    
+    # Client rule bundle for on-device prescreening
+    @property
+    def RULE_BUNDLE_HISTORY(self):
+        return int(os.getenv("RULE_BUNDLE_HISTORY", "10"))
+    
+    @property
+    def RULE_BUNDLE_MIN_SCORE(self):
+        return float(os.getenv("RULE_BUNDLE_MIN_SCORE", "0.9"))
+    
+    @property
+    def RULE_BUNDLE_MAX_AGE(self):
+        return int(os.getenv("RULE_BUNDLE_MAX_AGE", "300"))
+    
+    # Rate-limit middleware for the analysis routes
+    @property
+    def RATE_LIMIT_ENABLED(self):
+        return os.getenv("RATE_LIMIT_ENABLED", "true").lower() in ("1", "true", "yes")
+    
+    # Batch routes cost one unit per this many request body bytes; bodies are also capped
+    # at what RATE_LIMIT_PER_MINUTE units pay for (a BATCH_MAX_BYTES batch costs 32 by default)
+    @property
+    def RATE_LIMIT_BYTES_PER_UNIT(self):
+        return int(os.getenv("RATE_LIMIT_BYTES_PER_UNIT", "8192"))
+    
+    # API keys that get their own rate-limit bucket and job tenant (comma-separated);
+    # requests without a listed key are limited by client IP
+    @property
+    def API_KEYS(self):
+        return [key.strip() for key in os.getenv("API_KEYS", "").split(",") if key.strip()]
+    
+    # Largest /analyze/batch request, by text count and body size
+    @property
+    def BATCH_MAX_TEXTS(self):
+        return int(os.getenv("BATCH_MAX_TEXTS", "500"))
+    
+    @property
+    def BATCH_MAX_BYTES(self):
+        return int(os.getenv("BATCH_MAX_BYTES", str(256 * 1024)))
+    
+    # API rate limits per client (GCRA, checked atomically in Redis)
+    @property
+    def RATE_LIMIT_PER_MINUTE(self):
+        return int(os.getenv("RATE_LIMIT_PER_MINUTE", "60"))
+    
+    @property
+    def RATE_LIMIT_PER_HOUR(self):
+        return int(os.getenv("RATE_LIMIT_PER_HOUR", "1000"))
+    
+    # Local token leases: a worker may hold at most this fraction of each limit
+    # (0 checks Redis on every request). Bounds early rejections to workers x fraction x limit.
+    @property
+    def RATE_LIMIT_LOCAL_ACCURACY(self):
+        return float(os.getenv("RATE_LIMIT_LOCAL_ACCURACY", "0.05"))
+    
+    # Unused leased tokens go back to Redis after this many seconds
+    @property
+    def RATE_LIMIT_LEASE_TTL(self):
+        return float(os.getenv("RATE_LIMIT_LEASE_TTL", "2"))
+    
+    @property
+    def RATE_LIMIT_LOCAL_MAX_KEYS(self):
+        return int(os.getenv("RATE_LIMIT_LOCAL_MAX_KEYS", "10000"))
+    
+    # Asynchronous batch jobs
+    @property
+    def JOBS_WORKERS(self):
+        return int(os.getenv("JOBS_WORKERS", "2"))
+    
+    @property
+    def JOBS_CHUNK_SIZE(self):
+        return int(os.getenv("JOBS_CHUNK_SIZE", "500"))
+    
+    @property
+    def JOBS_MAX_TEXTS(self):
+        return int(os.getenv("JOBS_MAX_TEXTS", "100000"))
+    
+    # Running jobs per tenant in each app worker process
+    @property
+    def JOBS_MAX_CONCURRENT_PER_TENANT(self):
+        return int(os.getenv("JOBS_MAX_CONCURRENT_PER_TENANT", "1"))
+    
+    @property
+    def JOBS_MAX_UNFINISHED_PER_TENANT(self):
+        return int(os.getenv("JOBS_MAX_UNFINISHED_PER_TENANT", "5"))
+    
+    @property
+    def JOBS_LEASE_TTL(self):
+        return int(os.getenv("JOBS_LEASE_TTL", "60"))
+    
+    @property
+    def JOBS_RESULT_TTL(self):
+        return int(os.getenv("JOBS_RESULT_TTL", str(24 * 3600)))
+    
+    @property
+    def JOBS_SQLITE_PATH(self):
+        return os.getenv("JOBS_SQLITE_PATH", "./shieldai_jobs.db")
+    
+    # Conversation-level scoring
+    @property
+    def THREAD_STATE_TTL(self):
+        return int(os.getenv("THREAD_STATE_TTL", str(24 * 3600)))
+    
+    @property
+    def THREAD_HALF_LIFE(self):
+        return float(os.getenv("THREAD_HALF_LIFE", "600"))
+    
+    @property
+    def THREAD_FINGERPRINTS(self):
+        return int(os.getenv("THREAD_FINGERPRINTS", "20"))
+    
+    @property
+    def THREAD_ESCALATION_SCORE(self):
+        return float(os.getenv("THREAD_ESCALATION_SCORE", "1.5"))
+    
+    @property
+    def THREAD_ESCALATION_MESSAGES(self):
+        return int(os.getenv("THREAD_ESCALATION_MESSAGES", "3"))
+    
+    @property
+    def THREAD_LOCAL_MAX(self):
+        return int(os.getenv("THREAD_LOCAL_MAX", "10000"))
+
+settings = Settings()
@@ -0,0 +1,82 @@
+import math
+from typing import Dict, Iterable, Mapping, Optional
+
+# Smallest distinguishable duration and relative bucket width (2% error at any scale)
+MIN_VALUE = 1e-6
+PRECISION = 0.02
+_LOG_BASE = math.log1p(PRECISION)
+
+QUANTILES = (("p50", 0.5), ("p90", 0.9), ("p99", 0.99), ("p999", 0.999))
+
+def bucket_of(seconds: float) -> int:
+    if seconds <= MIN_VALUE:
+        return 0
+    return int(math.log(seconds / MIN_VALUE) / _LOG_BASE)
+
+def bucket_value(index: int) -> float:
+    """Representative (geometric middle) value of a bucket"""
+    return MIN_VALUE * (1 + PRECISION) ** (index + 0.5)
+
+class LogHistogram:
+    """
+    HDR-style histogram of durations with logarithmic buckets. Quantiles carry at most
+    PRECISION relative error, memory is bounded by the value range (about 1,100 buckets
+    from 1us to an hour), and histograms merge by adding bucket counts - which is how
+    workers combine theirs in Redis (HINCRBY per bucket field).
+    """
+
+    __slots__ = ("counts", "count", "total")
+
+    def __init__(self):
+        self.counts: Dict[int, int] = {}
+        self.count = 0
+        self.total = 0.0
+
+    def record(self, seconds: float, n: int = 1):
+        index = bucket_of(seconds)
+        self.counts[index] = self.counts.get(index, 0) + n
+        self.count += n
+        self.total += seconds * n
+
+    def merge(self, other: "LogHistogram"):
+        for index, n in other.counts.items():
+            self.counts[index] = self.counts.get(index, 0) + n
+        self.count += other.count
+        self.total += other.total
+
+    def quantile(self, q: float) -> Optional[float]:
+        if not self.count:
+            return None
+        rank = max(1, math.ceil(q * self.count))
+        seen = 0
+        for index in sorted(self.counts):
+            seen += self.counts[index]
+            if seen >= rank:
+                return bucket_value(index)
+        return bucket_value(max(self.counts))
+
+    # Redis hash representation: b:<bucket> counts plus count and sum in microseconds
+    @staticmethod
+    def fields(seconds: float) -> Iterable[tuple]:
+        """Hash field increments for one observation"""
+        return ((f"b:{bucket_of(seconds)}", 1), ("count", 1), ("sum_us", int(seconds * 1_000_000)))
+
+    @classmethod
+    def from_fields(cls, fields: Mapping[str, str]) -> "LogHistogram":
+        histogram = cls()
+        for field, value in fields.items():
+            if field.startswith("b:"):
+                histogram.counts[int(field[2:])] = int(value)
+        histogram.count = int(fields.get("count", 0))
+        histogram.total = int(fields.get("sum_us", 0)) / 1_000_000
+        return histogram
+
+    def summary(self) -> dict:
+        """Count, mean, quantiles and max in milliseconds"""
+        if not self.count:
+            return {"count": 0}
+        summary = {"count": self.count, "mean_ms": round(self.total / self.count * 1000, 3)}
+        for name, q in QUANTILES:
+            summary[f"{name}_ms"] = round(self.quantile(q) * 1000, 3)
+        summary["max_ms"] = round(bucket_value(max(self.counts)) * 1000, 3)
+        return summary
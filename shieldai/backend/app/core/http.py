@@ -0,0 +1,47 @@
+from fastapi import Request, Response
+
+from app.core.serialization import dumps
+
+class FastJSONResponse(Response):
+    """JSON response that accepts pre-encoded bytes and otherwise encodes via orjson when available"""
+    media_type = "application/json"
+
+    def render(self, content) -> bytes:
+        if isinstance(content, (bytes, bytearray, memoryview)):
+            return bytes(content)
+        return dumps(content)
+
+def etag_matches(if_none_match: str, etag: str) -> bool:
+    """Check an If-None-Match header against an ETag (weak comparison)"""
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    opaque = etag.removeprefix("W/")
+    candidates = [tag.strip() for tag in if_none_match.split(",")]
+    return any(tag.removeprefix("W/") == opaque for tag in candidates)
+
+def accepts_gzip(request: Request) -> bool:
+    return "gzip" in request.headers.get("accept-encoding", "").lower()
+
+def payload_response(request: Request, payload, cache_control: str, extra_headers: dict = None) -> Response:
+    """
+    Serve a precomputed payload (body, gzip_body, etag) with conditional GET support.
+    The pre-compressed body is sent as-is, so GZipMiddleware leaves it alone.
+    """
+    headers = {
+        "ETag": payload.etag,
+        "Cache-Control": cache_control,
+        "Vary": "Accept-Encoding",
+    }
+    if extra_headers:
+        headers.update(extra_headers)
+
+    if etag_matches(request.headers.get("if-none-match"), payload.etag):
+        return Response(status_code=304, headers=headers)
+
+    if accepts_gzip(request) and len(payload.gzip_body) < len(payload.body):
+        headers["Content-Encoding"] = "gzip"
+        return Response(content=payload.gzip_body, media_type="application/json", headers=headers)
+
+    return Response(content=payload.body, media_type="application/json", headers=headers)
@@ -0,0 +1,517 @@
+import fnmatch
+import hashlib
+import logging
+import time
+from collections import OrderedDict, deque
+from typing import Any, Dict, List, Optional
+
+from redis.exceptions import ResponseError, WatchError
+
+logger = logging.getLogger(__name__)
+
+# Commands replayed against Redis when it comes back
+MUTATING_COMMANDS = frozenset({
+    "set", "setex", "mset", "delete", "unlink", "incr", "incrby", "decr", "decrby", "expire",
+    "hset", "hincrby", "hdel", "sadd", "srem", "lpush", "rpush", "ltrim",
+    "zadd", "zincrby", "zrem", "zremrangebyscore", "zremrangebyrank", "pfadd", "pfmerge",
+})
+
+def _b(value: Any) -> bytes:
+    """Store values the way Redis does - as byte strings"""
+    if isinstance(value, bytes):
+        return value
+    if isinstance(value, str):
+        return value.encode("utf-8")
+    if isinstance(value, float):
+        return repr(value).encode("ascii")
+    return str(value).encode("utf-8")
+
+def _key(name: Any) -> str:
+    return name.decode("utf-8") if isinstance(name, bytes) else str(name)
+
+def _scan_hash(key: str) -> int:
+    # Never 0, which is the cursor that ends a SCAN
+    return int.from_bytes(hashlib.blake2b(key.encode("utf-8"), digest_size=8).digest(), "big") | 1
+
+def _range(length: int, start: int, end: int) -> slice:
+    """Redis inclusive (possibly negative) indexes to a Python slice"""
+    if start < 0:
+        start = max(0, length + start)
+    if end < 0:
+        end = length + end
+    return slice(start, max(start, end + 1))
+
+class HyperLogLog(set):
+    """Exact stand-in for a Redis HyperLogLog"""
+
+class MemoryStore:
+    """Shared keyspace behind the in-memory clients, bounded by key count (LRU)"""
+
+    def __init__(self, max_keys: int = 100000, journal_max: int = 50000):
+        self.data: "OrderedDict[str, Any]" = OrderedDict()
+        self.expires: Dict[str, float] = {}
+        # Write counters for WATCHed keys only, dropped with the last watcher
+        self.versions: Dict[str, int] = {}
+        self.watchers: Dict[str, int] = {}
+        self.max_keys = max_keys
+        self.journal = deque(maxlen=journal_max)
+        self.journal_dropped = 0
+
+    def record(self, raw: bool, command: str, args: tuple, kwargs: dict):
+        if len(self.journal) == self.journal.maxlen:
+            self.journal_dropped += 1
+        self.journal.append((raw, command, args, kwargs))
+
+    def alive(self, key: str) -> bool:
+        """Expire-aware existence check that leaves the LRU order alone"""
+        deadline = self.expires.get(key)
+        if deadline is not None and deadline <= time.monotonic():
+            self.remove(key)
+            return False
+        return key in self.data
+
+    def lookup(self, key: str) -> Any:
+        if not self.alive(key):
+            return None
+        value = self.data.get(key)
+        if value is not None:
+            self.data.move_to_end(key)
+        return value
+
+    def store(self, key: str, value: Any, keep_ttl: bool = True):
+        self.data[key] = value
+        self.data.move_to_end(key)
+        if not keep_ttl:
+            self.expires.pop(key, None)
+        self.touch(key)
+        while len(self.data) > self.max_keys:
+            oldest, _ = self.data.popitem(last=False)
+            self.expires.pop(oldest, None)
+            self.touch(oldest)
+
+    def remove(self, key: str) -> bool:
+        self.expires.pop(key, None)
+        if self.data.pop(key, None) is None:
+            return False
+        self.touch(key)
+        return True
+
+    def touch(self, key: str):
+        if key in self.versions:
+            self.versions[key] += 1
+
+    def watch(self, key: str) -> int:
+        self.watchers[key] = self.watchers.get(key, 0) + 1
+        return self.versions.setdefault(key, 0)
+
+    def unwatch(self, key: str):
+        remaining = self.watchers.get(key, 0) - 1
+        if remaining > 0:
+            self.watchers[key] = remaining
+        else:
+            self.watchers.pop(key, None)
+            self.versions.pop(key, None)
+
+    def container(self, key: str, kind: type, create: bool = True):
+        value = self.lookup(key)
+        if value is None:
+            if not create:
+                return None
+            value = kind()
+            self.store(key, value)
+            return value
+        if not isinstance(value, kind):
+            raise ResponseError("WRONGTYPE Operation against a key holding the wrong kind of value")
+        return value
+
+    def clear(self):
+        self.data.clear()
+        self.expires.clear()
+        # Every watched key just went away
+        for key in self.versions:
+            self.versions[key] += 1
+        self.journal.clear()
+        self.journal_dropped = 0
+
+class InMemoryRedis:
+    """
+    Subset of the redis.asyncio.Redis interface used by ShieldAI, backed by a MemoryStore.
+    Stand-in while Redis is unreachable, and a local backend for tests and benchmarks.
+    """
+
+    def __init__(self, store: MemoryStore, decode_responses: bool = True, journal: bool = True):
+        self._store = store
+        self.decode_responses = decode_responses
+        self.journal = journal
+
+    def _out(self, value: Optional[bytes]) -> Any:
+        if value is None or not self.decode_responses:
+            return value
+        return value.decode("utf-8", errors="replace")
+
+    # Synchronous implementations, shared by the async API and pipelines
+    def run(self, command: str, *args, **kwargs) -> Any:
+        handler = getattr(self, f"_cmd_{command}", None)
+        if handler is None:
+            raise ResponseError(f"ERR command '{command}' is not supported by the in-memory backend")
+        result = handler(*args, **kwargs)
+        if command in MUTATING_COMMANDS:
+            # In-place container updates (hset, zadd, ...) invalidate WATCHes too
+            if args and isinstance(args[0], (str, bytes)):
+                self._store.touch(_key(args[0]))
+            if self.journal:
+                self._store.record(not self.decode_responses, command, args, kwargs)
+        return result
+
+    def __getattr__(self, command: str):
+        if command.startswith("_"):
+            raise AttributeError(command)
+
+        async def call(*args, **kwargs):
+            return self.run(command, *args, **kwargs)
+        return call
+
+    def pipeline(self, transaction: bool = True) -> "InMemoryPipeline":
+        return InMemoryPipeline(self)
+
+    async def ping(self) -> bool:
+        return True
+
+    async def close(self):
+        pass
+
+    # Strings
+    def _cmd_get(self, name):
+        value = self._store.lookup(_key(name))
+        if value is not None and not isinstance(value, bytes):
+            raise ResponseError("WRONGTYPE Operation against a key holding the wrong kind of value")
+        return self._out(value)
+
+    def _cmd_set(self, name, value, ex=None, px=None, nx=False, xx=False, keepttl=False):
+        key = _key(name)
+        exists = self._store.lookup(key) is not None
+        if (nx and exists) or (xx and not exists):
+            return None
+        self._store.store(key, _b(value), keep_ttl=keepttl)
+        if ex:
+            self._store.expires[key] = time.monotonic() + int(ex)
+        elif px:
+            self._store.expires[key] = time.monotonic() + int(px) / 1000
+        return True
+
+    def _cmd_setex(self, name, time_seconds, value):
+        return self._cmd_set(name, value, ex=time_seconds)
+
+    def _cmd_mget(self, keys, *args):
+        names = (list(keys) if isinstance(keys, (list, tuple)) else [keys]) + list(args)
+        return [self._cmd_get(name) if isinstance(self._store.lookup(_key(name)), bytes) else None for name in names]
+
+    def _cmd_mset(self, mapping):
+        for name, value in mapping.items():
+            self._cmd_set(name, value)
+        return True
+
+    def _cmd_incrby(self, name, amount=1):
+        key = _key(name)
+        current = self._store.lookup(key)
+        try:
+            value = int(current or 0) + int(amount)
+        except ValueError:
+            raise ResponseError("ERR value is not an integer or out of range")
+        self._store.store(key, _b(value))
+        return value
+
+    def _cmd_incr(self, name, amount=1):
+        return self._cmd_incrby(name, amount)
+
+    def _cmd_decrby(self, name, amount=1):
+        return self._cmd_incrby(name, -amount)
+
+    def _cmd_decr(self, name, amount=1):
+        return self._cmd_incrby(name, -amount)
+
+    # Keys
+    def _cmd_delete(self, *names):
+        return sum(1 for name in names if self._store.remove(_key(name)))
+
+    def _cmd_unlink(self, *names):
+        return self._cmd_delete(*names)
+
+    def _cmd_exists(self, *names):
+        return sum(1 for name in names if self._store.alive(_key(name)))
+
+    def _cmd_expire(self, name, time_seconds):
+        key = _key(name)
+        if self._store.lookup(key) is None:
+            return False
+        self._store.expires[key] = time.monotonic() + int(time_seconds)
+        return True
+
+    def _cmd_ttl(self, name):
+        key = _key(name)
+        if self._store.lookup(key) is None:
+            return -2
+        deadline = self._store.expires.get(key)
+        return -1 if deadline is None else max(0, int(round(deadline - time.monotonic())))
+
+    def _cmd_scan(self, cursor=0, match=None, count=None, _type=None):
+        # Cursor is a position in key-hash order, which access and inserts don't disturb,
+        # so every key present for the whole walk is returned (like Redis SCAN)
+        cursor = int(cursor)
+        pending = sorted(
+            (h, k) for k, h in ((k, _scan_hash(k)) for k in list(self._store.data.keys())) if h >= cursor
+        )
+        page, rest = pending[:count or 10], pending[count or 10:]
+        batch = [k for _, k in page if (match is None or fnmatch.fnmatchcase(k, match)) and self._store.alive(k)]
+        return (rest[0][0] if rest else 0), [self._out(_b(k)) for k in batch]
+
+    def _cmd_keys(self, pattern="*"):
+        return [self._out(_b(k)) for k in list(self._store.data.keys())
+                if fnmatch.fnmatchcase(k, pattern) and self._store.alive(k)]
+
+    def _cmd_publish(self, channel, message):
+        # No subscribers in-process
+        return 0
+
+    # Hashes
+    def _cmd_hset(self, name, key=None, value=None, mapping=None, items=None):
+        fields = dict(mapping or {})
+        if key is not None:
+            fields[key] = value
+        data = self._store.container(_key(name), dict)
+        added = sum(1 for field in fields if _key(field) not in data)
+        for field, field_value in fields.items():
+            data[_key(field)] = _b(field_value)
+        return added
+
+    def _cmd_hget(self, name, key):
+        data = self._store.container(_key(name), dict, create=False) or {}
+        return self._out(data.get(_key(key)))
+
+    def _cmd_hgetall(self, name):
+        data = self._store.container(_key(name), dict, create=False) or {}
+        if self.decode_responses:
+            return {field: self._out(value) for field, value in data.items()}
+        return {_b(field): value for field, value in data.items()}
+
+    def _cmd_hincrby(self, name, key, amount=1):
+        data = self._store.container(_key(name), dict)
+        value = int(data.get(_key(key), b"0")) + int(amount)
+        data[_key(key)] = _b(value)
+        return value
+
+    def _cmd_hdel(self, name, *keys):
+        data = self._store.container(_key(name), dict, create=False) or {}
+        return sum(1 for key in keys if data.pop(_key(key), None) is not None)
+
+    # Sets
+    def _cmd_sadd(self, name, *values):
+        members = self._store.container(_key(name), set)
+        before = len(members)
+        members.update(_b(v) for v in values)
+        return len(members) - before
+
+    def _cmd_srem(self, name, *values):
+        members = self._store.container(_key(name), set, create=False) or set()
+        before = len(members)
+        members.difference_update(_b(v) for v in values)
+        return before - len(members)
+
+    def _cmd_smembers(self, name):
+        members = self._store.container(_key(name), set, create=False) or set()
+        return {self._out(m) for m in members}
+
+    def _cmd_scard(self, name):
+        return len(self._store.container(_key(name), set, create=False) or ())
+
+    # HyperLogLogs
+    def _cmd_pfadd(self, name, *values):
+        members = self._store.container(_key(name), HyperLogLog)
+        before = len(members)
+        members.update(_b(v) for v in values)
+        return 1 if len(members) != before else 0
+
+    def _cmd_pfcount(self, *names):
+        union = set()
+        for name in names:
+            union |= self._store.container(_key(name), HyperLogLog, create=False) or set()
+        return len(union)
+
+    def _cmd_pfmerge(self, dest, *sources):
+        merged = self._store.container(_key(dest), HyperLogLog)
+        for name in sources:
+            merged |= self._store.container(_key(name), HyperLogLog, create=False) or set()
+        return True
+
+    # Lists
+    def _cmd_lpush(self, name, *values):
+        items = self._store.container(_key(name), list)
+        for value in values:
+            items.insert(0, _b(value))
+        return len(items)
+
+    def _cmd_rpush(self, name, *values):
+        items = self._store.container(_key(name), list)
+        items.extend(_b(v) for v in values)
+        return len(items)
+
+    def _cmd_lrange(self, name, start, end):
+        items = self._store.container(_key(name), list, create=False) or []
+        return [self._out(v) for v in items[_range(len(items), int(start), int(end))]]
+
+    def _cmd_ltrim(self, name, start, end):
+        key = _key(name)
+        items = self._store.container(key, list, create=False)
+        if items is not None:
+            items[:] = items[_range(len(items), int(start), int(end))]
+        return True
+
+    def _cmd_llen(self, name):
+        return len(self._store.container(_key(name), list, create=False) or ())
+
+    # Sorted sets
+    def _zset(self, name, create=True) -> Optional[Dict[bytes, float]]:
+        return self._store.container(_key(name), dict, create=create)
+
+    def _cmd_zadd(self, name, mapping, nx=False, xx=False, ch=False, incr=False, gt=False, lt=False):
+        if nx and xx:
+            raise ResponseError("ERR XX and NX options at the same time are not compatible")
+        if (gt and lt) or (nx and (gt or lt)):
+            raise ResponseError("ERR GT, LT, and/or NX options at the same time are not compatible")
+        if incr and len(mapping) != 1:
+            raise ResponseError("ERR INCR option supports a single increment-element pair")
+        scores = self._zset(name, create=not xx)
+        if scores is None:
+            return None if incr else 0
+        added = changed = 0
+        for member, score in mapping.items():
+            member = _b(member)
+            current = scores.get(member)
+            score = float(score)
+            if incr and current is not None:
+                score += current
+            if current is None:
+                if xx:
+                    if incr:
+                        return None
+                    continue
+                added += 1
+            elif nx or (gt and score <= current) or (lt and score >= current):
+                if incr:
+                    return None
+                continue
+            elif score != current:
+                changed += 1
+            scores[member] = score
+            if incr:
+                return score
+        return added + changed if ch else added
+
+    def _cmd_zincrby(self, name, amount, value):
+        scores = self._zset(name)
+        member = _b(value)
+        scores[member] = scores.get(member, 0.0) + float(amount)
+        return scores[member]
+
+    def _cmd_zrem(self, name, *values):
+        scores = self._zset(name, create=False) or {}
+        return sum(1 for v in values if scores.pop(_b(v), None) is not None)
+
+    def _cmd_zcard(self, name):
+        return len(self._zset(name, create=False) or ())
+
+    def _cmd_zremrangebyscore(self, name, min, max):
+        scores = self._zset(name, create=False) or {}
+        low, high = float(min), float(max)
+        doomed = [m for m, s in scores.items() if low <= s <= high]
+        for member in doomed:
+            del scores[member]
+        return len(doomed)
+
+    def _cmd_zremrangebyrank(self, name, min, max):
+        scores = self._zset(name, create=False) or {}
+        ordered = sorted(scores.items(), key=lambda item: (item[1], item[0]))
+        doomed = ordered[_range(len(ordered), int(min), int(max))]
+        for member, _ in doomed:
+            del scores[member]
+        return len(doomed)
+
+    def _sorted(self, name, start, end, reverse, withscores):
+        scores = self._zset(name, create=False) or {}
+        ordered = sorted(scores.items(), key=lambda item: (item[1], item[0]), reverse=reverse)
+        selected = ordered[_range(len(ordered), int(start), int(end))]
+        if withscores:
+            return [(self._out(m), s) for m, s in selected]
+        return [self._out(m) for m, _ in selected]
+
+    def _cmd_zrange(self, name, start, end, desc=False, withscores=False, score_cast_func=float):
+        return self._sorted(name, start, end, desc, withscores)
+
+    def _cmd_zrevrange(self, name, start, end, withscores=False, score_cast_func=float):
+        return self._sorted(name, start, end, True, withscores)
+
+class InMemoryPipeline:
+    """Queues commands and runs them in order; honours WATCH via per-key versions"""
+
+    def __init__(self, client: InMemoryRedis):
+        self._client = client
+        self._commands: List[tuple] = []
+        self._watched: Dict[str, int] = {}
+        self.watching = False
+        self.explicit_transaction = False
+
+    def __getattr__(self, command: str):
+        if command.startswith("_"):
+            raise AttributeError(command)
+
+        def queue(*args, **kwargs):
+            if self.watching and not self.explicit_transaction:
+                # Immediate mode between WATCH and MULTI, like redis-py
+                async def immediate():
+                    return self._client.run(command, *args, **kwargs)
+                return immediate()
+            self._commands.append((command, args, kwargs))
+            return self
+        return queue
+
+    async def watch(self, *names):
+        self.watching = True
+        for name in names:
+            key = _key(name)
+            if key in self._watched:
+                continue
+            self._watched[key] = self._client._store.watch(key)
+
+    def multi(self):
+        self.explicit_transaction = True
+
+    def _unwatch(self):
+        for key in self._watched:
+            self._client._store.unwatch(key)
+        self._watched = {}
+
+    async def reset(self):
+        self._commands = []
+        self._unwatch()
+        self.watching = False
+        self.explicit_transaction = False
+
+    async def execute(self, raise_on_error: bool = True) -> list:
+        commands, self._commands = self._commands, []
+        try:
+            versions = self._client._store.versions
+            if any(versions.get(key, 0) != version for key, version in self._watched.items()):
+                raise WatchError("Watched variable changed.")
+            results = []
+            for command, args, kwargs in commands:
+                try:
+                    results.append(self._client.run(command, *args, **kwargs))
+                except ResponseError as e:
+                    if raise_on_error:
+                        raise
+                    results.append(e)
+            return results
+        finally:
+            self._unwatch()
+            self.watching = False
+            self.explicit_transaction = False
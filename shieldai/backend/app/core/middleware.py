@@ -0,0 +1,165 @@
+import hashlib
+import math
+import time
+from functools import lru_cache
+from typing import Callable, Dict, Optional, Tuple
+
+from starlette.datastructures import Headers
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from app.core.config import settings
+from app.core.http import FastJSONResponse
+
+# Route cost that scales with the request body (Content-Length)
+BODY_COST = "body"
+
+@lru_cache(maxsize=4)
+def _key_digests(keys: Tuple[str, ...]) -> frozenset:
+    return frozenset(hashlib.sha256(key.encode("utf-8")).hexdigest() for key in keys)
+
+def api_key_identity(api_key: Optional[str]) -> Optional[str]:
+    """
+    Identity for a configured API key (hashed), None for anything else. Unverified
+    headers never pick the bucket - a fresh random value per request would get a
+    fresh bucket every time.
+    """
+    if not api_key:
+        return None
+    digest = hashlib.sha256(api_key.encode("utf-8")).hexdigest()
+    if digest not in _key_digests(tuple(settings.API_KEYS)):
+        return None
+    return "key:" + digest[:16]
+
+def client_identity(scope: Scope, headers: Headers) -> str:
+    """Rate-limit identity: a configured API key, otherwise the client IP"""
+    identity = api_key_identity(headers.get("x-api-key"))
+    if identity:
+        return identity
+    client = scope.get("client")
+    return f"ip:{client[0] if client else 'unknown'}"
+
+class RateLimitMiddleware:
+    """
+    Charges each limited route its cost before the body is read: a fixed cost, or
+    one unit per `bytes_per_unit` of Content-Length for batch routes, so a large
+    batch costs what it does. Batch bodies over `max_body_bytes` - or over what the
+    tightest limit can pay for in one window, whichever is smaller - are rejected
+    with 413. Responses carry RateLimit-* headers; rejections are 429s with Retry-After.
+    """
+
+    def __init__(
+        self,
+        app: ASGIApp,
+        limiter,
+        limits: Callable[[], list],
+        costs: Dict[Tuple[str, str], object],
+        bytes_per_unit: int = 8192,
+        max_body_bytes: int = 0,
+        identify: Callable[[Scope, Headers], str] = client_identity
+    ):
+        self.app = app
+        self.limiter = limiter
+        self.limits = limits
+        self.costs = costs
+        self.bytes_per_unit = max(1, bytes_per_unit)
+        self.max_body_bytes = max_body_bytes
+        self.identify = identify
+
+    @staticmethod
+    def _content_length(policy, headers: Headers) -> Optional[int]:
+        if policy != BODY_COST:
+            return 0
+        length = headers.get("content-length")
+        if length is None or not length.isdigit():
+            return None
+        return int(length)
+
+    def _cost(self, policy, length: int) -> int:
+        if policy != BODY_COST:
+            return int(policy)
+        return max(1, math.ceil(length / self.bytes_per_unit))
+
+    def _max_body_bytes(self, limits: list) -> int:
+        # Largest body the tightest limit can pay for in one window, capped by max_body_bytes
+        if not limits:
+            return self.max_body_bytes
+        affordable = min(limit for limit, _ in limits) * self.bytes_per_unit
+        return min(self.max_body_bytes, affordable) if self.max_body_bytes else affordable
+
+    @staticmethod
+    def _headers(details: dict, policy: str) -> list:
+        if not details:
+            return []
+        reset = max(0, math.ceil(details["reset_time"] - time.time()))
+        return [
+            (b"ratelimit-limit", str(details["limit"]).encode()),
+            (b"ratelimit-remaining", str(max(0, details["remaining"])).encode()),
+            (b"ratelimit-reset", str(reset).encode()),
+            (b"ratelimit-policy", policy.encode()),
+        ]
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        policy = self.costs.get((scope["method"], scope["path"]))
+        if policy is None:
+            await self.app(scope, receive, send)
+            return
+
+        headers = Headers(scope=scope)
+        length = self._content_length(policy, headers)
+        if length is None:
+            response = FastJSONResponse({"detail": "Content-Length required"}, status_code=411)
+            await response(scope, receive, send)
+            return
+
+        limits = [(limit, window) for limit, window in self.limits() if limit > 0]
+        policy_header = ", ".join(f"{limit};w={window}" for limit, window in limits)
+        max_bytes = self._max_body_bytes(limits) if policy == BODY_COST else 0
+        if max_bytes and length > max_bytes:
+            response = FastJSONResponse(
+                {"detail": "Request body too large; split it up", "max_bytes": max_bytes},
+                status_code=413
+            )
+            if limits:
+                response.raw_headers.append((b"ratelimit-policy", policy_header.encode()))
+            await response(scope, receive, send)
+            return
+
+        if not limits:
+            await self.app(scope, receive, send)
+            return
+        cost = self._cost(policy, length)
+
+        # A fixed cost no amount of waiting can pay for (body costs are bounded above)
+        max_cost = min(limit for limit, _ in limits)
+        if cost > max_cost:
+            response = FastJSONResponse(
+                {"detail": "Request costs more than the rate limit allows per window", "cost": cost, "max_cost": max_cost},
+                status_code=413
+            )
+            response.raw_headers.append((b"ratelimit-policy", policy_header.encode()))
+            await response(scope, receive, send)
+            return
+
+        limited, details = await self.limiter.check_limits(self.identify(scope, headers), limits, cost)
+        rate_headers = self._headers(details, policy_header)
+
+        if limited:
+            retry_after = max(1, math.ceil(details.get("retry_after", 1)))
+            response = FastJSONResponse(
+                {"detail": "Rate limit exceeded", "retry_after": retry_after, "cost": cost},
+                status_code=429
+            )
+            response.raw_headers.extend(rate_headers + [(b"retry-after", str(retry_after).encode())])
+            await response(scope, receive, send)
+            return
+
+        async def send_with_headers(message: Message):
+            if message["type"] == "http.response.start" and rate_headers:
+                message = dict(message)
+                message["headers"] = list(message.get("headers", [])) + rate_headers
+            await send(message)
+
+        await self.app(scope, receive, send_with_headers)
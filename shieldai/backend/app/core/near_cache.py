@@ -0,0 +1,121 @@
+import logging
+import time
+from collections import OrderedDict, defaultdict
+from typing import Any, Dict, Iterable, Optional, Tuple
+
+from app.core.codecs import namespace_of
+
+logger = logging.getLogger(__name__)
+
+# Channel for explicit invalidations when server-assisted tracking isn't available
+INVALIDATION_CHANNEL = "shieldai:near-cache:invalidate"
+# Channel Redis publishes tracking invalidations on (RESP2 redirect mode)
+TRACKING_CHANNEL = "__redis__:invalidate"
+
+class NearCache:
+    """
+    Bounded in-process LRU of raw Redis values for opted-in key namespaces.
+    Only serves entries while an invalidation listener is attached; any gap in
+    the invalidation stream clears it. Values are kept encoded and decoded per
+    hit, so callers never share mutable objects.
+    """
+
+    def __init__(self, namespaces: Iterable[str], max_entries: int = 10000, max_age: float = 300.0):
+        self.namespaces = frozenset(namespaces)
+        self.max_entries = max_entries
+        self.max_age = max_age
+        self.mode: Optional[str] = None
+        # One invalidation listener per Redis node; serve only while all are attached
+        self.listeners = 1
+        self._attached: Dict[str, str] = {}
+        self._entries: "OrderedDict[str, Tuple[float, Any]]" = OrderedDict()
+        # Invalidation epochs guard against a read racing an invalidation
+        self.epoch = 0
+        self._invalidated: Dict[str, int] = {}
+        self._floor = 0
+        self._hits = defaultdict(int)
+        self._misses = defaultdict(int)
+        self.invalidations = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self.mode is not None
+
+    def handles(self, key: str) -> bool:
+        return self.mode is not None and namespace_of(key) in self.namespaces
+
+    def attach(self, node: str, mode: str):
+        self._attached[node] = mode
+        if len(self._attached) < self.listeners:
+            return
+        self.clear()
+        # Writers must publish invalidations if any node lacks client tracking
+        self.mode = "pubsub" if "pubsub" in self._attached.values() else "tracking"
+        logger.info(f"🧊 Near cache enabled ({self.mode}) for namespaces: {', '.join(sorted(self.namespaces))}")
+
+    def detach(self, node: str):
+        self._attached.pop(node, None)
+        if self.mode is not None:
+            logger.warning("Near cache disabled - invalidation stream lost")
+        self.mode = None
+        self.clear()
+
+    def get(self, key: str) -> Tuple[bool, Any]:
+        entry = self._entries.get(key)
+        namespace = namespace_of(key)
+        if entry is None or entry[0] <= time.monotonic():
+            self._misses[namespace] += 1
+            return False, None
+        self._entries.move_to_end(key)
+        self._hits[namespace] += 1
+        return True, entry[1]
+
+    def put(self, key: str, value: Any, epoch: int):
+        """Store a value read when the epoch was `epoch`, unless it was invalidated since"""
+        if self.mode is None or epoch < self._floor or self._invalidated.get(key, -1) > epoch:
+            return
+        self._entries[key] = (time.monotonic() + self.max_age, value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def invalidate(self, keys: Any):
+        """Apply an invalidation message: one key, a list of keys, or None for a flush"""
+        self.epoch += 1
+        self.invalidations += 1
+        if keys is None:
+            self.clear()
+            return
+        if isinstance(keys, (str, bytes)):
+            keys = (keys,)
+        for key in keys:
+            if isinstance(key, bytes):
+                key = key.decode("utf-8")
+            self._entries.pop(key, None)
+            self._invalidated[key] = self.epoch
+        if len(self._invalidated) > self.max_entries * 4:
+            # Forget per-key epochs; reads begun before now are simply not stored
+            self._invalidated.clear()
+            self._floor = self.epoch
+
+    def clear(self):
+        self.epoch += 1
+        self._entries.clear()
+        self._invalidated.clear()
+        self._floor = self.epoch
+
+    def stats(self) -> dict:
+        namespaces = {}
+        for namespace in sorted(self.namespaces):
+            hits, misses = self._hits[namespace], self._misses[namespace]
+            namespaces[namespace] = {
+                "hits": hits,
+                "misses": misses,
+                "hit_ratio": round(hits / (hits + misses), 4) if hits + misses else 0.0,
+            }
+        return {
+            "mode": self.mode,
+            "entries": len(self._entries),
+            "invalidations": self.invalidations,
+            "namespaces": namespaces,
+        }
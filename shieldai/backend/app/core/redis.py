@@ -1,63 +1,525 @@
 import redis.asyncio as redis
+import asyncio
+import hashlib
 import logging
-from typing import Optional, Any
+import time
+from typing import Optional, Any, AsyncIterator, Dict, List
 import json
 import pickle
+import uuid
+from redis.exceptions import (
+    ConnectionError as RedisConnectionError, NoScriptError, ResponseError, TimeoutError as RedisTimeoutError
+)
+from app.core.codecs import codec_for, parse_codec_config
 from app.core.config import settings
+from app.core.memory_backend import InMemoryRedis, MemoryStore
+from app.core.near_cache import INVALIDATION_CHANNEL, TRACKING_CHANNEL, NearCache
+from app.core.sharding import HashRing, ShardedClient, node_name
 
 logger = logging.getLogger(__name__)
 
+# Keyless commands the client must run itself (a sharded client walks or asks every node)
+UNPIPELINED_COMMANDS = frozenset({"scan", "keys", "ping", "script_load"})
+
+# Failures that count against the circuit breaker; command errors (WRONGTYPE etc.) do not
+CONNECTION_ERRORS = (RedisConnectionError, RedisTimeoutError, ConnectionError, TimeoutError, OSError)
+
+class CircuitBreaker:
+    """
+    Opens after `failure_threshold` consecutive connection failures. Once
+    `recovery_timeout` has passed a single half-open probe is let through;
+    success closes the breaker, failure re-opens it for another timeout.
+    """
+
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+    def __init__(self, failure_threshold: int = 5, recovery_timeout: float = 10.0):
+        self.failure_threshold = max(1, failure_threshold)
+        self.recovery_timeout = recovery_timeout
+        self.state = self.CLOSED
+        self.failures = 0
+        self.opened_at = 0.0
+        self.probe_started: Optional[float] = None
+        self.trips = 0
+
+    def allow_request(self) -> bool:
+        if self.state == self.CLOSED:
+            return True
+        now = time.monotonic()
+        if self.state == self.OPEN and now - self.opened_at >= self.recovery_timeout:
+            self.state = self.HALF_OPEN
+            self.probe_started = None
+        # One probe at a time; a probe that never reported back is retried after the timeout
+        if self.state == self.HALF_OPEN and (
+            self.probe_started is None or now - self.probe_started >= self.recovery_timeout
+        ):
+            self.probe_started = now
+            return True
+        return False
+
+    def record_success(self):
+        self.state = self.CLOSED
+        self.failures = 0
+        self.probe_started = None
+
+    def record_failure(self) -> bool:
+        """Count a failure; returns True if this one opened the breaker"""
+        self.failures += 1
+        if self.state == self.HALF_OPEN or (self.state == self.CLOSED and self.failures >= self.failure_threshold):
+            self.trip()
+            return True
+        return False
+
+    def trip(self):
+        self.state = self.OPEN
+        self.opened_at = time.monotonic()
+        self.probe_started = None
+        self.trips += 1
+
+    def stats(self) -> dict:
+        return {"state": self.state, "consecutive_failures": self.failures, "trips": self.trips}
+
+class BreakerPipeline:
+    """
+    Wraps a Redis pipeline: reports the outcome to the breaker, and replays the queued
+    commands on the in-memory backend if Redis drops before the pipeline executes.
+    """
+
+    def __init__(self, manager: "RedisManager", pipeline, raw: bool):
+        self._manager = manager
+        self._pipeline = pipeline
+        self._raw = raw
+        self._commands = []
+        self._watched = False
+
+    def __getattr__(self, name: str):
+        attr = getattr(self._pipeline, name)
+        if not callable(attr):
+            return attr
+        if name == "watch":
+            self._watched = True
+
+        def command(*args, **kwargs):
+            result = attr(*args, **kwargs)
+            if result is self._pipeline:
+                self._commands.append((name, args, kwargs))
+                return self
+            # Control methods and immediate-mode commands after WATCH
+            return result
+        return command
+
+    async def execute(self, raise_on_error: bool = True) -> list:
+        commands, self._commands = self._commands, []
+        try:
+            results = await self._pipeline.execute(raise_on_error=raise_on_error)
+        except CONNECTION_ERRORS as e:
+            self._manager._record_failure(e)
+            fallback = self._manager._memory_pipeline(self._raw)
+            # A WATCH transaction read its state from Redis - it can't be replayed elsewhere
+            if fallback is None or self._watched:
+                raise
+            for name, args, kwargs in commands:
+                getattr(fallback, name)(*args, **kwargs)
+            return await fallback.execute(raise_on_error=raise_on_error)
+        self._manager._record_success()
+        return results
+
+class AutoPipeline:
+    """
+    Coalesces commands issued within the same event-loop tick into one pipeline.
+    Each caller awaits its own future and gets its own result or exception.
+    """
+
+    def __init__(self, client_getter, max_batch: int = 1000):
+        self._client_getter = client_getter
+        self.max_batch = max_batch
+        self._pending = []
+        self._scheduled = False
+        self.batches = 0
+        self.commands = 0
+
+    def submit(self, command: str, args: tuple, kwargs: dict) -> asyncio.Future:
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        self._pending.append((command, args, kwargs, future))
+        if len(self._pending) >= self.max_batch:
+            self._flush()
+        elif not self._scheduled:
+            # call_soon runs after everything already ready in this loop iteration
+            self._scheduled = True
+            loop.call_soon(self._flush)
+        return future
+
+    def _flush(self):
+        self._scheduled = False
+        if not self._pending:
+            return
+        batch, self._pending = self._pending, []
+        asyncio.ensure_future(self._run(batch))
+
+    async def _run(self, batch: list):
+        self.batches += 1
+        self.commands += len(batch)
+        try:
+            pipeline = self._client_getter().pipeline(transaction=False)
+            for command, args, kwargs, _ in batch:
+                getattr(pipeline, command)(*args, **kwargs)
+            results = await pipeline.execute(raise_on_error=False)
+        except Exception as e:
+            for *_, future in batch:
+                if not future.done():
+                    future.set_exception(e)
+            return
+
+        for (*_, future), result in zip(batch, results):
+            if future.done():
+                continue
+            if isinstance(result, Exception):
+                future.set_exception(result)
+            else:
+                future.set_result(result)
+
+    def stats(self) -> dict:
+        return {
+            "batches": self.batches,
+            "commands": self.commands,
+            "avg_batch_size": round(self.commands / self.batches, 2) if self.batches else 0.0
+        }
+
 class RedisManager:
     def __init__(self):
         self.redis_client: Optional[redis.Redis] = None
-        self.is_connected = False
+        # Bytes client for namespaces stored through a binary codec
+        self.raw_client: Optional[redis.Redis] = None
+        self.breaker = CircuitBreaker(settings.REDIS_BREAKER_FAILURE_THRESHOLD, settings.REDIS_BREAKER_RECOVERY_TIMEOUT)
+        # In-memory stand-in while the breaker is open (or Redis was never reachable)
+        self.memory_store: Optional[MemoryStore] = None
+        if settings.REDIS_FALLBACK_ENABLED:
+            self.memory_store = MemoryStore(settings.REDIS_FALLBACK_MAX_KEYS, settings.REDIS_FALLBACK_JOURNAL_MAX)
+            self.memory_client = InMemoryRedis(self.memory_store, decode_responses=True)
+            self.raw_memory_client = InMemoryRedis(self.memory_store, decode_responses=False)
+        self.codecs = parse_codec_config(settings.REDIS_CODECS, settings.REDIS_COMPRESS_THRESHOLD)
+        self._script_shas: Dict[str, str] = {}
+        # Half-open probe and journal replay, off the request path
+        self._recovery: Optional[asyncio.Task] = None
+        self.near_cache: Optional[NearCache] = None
+        self._near_cache_tasks: List[asyncio.Task] = []
+        if settings.REDIS_NEAR_CACHE_NAMESPACES:
+            self.near_cache = NearCache(
+                settings.REDIS_NEAR_CACHE_NAMESPACES,
+                settings.REDIS_NEAR_CACHE_MAX_KEYS,
+                settings.REDIS_NEAR_CACHE_MAX_AGE
+            )
+        self.auto_pipeline: Optional[AutoPipeline] = None
+        self.raw_auto_pipeline: Optional[AutoPipeline] = None
+        if settings.REDIS_AUTO_PIPELINE:
+            self.auto_pipeline = AutoPipeline(lambda: self.redis_client, settings.REDIS_AUTO_PIPELINE_MAX_BATCH)
+            self.raw_auto_pipeline = AutoPipeline(lambda: self.raw_client, settings.REDIS_AUTO_PIPELINE_MAX_BATCH)
+
+    @property
+    def is_connected(self) -> bool:
+        """True while commands go to the real Redis server"""
+        return self.redis_client is not None and self.breaker.state == CircuitBreaker.CLOSED
+
+    @property
+    def available(self) -> bool:
+        """True if commands can be served, by Redis or by the in-memory fallback"""
+        return self.is_connected or self.memory_store is not None
+
+    def _record_failure(self, error: Exception):
+        if self.breaker.record_failure():
+            logger.warning(
+                f"⚡ Redis circuit breaker opened ({error}); "
+                f"{'serving from in-memory fallback' if self.memory_store is not None else 'Redis calls disabled'}"
+            )
+
+    def _record_success(self):
+        # Only the recovery task closes an open breaker - the journal has to be replayed first
+        if self.breaker.state == CircuitBreaker.CLOSED:
+            self.breaker.record_success()
+
+    def _memory_pipeline(self, raw: bool = False):
+        if self.memory_store is None:
+            return None
+        return (self.raw_memory_client if raw else self.memory_client).pipeline()
+
+    async def _remote_ready(self) -> bool:
+        """
+        Whether to use Redis for the next call. When the half-open probe is due it is
+        started in the background; callers keep using the fallback until it has
+        replayed the journal and closed the breaker.
+        """
+        if self.redis_client is None:
+            return False
+        if self.breaker.state == CircuitBreaker.CLOSED:
+            return True
+        if (self._recovery is None or self._recovery.done()) and self.breaker.allow_request():
+            self._recovery = asyncio.create_task(self._recover())
+        return False
+
+    async def _recover(self):
+        """Half-open probe: ping, replay the fallback's journal, then close the breaker"""
+        try:
+            await self.redis_client.ping()
+            await self._reconcile()
+        except CONNECTION_ERRORS as e:
+            self._record_failure(e)
+            return
+        except Exception as e:
+            logger.error(f"Redis recovery failed: {e}")
+            self.breaker.record_failure()
+            return
+        self.breaker.record_success()
+
+    async def _reconcile(self, chunk_size: int = 500):
+        """
+        Replay writes journaled by the in-memory backend against Redis, then drop its
+        keyspace. Counters are replayed as increments, so they add up with whatever
+        other instances wrote to Redis during the outage.
+        """
+        store = self.memory_store
+        if store is None:
+            return
+        replayed = 0
+        # Writes arriving meanwhile still land in the journal, so drain until empty
+        while store.journal:
+            chunk = [store.journal.popleft() for _ in range(min(chunk_size, len(store.journal)))]
+            pipelines = {}
+            for raw, command, args, kwargs in chunk:
+                if raw not in pipelines:
+                    pipelines[raw] = (self.raw_client if raw else self.redis_client).pipeline(transaction=False)
+                getattr(pipelines[raw], command)(*args, **kwargs)
+            try:
+                for pipeline in pipelines.values():
+                    await pipeline.execute(raise_on_error=False)
+            except CONNECTION_ERRORS:
+                store.journal.extendleft(reversed(chunk))
+                raise
+            replayed += len(chunk)
+
+        dropped = store.journal_dropped
+        store.clear()
+        logger.info(f"✅ Redis recovered - replayed {replayed} buffered writes"
+                    + (f" ({dropped} dropped, journal full)" if dropped else ""))
+
+    # Near cache
+    def _near(self, key: str) -> bool:
+        """Whether reads of `key` may be served from the near cache right now"""
+        return self.near_cache is not None and self.near_cache.handles(key) and self.is_connected
+
+    async def _near_get(self, key: str, raw: bool) -> Any:
+        hit, value = self.near_cache.get(key)
+        if hit:
+            return value
+        epoch = self.near_cache.epoch
+        value = await self._execute("get", key, raw=raw)
+        if self.is_connected:
+            self.near_cache.put(key, value, epoch)
+        return value
+
+    async def _near_mget(self, keys: List[str], raw: bool) -> list:
+        values, misses = [None] * len(keys), []
+        for i, key in enumerate(keys):
+            hit, value = self.near_cache.get(key) if self._near(key) else (False, None)
+            if hit:
+                values[i] = value
+            else:
+                misses.append(i)
+        if misses:
+            epoch = self.near_cache.epoch
+            fetched = await self._execute("mget", [keys[i] for i in misses], raw=raw)
+            for i, value in zip(misses, fetched):
+                values[i] = value
+                if self._near(keys[i]):
+                    self.near_cache.put(keys[i], value, epoch)
+        return values
+
+    async def _near_written(self, keys):
+        """Drop our own copies of written keys and, in pub/sub mode, tell other instances"""
+        near = self.near_cache
+        if near is None or not near.enabled:
+            return
+        keys = [key for key in keys if near.handles(key)]
+        if not keys:
+            return
+        near.invalidate(keys)
+        if near.mode == "pubsub" and self.is_connected:
+            try:
+                for key in keys:
+                    await self._execute("publish", INVALIDATION_CHANNEL, key)
+            except Exception as e:
+                # The write itself succeeded; other instances catch up within the max age
+                logger.warning(f"Near cache invalidation publish failed: {e}")
+
+    async def _near_cache_listener(self, url: str):
+        """
+        Keep the near cache coherent with one node. Tracking mode enables CLIENT TRACKING
+        in BCAST mode for the opted-in prefixes, redirected to a subscriber connection;
+        pub/sub mode listens for invalidations published by RedisManager writes. Any
+        interruption disables the near cache until the listener is re-established.
+        """
+        near = self.near_cache
+        while True:
+            listener = tracker = None
+            try:
+                name = f"shieldai-near-cache-{uuid.uuid4().hex[:12]}"
+                listener = redis.from_url(url, decode_responses=True, client_name=name)
+                pubsub = listener.pubsub()
+                mode = settings.REDIS_NEAR_CACHE_MODE
+                if mode == "tracking":
+                    try:
+                        await pubsub.subscribe(TRACKING_CHANNEL)
+                        clients = await listener.client_list()
+                        target = next(c["id"] for c in clients if c.get("name") == name)
+                        # Tracking state lives on one connection, which must stay open
+                        tracker = redis.from_url(url, single_connection_client=True)
+                        prefixes = [arg for ns in sorted(near.namespaces) for arg in ("PREFIX", f"{ns}:")]
+                        await tracker.execute_command("CLIENT", "TRACKING", "ON", "REDIRECT", target, "BCAST", *prefixes)
+                    except (ResponseError, StopIteration) as e:
+                        logger.warning(f"Redis client tracking unavailable ({e!r}), using pub/sub invalidation")
+                        await pubsub.unsubscribe(TRACKING_CHANNEL)
+                        mode = "pubsub"
+                if mode != "tracking":
+                    mode = "pubsub"
+                    await pubsub.subscribe(INVALIDATION_CHANNEL)
+                near.attach(url, mode)
+
+                last_check = time.monotonic()
+                while True:
+                    message = await pubsub.get_message(ignore_subscribe_messages=True, timeout=1.0)
+                    if message is not None and message["type"] == "message":
+                        near.invalidate(message["data"])
+                    if tracker is not None and time.monotonic() - last_check >= 5:
+                        # A dropped tracking connection would silently stop invalidations
+                        await tracker.ping()
+                        last_check = time.monotonic()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.warning(f"Near cache invalidation listener failed: {e}")
+            finally:
+                near.detach(url)
+                for client in (tracker, listener):
+                    if client is not None:
+                        try:
+                            await client.close()
+                        except Exception:
+                            pass
+            await asyncio.sleep(1.0)
+
+    async def _execute(self, command: str, *args, raw: bool = False, **kwargs) -> Any:
+        """
+        Run a single command, sharing a round trip with concurrent callers when auto-pipelining.
+        Falls back to the in-memory backend while the circuit breaker is open.
+        """
+        if await self._remote_ready():
+            try:
+                auto_pipeline = self.raw_auto_pipeline if raw else self.auto_pipeline
+                if auto_pipeline is not None and command not in UNPIPELINED_COMMANDS:
+                    result = await auto_pipeline.submit(command, args, kwargs)
+                else:
+                    client = self.raw_client if raw else self.redis_client
+                    result = await getattr(client, command)(*args, **kwargs)
+            except CONNECTION_ERRORS as e:
+                self._record_failure(e)
+                if self.memory_store is None:
+                    raise
+            else:
+                self._record_success()
+                return result
+        elif self.memory_store is None:
+            raise RedisConnectionError("Redis unavailable and in-memory fallback disabled")
+
+        client = self.raw_memory_client if raw else self.memory_client
+        return await getattr(client, command)(*args, **kwargs)
+
+    @staticmethod
+    def _serialize(value: Any) -> str:
+        if isinstance(value, (dict, list)):
+            return json.dumps(value)
+        return str(value)
+
+    @staticmethod
+    def _deserialize(value: Any) -> Any:
+        try:
+            return json.loads(value)
+        except json.JSONDecodeError:
+            return value
+
+    @staticmethod
+    def _create_client(url: str, raw: bool = False) -> redis.Redis:
+        options = {"decode_responses": False} if raw else {"encoding": "utf-8", "decode_responses": True}
+        return redis.from_url(
+            url,
+            socket_connect_timeout=5,
+            socket_timeout=settings.REDIS_SOCKET_TIMEOUT,
+            socket_keepalive=True,
+            retry_on_timeout=True,
+            **options
+        )
 
     async def connect(self):
-        """Connect to Redis with retry logic"""
+        """Connect to Redis with retry logic; several REDIS_NODES are sharded by consistent hashing"""
         try:
-            self.redis_client = redis.from_url(
-                settings.REDIS_URL,
-                encoding="utf-8",
-                decode_responses=True,
-                socket_connect_timeout=5,
-                socket_keepalive=True,
-                retry_on_timeout=True,
-            )
+            urls = settings.REDIS_NODES
+            if len(urls) == 1:
+                self.redis_client = self._create_client(urls[0])
+                self.raw_client = self._create_client(urls[0], raw=True)
+            else:
+                ring = HashRing([node_name(url) for url in urls])
+                self.redis_client = ShardedClient([self._create_client(url) for url in urls], ring)
+                self.raw_client = ShardedClient([self._create_client(url, raw=True) for url in urls], ring)
             
-            # Test connection
+            # Test connection (every node when sharded)
             await self.redis_client.ping()
-            self.is_connected = True
-            logger.info("✅ Redis connected successfully")
+            self.breaker.record_success()
+            logger.info(f"✅ Redis connected successfully ({len(urls)} node{'s' if len(urls) > 1 else ''})")
+            
+            if self.near_cache is not None and not self._near_cache_tasks:
+                self.near_cache.listeners = len(urls)
+                self._near_cache_tasks = [asyncio.create_task(self._near_cache_listener(url)) for url in urls]
             
         except Exception as e:
             logger.error(f"❌ Redis connection failed: {e}")
-            self.is_connected = False
+            # Keep the clients so the half-open probe can pick Redis up once it's reachable
+            self.breaker.trip()
             raise
 
     async def disconnect(self):
         """Close Redis connection"""
+        if self._recovery is not None:
+            self._recovery.cancel()
+            await asyncio.gather(self._recovery, return_exceptions=True)
+            self._recovery = None
+        for task in self._near_cache_tasks:
+            task.cancel()
+        await asyncio.gather(*self._near_cache_tasks, return_exceptions=True)
+        self._near_cache_tasks = []
         if self.redis_client:
             await self.redis_client.close()
-            self.is_connected = False
+            if self.raw_client:
+                await self.raw_client.close()
+            self.redis_client = None
+            self.raw_client = None
             logger.info("🔌 Redis disconnected")
 
     async def set(self, key: str, value: Any, expire: int = None) -> bool:
         """Set key-value pair with optional expiration"""
-        if not self.is_connected:
+        if not self.available:
             return False
             
         try:
-            # Serialize value based on type
-            if isinstance(value, (dict, list)):
-                serialized_value = json.dumps(value)
-            else:
-                serialized_value = str(value)
-                
-            if expire:
-                await self.redis_client.setex(key, expire, serialized_value)
+            codec = codec_for(self.codecs, key)
+            if codec:
+                await self._execute("set", key, codec.encode(value), ex=expire or None, raw=True)
+            elif expire:
+                await self._execute("setex", key, expire, self._serialize(value))
             else:
-                await self.redis_client.set(key, serialized_value)
+                await self._execute("set", key, self._serialize(value))
                 
+            await self._near_written((key,))
             return True
         except Exception as e:
             logger.error(f"Redis set error for key {key}: {e}")
@@ -65,75 +527,144 @@ class RedisManager:
 
     async def get(self, key: str, default: Any = None) -> Any:
         """Get value by key"""
-        if not self.is_connected:
+        if not self.available:
             return default
             
         try:
-            value = await self.redis_client.get(key)
+            codec = codec_for(self.codecs, key)
+            if self._near(key):
+                value = await self._near_get(key, raw=codec is not None)
+            else:
+                value = await self._execute("get", key, raw=codec is not None)
             if value is None:
                 return default
                 
-            # Try to deserialize JSON, fallback to string
-            try:
-                return json.loads(value)
-            except json.JSONDecodeError:
-                return value
+            # Tagged values say how they were encoded - no trial parsing
+            return codec.decode(value) if codec else self._deserialize(value)
                 
         except Exception as e:
             logger.error(f"Redis get error for key {key}: {e}")
             return default
 
+    # Bulk operations
+    async def mget(self, keys: List[str], default: Any = None) -> List[Any]:
+        """Get many keys in one round trip"""
+        if not self.available or not keys:
+            return [default] * len(keys)
+            
+        try:
+            codec = codec_for(self.codecs, keys[0])
+            if all(codec_for(self.codecs, key) is codec for key in keys):
+                if self.near_cache is not None and self.near_cache.enabled:
+                    values = await self._near_mget(keys, raw=codec is not None)
+                else:
+                    values = await self._execute("mget", keys, raw=codec is not None)
+                decode = codec.decode if codec else self._deserialize
+                return [default if v is None else decode(v) for v in values]
+            # Mixed namespaces: fall back to per-key reads (auto-pipelined when enabled)
+            return list(await asyncio.gather(*(self.get(key, default) for key in keys)))
+        except Exception as e:
+            logger.error(f"Redis mget error for {len(keys)} keys: {e}")
+            return [default] * len(keys)
+
+    async def mset(self, mapping: Dict[str, Any], expire: int = None) -> bool:
+        """Set many keys in one round trip, optionally with a shared TTL"""
+        if not self.available or not mapping:
+            return False
+            
+        try:
+            legacy, encoded = {}, {}
+            for key, value in mapping.items():
+                codec = codec_for(self.codecs, key)
+                if codec:
+                    encoded[key] = codec.encode(value)
+                else:
+                    legacy[key] = self._serialize(value)
+            
+            for raw, serialized in ((False, legacy), (True, encoded)):
+                if not serialized:
+                    continue
+                if not expire:
+                    await self._execute("mset", serialized, raw=raw)
+                    continue
+                # MSET has no TTL - send one SET EX per key in a single pipeline
+                pipeline = await self.pipeline(raw=raw, transaction=False)
+                for key, value in serialized.items():
+                    pipeline.set(key, value, ex=expire)
+                await pipeline.execute()
+            await self._near_written(mapping.keys())
+            return True
+        except Exception as e:
+            logger.error(f"Redis mset error for {len(mapping)} keys: {e}")
+            return False
+
+    async def hgetall_many(self, keys: List[str]) -> List[dict]:
+        """Read many hashes in one round trip"""
+        if not self.available or not keys:
+            return [{} for _ in keys]
+            
+        try:
+            pipeline = await self.pipeline(transaction=False)
+            for key in keys:
+                pipeline.hgetall(key)
+            return [result or {} for result in await pipeline.execute()]
+        except Exception as e:
+            logger.error(f"Redis hgetall_many error for {len(keys)} keys: {e}")
+            return [{} for _ in keys]
+
     async def delete(self, *keys) -> int:
         """Delete one or more keys"""
-        if not self.is_connected:
+        if not self.available:
             return 0
             
         try:
-            return await self.redis_client.delete(*keys)
+            deleted = await self._execute("delete", *keys)
+            await self._near_written(keys)
+            return deleted
         except Exception as e:
             logger.error(f"Redis delete error for keys {keys}: {e}")
             return 0
 
     async def exists(self, key: str) -> bool:
         """Check if key exists"""
-        if not self.is_connected:
+        if not self.available:
             return False
             
         try:
-            return await self.redis_client.exists(key) > 0
+            return await self._execute("exists", key) > 0
         except Exception as e:
             logger.error(f"Redis exists error for key {key}: {e}")
             return False
 
     async def incr(self, key: str, amount: int = 1) -> Optional[int]:
         """Increment key by amount"""
-        if not self.is_connected:
+        if not self.available:
             return None
             
         try:
-            return await self.redis_client.incrby(key, amount)
+            return await self._execute("incrby", key, amount)
         except Exception as e:
             logger.error(f"Redis incr error for key {key}: {e}")
             return None
 
     async def expire(self, key: str, seconds: int) -> bool:
         """Set expiration for key"""
-        if not self.is_connected:
+        if not self.available:
             return False
             
         try:
-            return await self.redis_client.expire(key, seconds)
+            return await self._execute("expire", key, seconds)
         except Exception as e:
             logger.error(f"Redis expire error for key {key}: {e}")
             return False
 
     async def ttl(self, key: str) -> Optional[int]:
         """Get time to live for key"""
-        if not self.is_connected:
+        if not self.available:
             return None
             
         try:
-            return await self.redis_client.ttl(key)
+            return await self._execute("ttl", key)
         except Exception as e:
             logger.error(f"Redis ttl error for key {key}: {e}")
             return None
@@ -141,13 +672,13 @@ class RedisManager:
     # Hash operations
     async def hset(self, key: str, field: str, value: Any) -> bool:
         """Set hash field"""
-        if not self.is_connected:
+        if not self.available:
             return False
             
         try:
             if isinstance(value, (dict, list)):
                 value = json.dumps(value)
-            await self.redis_client.hset(key, field, value)
+            await self._execute("hset", key, field, value)
             return True
         except Exception as e:
             logger.error(f"Redis hset error for key {key}.{field}: {e}")
@@ -155,29 +686,26 @@ class RedisManager:
 
     async def hget(self, key: str, field: str, default: Any = None) -> Any:
         """Get hash field"""
-        if not self.is_connected:
+        if not self.available:
             return default
             
         try:
-            value = await self.redis_client.hget(key, field)
+            value = await self._execute("hget", key, field)
             if value is None:
                 return default
                 
-            try:
-                return json.loads(value)
-            except json.JSONDecodeError:
-                return value
+            return self._deserialize(value)
         except Exception as e:
             logger.error(f"Redis hget error for key {key}.{field}: {e}")
             return default
 
     async def hgetall(self, key: str) -> dict:
         """Get all hash fields"""
-        if not self.is_connected:
+        if not self.available:
             return {}
             
         try:
-            return await self.redis_client.hgetall(key)
+            return await self._execute("hgetall", key)
         except Exception as e:
             logger.error(f"Redis hgetall error for key {key}: {e}")
             return {}
@@ -185,22 +713,22 @@ class RedisManager:
     # Set operations
     async def sadd(self, key: str, *values) -> int:
         """Add to set"""
-        if not self.is_connected:
+        if not self.available:
             return 0
             
         try:
-            return await self.redis_client.sadd(key, *values)
+            return await self._execute("sadd", key, *values)
         except Exception as e:
             logger.error(f"Redis sadd error for key {key}: {e}")
             return 0
 
     async def smembers(self, key: str) -> set:
         """Get set members"""
-        if not self.is_connected:
+        if not self.available:
             return set()
             
         try:
-            return await self.redis_client.smembers(key)
+            return await self._execute("smembers", key)
         except Exception as e:
             logger.error(f"Redis smembers error for key {key}: {e}")
             return set()
@@ -208,65 +736,145 @@ class RedisManager:
     # List operations
     async def lpush(self, key: str, *values) -> int:
         """Push to list"""
-        if not self.is_connected:
+        if not self.available:
             return 0
             
         try:
             serialized_values = [json.dumps(v) if isinstance(v, (dict, list)) else str(v) for v in values]
-            return await self.redis_client.lpush(key, *serialized_values)
+            return await self._execute("lpush", key, *serialized_values)
         except Exception as e:
             logger.error(f"Redis lpush error for key {key}: {e}")
             return 0
 
     async def lrange(self, key: str, start: int = 0, end: int = -1) -> list:
         """Get list range"""
-        if not self.is_connected:
+        if not self.available:
             return []
             
         try:
-            values = await self.redis_client.lrange(key, start, end)
-            result = []
-            for v in values:
-                try:
-                    result.append(json.loads(v))
-                except json.JSONDecodeError:
-                    result.append(v)
-            return result
+            values = await self._execute("lrange", key, start, end)
+            return [self._deserialize(v) for v in values]
         except Exception as e:
             logger.error(f"Redis lrange error for key {key}: {e}")
             return []
 
     async def ltrim(self, key: str, start: int, end: int) -> bool:
         """Trim list"""
-        if not self.is_connected:
+        if not self.available:
             return False
             
         try:
-            await self.redis_client.ltrim(key, start, end)
+            await self._execute("ltrim", key, start, end)
             return True
         except Exception as e:
             logger.error(f"Redis ltrim error for key {key}: {e}")
             return False
 
+    # Sorted set operations
+    async def zrange(self, key: str, start: int = 0, end: int = -1, withscores: bool = False, desc: bool = False) -> list:
+        """Get sorted set range by rank"""
+        if not self.available:
+            return []
+            
+        try:
+            return await self._execute("zrange", key, start, end, desc=desc, withscores=withscores)
+        except Exception as e:
+            logger.error(f"Redis zrange error for key {key}: {e}")
+            return []
+
+    # Server-side scripts
+    async def evalsha(self, script: str, keys: List[str], args: List[Any]) -> Any:
+        """
+        Run a Lua script by its SHA1, loading it only when Redis reports NOSCRIPT
+        (first use, restart or SCRIPT FLUSH). Raises on failure - the in-memory
+        fallback cannot run scripts, so callers need their own degraded path.
+        """
+        sha = self._script_shas.get(script)
+        if sha is None:
+            sha = self._script_shas[script] = hashlib.sha1(script.encode("utf-8")).hexdigest()
+        try:
+            return await self._execute("evalsha", sha, len(keys), *keys, *args)
+        except NoScriptError:
+            # Loaded on every node when sharded
+            await self._execute("script_load", script)
+            return await self._execute("evalsha", sha, len(keys), *keys, *args)
+
     # Pattern matching
+    async def scan_iter(self, pattern: str, count: int = None) -> AsyncIterator[List[str]]:
+        """
+        Walk keys matching pattern incrementally with SCAN, yielding one batch per call.
+        Unlike KEYS this never blocks Redis for the whole keyspace; a key may be
+        returned more than once if the keyspace is rehashed during the walk.
+        """
+        if not self.available:
+            return
+            
+        cursor = 0
+        count = count or settings.REDIS_SCAN_COUNT
+        try:
+            while True:
+                cursor, batch = await self._execute("scan", cursor=cursor, match=pattern, count=count)
+                if batch:
+                    yield batch
+                if cursor == 0:
+                    break
+        except Exception as e:
+            logger.error(f"Redis scan error for pattern {pattern}: {e}")
+
     async def keys(self, pattern: str) -> list:
-        """Find keys by pattern"""
-        if not self.is_connected:
+        """Find keys by pattern (blocks Redis - prefer scan_iter)"""
+        if not self.available:
             return []
             
         try:
-            return await self.redis_client.keys(pattern)
+            return await self._execute("keys", pattern)
         except Exception as e:
             logger.error(f"Redis keys error for pattern {pattern}: {e}")
             return []
 
     # Pipeline operations for bulk commands
-    async def pipeline(self):
-        """Get pipeline for bulk operations"""
-        if not self.is_connected:
+    async def pipeline(self, raw: bool = False, transaction: bool = True):
+        """
+        Get pipeline for bulk operations (raw=True for codec-encoded bytes values).
+        Returns an in-memory pipeline while the breaker is open, None only if that's disabled.
+        """
+        if await self._remote_ready():
+            client = self.raw_client if raw else self.redis_client
+            return BreakerPipeline(self, client.pipeline(transaction=transaction), raw)
+        return self._memory_pipeline(raw)
+
+    def encode(self, key: str, value: Any) -> Any:
+        """Encode a value for `key` the way set() would, for use in raw pipelines"""
+        codec = codec_for(self.codecs, key)
+        return codec.encode(value) if codec else self._serialize(value)
+
+    def decode(self, key: str, value: Any) -> Any:
+        """Decode a value read from `key` through a raw pipeline"""
+        if value is None:
             return None
-            
-        return self.redis_client.pipeline()
+        codec = codec_for(self.codecs, key)
+        if codec:
+            return codec.decode(value)
+        if isinstance(value, bytes):
+            value = value.decode("utf-8")
+        return self._deserialize(value)
+
+    def stats(self) -> dict:
+        stats = {
+            "connected": self.is_connected,
+            "circuit_breaker": self.breaker.stats(),
+            "recovering": self._recovery is not None and not self._recovery.done(),
+            "auto_pipeline": self.auto_pipeline.stats() if self.auto_pipeline else None,
+            "near_cache": self.near_cache.stats() if self.near_cache else None,
+            "fallback": None,
+        }
+        if self.memory_store is not None:
+            stats["fallback"] = {
+                "keys": len(self.memory_store.data),
+                "journaled_writes": len(self.memory_store.journal),
+                "dropped_writes": self.memory_store.journal_dropped,
+            }
+        return stats
 
 # Global Redis instance
 redis_manager = RedisManager()
\ No newline at end of file
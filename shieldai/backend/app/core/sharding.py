@@ -0,0 +1,292 @@
+import asyncio
+import bisect
+import functools
+import hashlib
+from collections import defaultdict
+from typing import Any, Callable, List, Tuple
+from urllib.parse import urlsplit
+
+from redis.exceptions import ResponseError
+
+# Keys spread over several shards: split per shard, results merged back
+_SUM_COMMANDS = frozenset({"delete", "unlink", "exists", "touch"})
+# Commands without keys that every node must see
+_BROADCAST_COMMANDS = frozenset({"ping", "script_load", "script_flush", "flushdb"})
+# Multi-key commands Redis runs on one node: allowed only when every key lands on the same one
+_SAME_NODE_COMMANDS = frozenset({
+    "pfcount", "pfmerge", "sunion", "sinter", "sdiff", "sunionstore", "sinterstore", "sdiffstore",
+    "zunion", "zinter", "zdiff", "zunionstore", "zinterstore", "zdiffstore",
+    "rename", "renamenx", "smove", "rpoplpush", "lmove", "copy", "msetnx",
+})
+
+def hash_tag(key: Any) -> str:
+    """The part of a key that decides its shard: the first non-empty {...} section, else the whole key"""
+    if isinstance(key, bytes):
+        key = key.decode("utf-8")
+    key = str(key)
+    start = key.find("{")
+    if start != -1:
+        end = key.find("}", start + 1)
+        if end > start + 1:
+            return key[start + 1:end]
+    return key
+
+def _hash(value: str) -> int:
+    return int.from_bytes(hashlib.blake2b(value.encode("utf-8"), digest_size=8).digest(), "big")
+
+def node_name(url: str) -> str:
+    """Ring identity of a node - its address without credentials, so password rotation moves no keys"""
+    parts = urlsplit(url)
+    return f"{parts.hostname}:{parts.port or 6379}{parts.path or '/0'}"
+
+class HashRing:
+    """
+    Consistent hashing with virtual nodes. Adding or removing one of N nodes
+    moves roughly 1/N of the keys; keys sharing a hash tag always stay together.
+    """
+
+    def __init__(self, nodes: List[str], replicas: int = 160):
+        points = sorted(
+            (_hash(f"{name}#{replica}"), index)
+            for index, name in enumerate(nodes)
+            for replica in range(replicas)
+        )
+        self._points = [point for point, _ in points]
+        self._nodes = [index for _, index in points]
+
+    def node_for(self, key: Any) -> int:
+        position = bisect.bisect(self._points, _hash(hash_tag(key))) % len(self._points)
+        return self._nodes[position]
+
+Part = Tuple[int, tuple, dict]
+
+class ShardedClient:
+    """
+    Presents several redis.asyncio clients as one. Single-key commands go to the
+    key's node; multi-key commands are split per node and merged, or - when Redis
+    has to run them on one node (PFCOUNT, SUNION, ...) - refused with CROSSSLOT
+    unless their keys share a node. SCAN walks the nodes in turn and KEYS asks them
+    all. Transactions are only atomic per node, so keys that must change together
+    should share a hash tag.
+    """
+
+    def __init__(self, clients: list, ring: HashRing):
+        self.clients = clients
+        self.ring = ring
+
+    def split(self, command: str, args: tuple, kwargs: dict) -> Tuple[List[Part], Callable[[list], Any]]:
+        """Route a command: the per-node parts to run and how to merge their results"""
+        if command in _BROADCAST_COMMANDS:
+            return [(i, args, kwargs) for i in range(len(self.clients))], _first
+
+        if command == "mget" or command in _SUM_COMMANDS:
+            keys = list(args[0]) + list(args[1:]) if command == "mget" and isinstance(args[0], (list, tuple)) else list(args)
+            groups = defaultdict(list)
+            for position, key in enumerate(keys):
+                groups[self.ring.node_for(key)].append(position)
+            nodes = list(groups)
+            if command == "mget":
+                parts = [(node, ([keys[p] for p in groups[node]],), kwargs) for node in nodes]
+            else:
+                parts = [(node, tuple(keys[p] for p in groups[node]), kwargs) for node in nodes]
+
+            def merge(results):
+                error = next((r for r in results if isinstance(r, Exception)), None)
+                if error is not None:
+                    return error
+                if command != "mget":
+                    return sum(results)
+                values = [None] * len(keys)
+                for node, result in zip(nodes, results):
+                    for position, value in zip(groups[node], result):
+                        values[position] = value
+                return values
+            return parts, merge
+
+        if command == "mset":
+            groups = defaultdict(dict)
+            for key, value in args[0].items():
+                groups[self.ring.node_for(key)][key] = value
+            parts = [(node, (mapping,), kwargs) for node, mapping in groups.items()]
+            return parts, lambda results: next((r for r in results if isinstance(r, Exception)), all(results))
+
+        if command == "keys":
+            return [(i, args, kwargs) for i in range(len(self.clients))], _concat
+
+        if command == "scan":
+            # The cursor is per node - only ShardedClient.scan() knows how to walk them all
+            raise ResponseError("SCAN can't be routed as a single command across shards; call scan()")
+
+        if command in ("eval", "evalsha"):
+            # script, numkeys, keys..., args... - routed by the first key
+            key = args[2] if int(args[1]) > 0 else ""
+            return [(self.ring.node_for(key), args, kwargs)], _first
+
+        if command in _SAME_NODE_COMMANDS:
+            nodes = {self.ring.node_for(key) for key in _keys_of(command, args)}
+            if len(nodes) != 1:
+                raise ResponseError(f"CROSSSLOT Keys in {command.upper()} don't hash to the same node")
+            return [(nodes.pop(), args, kwargs)], _first
+
+        key = args[0] if args else kwargs.get("name")
+        if key is None:
+            raise ResponseError(f"{command.upper()} has no key to route by")
+        return [(self.ring.node_for(key), args, kwargs)], _first
+
+    def __getattr__(self, command: str):
+        if command.startswith("_"):
+            raise AttributeError(command)
+
+        async def call(*args, **kwargs):
+            parts, merge = self.split(command, args, kwargs)
+            if len(parts) == 1:
+                node, node_args, node_kwargs = parts[0]
+                return await getattr(self.clients[node], command)(*node_args, **node_kwargs)
+            results = await asyncio.gather(*(
+                getattr(self.clients[node], command)(*node_args, **node_kwargs)
+                for node, node_args, node_kwargs in parts
+            ))
+            merged = merge(list(results))
+            if isinstance(merged, Exception):
+                raise merged
+            return merged
+        return call
+
+    async def scan(self, cursor: int = 0, match: str = None, count: int = None, **kwargs):
+        # Cursor packs the node index into the low digits: inner_cursor * nodes + node
+        nodes = len(self.clients)
+        node, inner = int(cursor) % nodes, int(cursor) // nodes
+        inner, keys = await self.clients[node].scan(cursor=inner, match=match, count=count, **kwargs)
+        if inner:
+            return inner * nodes + node, keys
+        return (node + 1 if node + 1 < nodes else 0), keys
+
+    async def keys(self, pattern: str = "*"):
+        results = await asyncio.gather(*(client.keys(pattern) for client in self.clients))
+        return [key for result in results for key in result]
+
+    async def close(self):
+        await asyncio.gather(*(client.close() for client in self.clients))
+
+    def pipeline(self, transaction: bool = True) -> "ShardedPipeline":
+        return ShardedPipeline(self, transaction)
+
+class ShardedPipeline:
+    """
+    Buffers commands, runs one pipeline per node concurrently and returns the
+    results in the original order. WATCH pins the pipeline to the watched keys' node.
+    """
+
+    def __init__(self, sharded: ShardedClient, transaction: bool = True):
+        self._sharded = sharded
+        self._transaction = transaction
+        self._commands: List[tuple] = []
+        self._pinned = None
+
+    @property
+    def watching(self) -> bool:
+        return self._pinned is not None and self._pinned.watching
+
+    def __getattr__(self, command: str):
+        if command.startswith("_"):
+            raise AttributeError(command)
+
+        def queue(*args, **kwargs):
+            if self._pinned is not None:
+                result = getattr(self._pinned, command)(*args, **kwargs)
+                return self if result is self._pinned else result
+            self._commands.append((command, args, kwargs))
+            return self
+        return queue
+
+    async def watch(self, *names):
+        nodes = {self._sharded.ring.node_for(name) for name in names}
+        if len(nodes) != 1:
+            raise ResponseError("CROSSSLOT Keys in WATCH don't hash to the same node")
+        if self._commands:
+            raise ResponseError("WATCH must come before any buffered command")
+        self._pinned = self._sharded.clients[nodes.pop()].pipeline(transaction=self._transaction)
+        await self._pinned.watch(*names)
+
+    def multi(self):
+        if self._pinned is not None:
+            self._pinned.multi()
+
+    async def reset(self):
+        self._commands = []
+        if self._pinned is not None:
+            pinned, self._pinned = self._pinned, None
+            await pinned.reset()
+
+    async def execute(self, raise_on_error: bool = True) -> list:
+        if self._pinned is not None:
+            pinned, self._pinned = self._pinned, None
+            return await pinned.execute(raise_on_error=raise_on_error)
+
+        commands, self._commands = self._commands, []
+        pipelines = {}
+        plan = []
+        for command, args, kwargs in commands:
+            try:
+                parts, merge = self._sharded.split(command, args, kwargs)
+            except ResponseError as e:
+                # Fails this command only, like a per-command error from Redis
+                plan.append(([], functools.partial(_raise_later, e)))
+                continue
+            slots = []
+            for node, node_args, node_kwargs in parts:
+                if node not in pipelines:
+                    pipelines[node] = [self._sharded.clients[node].pipeline(transaction=self._transaction), 0]
+                pipeline = pipelines[node]
+                getattr(pipeline[0], command)(*node_args, **node_kwargs)
+                slots.append((node, pipeline[1]))
+                pipeline[1] += 1
+            plan.append((slots, merge))
+
+        nodes = list(pipelines)
+        outcomes = await asyncio.gather(
+            *(pipelines[node][0].execute(raise_on_error=raise_on_error) for node in nodes),
+            return_exceptions=True
+        )
+        results = {}
+        for node, outcome in zip(nodes, outcomes):
+            if isinstance(outcome, BaseException):
+                raise outcome
+            results[node] = outcome
+
+        merged = [merge([results[node][index] for node, index in slots]) for slots, merge in plan]
+        if raise_on_error:
+            error = next((r for r in merged if isinstance(r, Exception)), None)
+            if error is not None:
+                raise error
+        return merged
+
+def _first(results: list) -> Any:
+    return results[0]
+
+def _concat(results: list) -> Any:
+    error = next((r for r in results if isinstance(r, Exception)), None)
+    if error is not None:
+        return error
+    return [item for result in results for item in result]
+
+def _raise_later(error: Exception, results: list) -> Exception:
+    return error
+
+def _keys_of(command: str, args: tuple) -> list:
+    """Keys of a _SAME_NODE_COMMANDS call: leading key arguments, with key lists flattened"""
+    if command in ("rename", "renamenx", "smove", "rpoplpush", "lmove", "copy"):
+        candidates = args[:2]
+    elif command in ("zunionstore", "zinterstore", "zdiffstore"):
+        candidates = args[:2]
+    elif command in ("zunion", "zinter", "zdiff", "msetnx"):
+        candidates = args[:1]
+    else:
+        candidates = args
+    keys = []
+    for candidate in candidates:
+        if isinstance(candidate, (dict, list, tuple, set)):
+            keys.extend(candidate)
+        else:
+            keys.append(candidate)
+    return keys
@@ -0,0 +1,69 @@
+import hashlib
+from typing import Dict, List, Tuple
+
+class CountMinSketch:
+    """
+    Frequency estimates in fixed memory (width x depth counters). Estimates never
+    undercount; they overcount by at most 2N/width with probability 1 - 2^-depth.
+    """
+
+    __slots__ = ("width", "depth", "rows", "total")
+
+    def __init__(self, width: int = 1024, depth: int = 4):
+        self.width = width
+        self.depth = depth
+        self.rows = [[0] * width for _ in range(depth)]
+        self.total = 0
+
+    def _columns(self, item: str) -> List[int]:
+        # Both halves of one 64-bit digest give every row its column (Kirsch-Mitzenmacher)
+        digest = hashlib.blake2b(item.encode("utf-8"), digest_size=8).digest()
+        h1, h2 = int.from_bytes(digest[:4], "big"), int.from_bytes(digest[4:], "big") | 1
+        return [(h1 + row * h2) % self.width for row in range(self.depth)]
+
+    def add(self, item: str, count: int = 1) -> int:
+        """Count `item` and return its new estimate"""
+        self.total += count
+        estimate = None
+        for row, column in zip(self.rows, self._columns(item)):
+            row[column] += count
+            estimate = row[column] if estimate is None else min(estimate, row[column])
+        return estimate
+
+    def estimate(self, item: str) -> int:
+        return min(row[column] for row, column in zip(self.rows, self._columns(item)))
+
+class TopK:
+    """
+    Heavy hitters of a stream: a Count-Min Sketch estimates every item, and the
+    `capacity` items with the highest estimates are kept as candidates. Per-event
+    work is O(depth); the O(capacity) minimum scan only runs when an item beats
+    the current smallest candidate.
+    """
+
+    __slots__ = ("capacity", "sketch", "candidates", "_floor")
+
+    def __init__(self, capacity: int = 50, width: int = 1024, depth: int = 4):
+        self.capacity = capacity
+        self.sketch = CountMinSketch(width, depth)
+        self.candidates: Dict[str, int] = {}
+        # Lower bound of the smallest candidate count (candidate counts only grow)
+        self._floor = 0
+
+    def add(self, item: str, count: int = 1):
+        estimate = self.sketch.add(item, count)
+        if item in self.candidates or len(self.candidates) < self.capacity:
+            self.candidates[item] = estimate
+            return
+        if estimate <= self._floor:
+            return
+        smallest = min(self.candidates, key=self.candidates.get)
+        self._floor = self.candidates[smallest]
+        if estimate > self._floor:
+            del self.candidates[smallest]
+            self.candidates[item] = estimate
+            self._floor = min(self.candidates.values())
+
+    def top(self, k: int = None) -> List[Tuple[str, int]]:
+        ranked = sorted(self.candidates.items(), key=lambda item: item[1], reverse=True)
+        return ranked[:k] if k else ranked
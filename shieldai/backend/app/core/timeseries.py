@@ -0,0 +1,95 @@
+from datetime import datetime, timezone
+from typing import Dict, List, Optional, Sequence, Tuple
+
+class Resolution:
+    """Bucket width and how long buckets of that width are kept (both in seconds)"""
+
+    __slots__ = ("name", "step", "retention")
+
+    def __init__(self, name: str, step: int, retention: int):
+        self.name = name
+        self.step = step
+        self.retention = retention
+
+    def bucket(self, timestamp: float) -> int:
+        return int(timestamp // self.step)
+
+    @property
+    def ttl(self) -> int:
+        # A bucket is written for one step, then kept for the retention period
+        return self.retention + self.step
+
+class Rollups:
+    """
+    Counter hashes kept at several resolutions at once. Each recorded delta is
+    added to its minute, hour and day bucket (through the write-combining
+    aggregator, so one flush covers every resolution), and every bucket gets its
+    TTL when written - retention needs no sweeps. Range queries pick the finest
+    resolution that still holds the range and read all buckets in one pipeline.
+    """
+
+    def __init__(self, prefix: str, resolutions: Sequence[Resolution], max_points: int = 400):
+        self.prefix = prefix
+        # Finest first
+        self.resolutions = sorted(resolutions, key=lambda r: r.step)
+        self.max_points = max_points
+
+    def resolution(self, name: str) -> Optional[Resolution]:
+        return next((r for r in self.resolutions if r.name == name), None)
+
+    def key(self, resolution: Resolution, bucket: int) -> str:
+        return f"{self.prefix}:{resolution.name}:{bucket}"
+
+    def record(self, aggregator, timestamp: float, fields: Dict[str, int]):
+        for resolution in self.resolutions:
+            key = self.key(resolution, resolution.bucket(timestamp))
+            for field, amount in fields.items():
+                aggregator.hincr(key, field, amount)
+            aggregator.expire(key, resolution.ttl)
+
+    def resolution_for(self, start: float, end: float, now: float) -> Resolution:
+        """Finest resolution still retaining `start` with at most max_points buckets"""
+        for resolution in self.resolutions:
+            points = resolution.bucket(end) - resolution.bucket(start) + 1
+            if now - start <= resolution.retention and points <= self.max_points:
+                return resolution
+        return self.resolutions[-1]
+
+    async def query(
+        self,
+        redis,
+        start: float,
+        end: float,
+        now: float,
+        resolution: Optional[Resolution] = None
+    ) -> Tuple[Resolution, List[Tuple[int, Dict[str, int]]]]:
+        """(resolution, [(bucket start timestamp, counters)]) for every bucket in [start, end]"""
+        resolution = resolution or self.resolution_for(start, end, now)
+        first = resolution.bucket(max(start, now - resolution.retention))
+        buckets = list(range(first, resolution.bucket(end) + 1))[-self.max_points:]
+        results = await redis.hgetall_many([self.key(resolution, bucket) for bucket in buckets])
+        return resolution, [
+            (bucket * resolution.step, {field: int(value) for field, value in fields.items()})
+            for bucket, fields in zip(buckets, results)
+        ]
+
+def period_of(timestamp: int, group: str) -> str:
+    """Label of the calendar period (UTC) a bucket falls in: day, week (ISO), month, else the bucket itself"""
+    moment = datetime.fromtimestamp(timestamp, timezone.utc)
+    if group == "week":
+        year, week, _ = moment.isocalendar()
+        return f"{year}-W{week:02d}"
+    if group == "month":
+        return moment.strftime("%Y-%m")
+    if group == "day":
+        return moment.strftime("%Y-%m-%d")
+    return moment.isoformat()
+
+def group_points(points: List[Tuple[int, Dict[str, int]]], group: str) -> Dict[str, Dict[str, int]]:
+    """Sum bucket counters per calendar period, oldest first"""
+    grouped: Dict[str, Dict[str, int]] = {}
+    for timestamp, fields in points:
+        totals = grouped.setdefault(period_of(timestamp, group), {})
+        for field, value in fields.items():
+            totals[field] = totals.get(field, 0) + value
+    return grouped
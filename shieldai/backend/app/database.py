@@ -1,57 +1,107 @@
-from sqlalchemy import create_engine
-from sqlalchemy.ext.declarative import declarative_base
-from sqlalchemy.orm import sessionmaker
+from sqlalchemy import event, text
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
+from sqlalchemy.orm import declarative_base
+from typing import AsyncIterator
 import os
 import logging
 
+from app.core.config import settings
+
 logger = logging.getLogger(__name__)
 
+# Async driver for each backend a DATABASE_URL can name
+ASYNC_DRIVERS = {
+    "sqlite": "sqlite+aiosqlite",
+    "postgres": "postgresql+asyncpg",
+    "postgresql": "postgresql+asyncpg",
+}
+
+def async_database_url(url: str):
+    """Resolve a configured URL (postgres://, postgresql://, sqlite:///...) to its async driver"""
+    url = make_url(url)
+    backend = url.drivername.split("+", 1)[0]
+    if backend not in ASYNC_DRIVERS:
+        raise ValueError(f"Unsupported database backend: {backend}")
+    return url.set(drivername=ASYNC_DRIVERS[backend])
+
+def _tune_sqlite(dbapi_connection, connection_record):
+    # Applied to every new pooled connection; WAL keeps readers off the writer's lock
+    cursor = dbapi_connection.cursor()
+    cursor.execute(f"PRAGMA journal_mode={settings.SQLITE_JOURNAL_MODE}")
+    cursor.execute(f"PRAGMA synchronous={settings.SQLITE_SYNCHRONOUS}")
+    cursor.execute(f"PRAGMA mmap_size={settings.SQLITE_MMAP_SIZE}")
+    cursor.execute(f"PRAGMA busy_timeout={settings.SQLITE_BUSY_TIMEOUT_MS}")
+    cursor.execute("PRAGMA temp_store=MEMORY")
+    cursor.close()
+
 def get_database_engine():
-    # Try different SQLite configurations
-    db_paths = [
-        "/app/shieldai.db",  # Absolute path in container
-        "./shieldai.db",     # Relative path
-        ":memory:",          # In-memory fallback
-    ]
-    
-    for db_path in db_paths:
-        if db_path == ":memory:":
-            db_url = "sqlite:///:memory:"
-        else:
-            db_url = f"sqlite:///{db_path}"
-        
-        logger.info(f"Trying database: {db_url}")
-        
-        try:
-            if db_path != ":memory:":
-                # Try to create the directory if it doesn't exist
-                os.makedirs(os.path.dirname(db_path), exist_ok=True)
-            
-            engine = create_engine(db_url, connect_args={"check_same_thread": False})
-            with engine.connect() as conn:
-                conn.execute("SELECT 1")
-            logger.info(f"✅ Database connection successful: {db_url}")
-            return engine
-        except Exception as e:
-            logger.warning(f"Failed with {db_url}: {e}")
-            continue
-    
-    # Final fallback
-    logger.info("🔄 Using in-memory SQLite database as final fallback")
-    return create_engine("sqlite:///:memory:", connect_args={"check_same_thread": False})
+    """
+    Async engine for settings.DATABASE_URL. Nothing connects here, so a
+    misconfigured database shows up in check_database() instead of silently
+    becoming an in-memory one.
+    """
+    url = async_database_url(settings.DATABASE_URL)
+    sqlite = url.get_backend_name() == "sqlite"
+    options = {"echo": settings.DATABASE_ECHO}
+
+    # In-memory SQLite lives in one connection, which SQLAlchemy pools statically
+    if not (sqlite and url.database in (None, "", ":memory:")):
+        if sqlite and os.path.dirname(url.database):
+            os.makedirs(os.path.dirname(url.database), exist_ok=True)
+        options.update(
+            pool_size=settings.DATABASE_POOL_SIZE,
+            max_overflow=settings.DATABASE_MAX_OVERFLOW,
+            pool_timeout=settings.DATABASE_POOL_TIMEOUT,
+            pool_recycle=settings.DATABASE_POOL_RECYCLE,
+            pool_pre_ping=settings.DATABASE_POOL_PRE_PING
+        )
+
+    engine = create_async_engine(url, **options)
+    if sqlite:
+        event.listen(engine.sync_engine, "connect", _tune_sqlite)
+    logger.info(f"Database engine: {url.render_as_string(hide_password=True)}")
+    return engine
 
 
 engine = get_database_engine()
-SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+SessionLocal = async_sessionmaker(engine, expire_on_commit=False, autoflush=False)
 Base = declarative_base()
 
-def get_db():
-    db = SessionLocal()
-    try:
+async def get_db() -> AsyncIterator[AsyncSession]:
+    """FastAPI dependency: one session per request, returned to the pool afterwards"""
+    async with SessionLocal() as db:
         yield db
-    finally:
-        db.close()
 
-def create_tables():
-    Base.metadata.create_all(bind=engine)
+async def create_tables():
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
     logger.info("✅ Database tables created")
+
+async def check_database() -> bool:
+    try:
+        async with engine.connect() as conn:
+            await conn.execute(text("SELECT 1"))
+        return True
+    except Exception as e:
+        logger.warning(f"Database check failed: {e}")
+        return False
+
+def pool_stats() -> dict:
+    pool = engine.pool
+    stats = {
+        "backend": engine.url.get_backend_name(),
+        "driver": engine.url.get_driver_name(),
+        "pool": type(pool).__name__
+    }
+    # Static and null pools have no size or checkout counters
+    for name in ("size", "checkedin", "checkedout", "overflow"):
+        method = getattr(pool, name, None)
+        if callable(method):
+            stats[name] = method()
+    if "size" in stats:
+        stats["max_overflow"] = settings.DATABASE_MAX_OVERFLOW
+    return stats
+
+async def dispose():
+    await engine.dispose()
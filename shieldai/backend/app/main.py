@@ -1,4 +1,4 @@
-from fastapi import FastAPI, Depends, HTTPException
+from fastapi import FastAPI, Depends, HTTPException, Request
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.middleware.gzip import GZipMiddleware
 import logging
@@ -45,13 +45,15 @@ except ImportError as e:
                 "processing_time": 0.05,
                 "cultural_context": {"region": "Kenya"}
             }
+        async def batch_analyze(self, texts, platform, context=None):
+            return [await self.analyze_optimized(text, platform, context) for text in texts]
     ai_engine = MockAIEngine()
 
 # Database imports with error handling
 try:
-    from app.database import get_db, create_tables
+    from app.database import check_database, create_tables, dispose as dispose_database, get_db, pool_stats
     from app.models import AnalysisResult
-    from app.schemas import AnalyzeRequest, BatchAnalyzeRequest
+    from app.schemas import AnalyzeRequest, AnalyzeThreadRequest, BatchAnalyzeRequest, JobSubmitRequest
     DATABASE_AVAILABLE = True
     logger.info("✅ Database imports successful")
     
@@ -63,10 +65,16 @@ except ImportError as e:
     logger.warning(f"Database imports failed: {e}")
     DATABASE_AVAILABLE = False
     # Create mock functions
-    def get_db():
-        return None
-    def create_tables():
+    async def get_db():
+        yield None
+    async def create_tables():
+        pass
+    async def check_database():
+        return False
+    async def dispose_database():
         pass
+    def pool_stats():
+        return {"backend": None}
     class AnalysisResult:
         pass
     class AnalyzeRequest:
@@ -77,6 +85,48 @@ except ImportError as e:
         def __init__(self, texts=None, platform="generic"):
             self.texts = texts or []
             self.platform = platform
+    class JobSubmitRequest(BatchAnalyzeRequest):
+        pass
+    class AnalyzeThreadRequest(AnalyzeRequest):
+        def __init__(self, thread_id="", text="", platform="generic"):
+            super().__init__(text, platform)
+            self.thread_id = thread_id
+
+from app.core.config import settings
+from app.core.http import FastJSONResponse, payload_response
+from app.core.middleware import BODY_COST, RateLimitMiddleware, api_key_identity
+from app.core.redis import redis_manager
+from app.core.serialization import dumps
+from app.services.analytics import analytics_service, init_hash_key
+from app.services.cache import cache_service
+from app.services.catalog import catalog_service
+from app.services.conversations import conversation_service
+from app.services.jobs import JobLimitExceeded, job_manager
+from app.services.persistence import result_writer
+from app.services.rate_limiter import rate_limiter
+from app.services.rule_bundle import rule_bundle_service
+from app.services.stats_snapshot import stats_snapshot
+from app.services.verdict_cache import verdict_cache
+from app.services.results import encode_batch_response, encode_result
+
+def tenant_id(request: Request) -> str:
+    """Identify the caller for per-tenant limits: a configured API key (hashed), else the client IP"""
+    identity = api_key_identity(request.headers.get("x-api-key"))
+    if identity:
+        return identity
+    return f"ip:{request.client.host if request.client else 'unknown'}"
+
+def analytics_user(request: Request) -> str:
+    """Caller identity for unique-user analytics (anonymized again before it is stored)"""
+    return request.headers.get("x-user-id") or tenant_id(request)
+
+def catalog_response(request: Request, name: str):
+    """Serve a static catalog from its precomputed payload"""
+    payload = catalog_service.get(name)
+    if payload is None:
+        raise HTTPException(status_code=503, detail={"error": "catalog_unavailable", "catalog": name})
+    cache_control = f"public, max-age={settings.CATALOG_MAX_AGE}, stale-while-revalidate={settings.CATALOG_MAX_AGE * 24}"
+    return payload_response(request, payload, cache_control)
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
@@ -86,11 +136,34 @@ async def lifespan(app: FastAPI):
     # Database initialization
     if DATABASE_AVAILABLE:
         try:
-            create_tables()
-            logger.info("✅ Database tables created")
+            await create_tables()
         except Exception as e:
             logger.warning(f"Could not create database tables: {e}")
     
+    # Redis is optional - services fall back to local state without it
+    try:
+        await redis_manager.connect()
+    except Exception as e:
+        logger.warning(f"Continuing without Redis: {e}")
+    
+    # Anonymization secret (refuses to start in production without one)
+    await init_hash_key(is_production)
+    
+    # Buffered analytics writes, flushed in the background
+    analytics_service.start()
+    
+    # Preload the hottest cache entries of the previous process
+    cache_service.start()
+    
+    # Analysis history is written behind the request path in batches
+    await result_writer.start()
+    
+    # Dashboard stats are rebuilt off the request path
+    await stats_snapshot.start()
+    
+    # Serialize and compress static catalogs once
+    catalog_service.preload()
+    
     # Load AI models
     try:
         logger.info("🔄 Loading AI models...")
@@ -100,6 +173,18 @@ async def lifespan(app: FastAPI):
         logger.error(f"❌ Failed to load AI models: {e}")
         logger.info("🔄 Continuing without AI models - will use fallback")
     
+    # Export the client prescreen bundle for the loaded rules
+    try:
+        await rule_bundle_service.publish(getattr(ai_engine, "toxic_patterns", []))
+    except Exception as e:
+        logger.error(f"❌ Failed to publish rule bundle: {e}")
+    
+    # Background workers for large batch jobs (resumes unfinished jobs)
+    try:
+        await job_manager.start(ai_engine)
+    except Exception as e:
+        logger.error(f"❌ Failed to start job workers: {e}")
+    
     startup_duration = time.time() - startup_time
     logger.info(f"✅ Startup completed in {startup_duration:.2f} seconds")
     
@@ -107,6 +192,13 @@ async def lifespan(app: FastAPI):
     
     # Shutdown
     logger.info("🛑 Shutting down ShieldAI Backend...")
+    await job_manager.stop()
+    await stats_snapshot.stop()
+    await cache_service.stop()
+    await analytics_service.stop()
+    await result_writer.stop()
+    await dispose_database()
+    await redis_manager.disconnect()
 
 # Production settings
 is_production = os.getenv("ENVIRONMENT") == "production"
@@ -120,6 +212,26 @@ app = FastAPI(
     redoc_url="/redoc"
 )
 
+# Cost-aware rate limiting - added first so CORS headers still wrap its 429s
+if settings.RATE_LIMIT_ENABLED:
+    app.add_middleware(
+        RateLimitMiddleware,
+        limiter=rate_limiter,
+        limits=lambda: [
+            (settings.RATE_LIMIT_PER_MINUTE, rate_limiter.windows['minute']),
+            (settings.RATE_LIMIT_PER_HOUR, rate_limiter.windows['hour']),
+        ],
+        costs={
+            ("POST", "/analyze"): 1,
+            ("POST", "/analyze/thread"): 1,
+            ("POST", "/analyze/batch"): BODY_COST,
+            # Job throughput is bounded by the per-tenant job limits instead
+            ("POST", "/jobs"): 1,
+        },
+        bytes_per_unit=settings.RATE_LIMIT_BYTES_PER_UNIT,
+        max_body_bytes=settings.BATCH_MAX_BYTES,
+    )
+
 # CORS middleware
 app.add_middleware(
     CORSMiddleware,
@@ -127,6 +239,7 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["RateLimit-Limit", "RateLimit-Remaining", "RateLimit-Reset", "RateLimit-Policy", "Retry-After"],
 )
 
 # Add compression for better performance
@@ -142,7 +255,7 @@ async def health_check():
         "version": "1.0.0",
         "environment": os.getenv("ENVIRONMENT", "development"),
         "region": "Kenya - East Africa",
-        "database": "unavailable",
+        "database": "healthy" if DATABASE_AVAILABLE and await check_database() else "unavailable",
         "ai_engine": "healthy" if AI_ENGINE_AVAILABLE else "mock"
     }
     
@@ -167,79 +280,57 @@ async def root():
     }
 
 @app.get("/stats")
-async def get_stats():
-    """Get analytics statistics for the dashboard"""
-    today = datetime.now().date().isoformat()
-    stats = {
-        "total_requests": 2847,
-        "toxic_requests": 426,
-        "toxicity_rate": 0.15,
-        "platform_count": 4,
-        "uptime_seconds": 86400,
-        "region_focus": "Kenya",
-        "cities_served": ["Nairobi", "Mombasa", "Kisumu", "Nakuru", "Eldoret"],
-        "daily_stats": {
-            today: {
-                "total_analyses": 187,
-                "toxic_analyses": 28,
-                "platforms": {
-                    "twitter": 65,
-                    "facebook": 45,
-                    "instagram": 52,
-                    "whatsapp": 25
-                }
-            }
-        },
-        "timestamp": datetime.now().timestamp(),
-        "fallback": True,
-        "source": "mock"
-    }
-    return stats
+async def get_stats(request: Request):
+    """Get analytics statistics for the dashboard (latest background snapshot)"""
+    payload = stats_snapshot.payload
+    if payload is None:
+        raise HTTPException(status_code=503, detail={"error": "stats_unavailable"})
+    # Shared caches subtract Age from max-age, so they refetch once the next snapshot is due
+    cache_control = f"public, max-age={max(1, int(stats_snapshot.interval))}"
+    return payload_response(request, payload, cache_control, {"Age": str(int(stats_snapshot.age()))})
+
+@app.get("/stats/latency")
+@cache_service.cached(ttl=5, key_prefix="stats.latency", stale_ttl=30)
+async def get_latency_stats(name: str = "stage:engine", window: int = 5):
+    """Latency percentiles for an endpoint or stage over the last `window` minutes, across all workers"""
+    return await analytics_service.get_latency(name, window)
+
+@app.get("/stats/timeseries")
+@cache_service.cached(ttl=5, key_prefix="stats.timeseries", stale_ttl=30)
+async def get_timeseries_stats(hours: float = 24, resolution: str = None, group_by: str = None):
+    """Request counts over the last `hours` from minute/hour/day rollups, optionally per day, week or month"""
+    return await analytics_service.get_timeseries(hours, resolution, group_by)
+
+@app.get("/stats/trending")
+@cache_service.cached(ttl=5, key_prefix="stats.trending", stale_ttl=30)
+async def get_trending_stats(
+    kind: str = "category",
+    platform: str = None,
+    window: int = 15,
+    limit: int = 20,
+    order_by: str = "count"
+):
+    """Top categories, rules, texts or platforms over the last `window` minutes, with their previous-window counts"""
+    return await analytics_service.trending.get_trending(kind, platform, window, limit, order_by)
+
+@app.get("/stats/unique")
+@cache_service.cached(ttl=5, key_prefix="stats.unique", stale_ttl=30)
+async def get_unique_stats(days: int = 7, platform: str = None, category: str = None):
+    """Approximate unique users and texts per day and over the period, across all workers"""
+    return await analytics_service.get_unique_counts(days, platform, category)
 
 @app.get("/resources/kenya")
-async def get_resources():
+async def get_resources(request: Request):
     """Get mental health and support resources for Kenya"""
-    return {
-        "name": "Kenya",
-        "country_code": "KE",
-        "region": "East Africa",
-        "hotlines": [
-            {"name": "Kenya Mental Health Hotline", "number": "1199", "available": "24/7", "free": True, "languages": ["sw", "en"]},
-            {"name": "Nairobi Women's Hospital GBV Hotline", "number": "0800 720 715", "available": "24/7", "free": True, "languages": ["sw", "en"]},
-            {"name": "Gender-Based Violence Hotline", "number": "1199", "available": "24/7", "free": True, "languages": ["sw", "en"]},
-        ],
-        "organizations": [
-            {"name": "Basic Needs Kenya", "website": "https://basicneeds.org", "description": "Mental health and development organization", "focus": "Mental Health"},
-            {"name": "Africa Mental Health Foundation", "website": "https://amhf.or.ke", "description": "Research and mental health advocacy", "focus": "Research"},
-            {"name": "Gender-Based Violence Recovery Centre", "website": "https://gbvrc.or.ke", "description": "Support for survivors of gender-based violence", "focus": "GBV Support"},
-        ],
-        "emergency_services": {
-            "ambulance": "999",
-            "police": "112",
-            "fire": "911",
-            "general_emergency": "112"
-        },
-        "supported_regions": ["Nairobi", "Mombasa", "Kisumu", "Nakuru", "Eldoret", "Kericho", "Kilifi"]
-    }
+    return catalog_response(request, "resources:kenya")
 
 @app.get("/languages/supported")
-async def get_supported_languages():
+async def get_supported_languages(request: Request):
     """Get supported languages for analysis - Kenya Focus (English & Swahili)"""
-    return {
-        "languages": [
-            {"code": "en", "name": "English", "native_name": "English", "region": "Kenya", "speakers_millions": 10, "primary": False},
-            {"code": "sw", "name": "Swahili", "native_name": "Kiswahili", "region": "East Africa", "speakers_millions": 16, "primary": True},
-        ],
-        "default_language": "en",
-        "primary_language": "sw",
-        "auto_detect": True,
-        "region": "Kenya",
-        "supported_countries": ["Kenya"],
-        "note": "Infrastructure ready for future expansion to East Africa"
-    }
+    return catalog_response(request, "languages:supported")
 
 @app.post("/analyze")
-async def analyze_text(request: AnalyzeRequest):
+async def analyze_text(http_request: Request, request: AnalyzeRequest):
     """Analyze single text for toxicity with Kenya context"""
     start_time = time.time()
     
@@ -250,7 +341,9 @@ async def analyze_text(request: AnalyzeRequest):
             "cultural_context": "east_africa"
         }
         
-        result = await ai_engine.analyze_optimized(request.text, request.platform, analysis_context)
+        result = await verdict_cache.analyze(ai_engine, request.text, request.platform, analysis_context)
+        await analytics_service.track_analysis(result, request.platform, analytics_user(http_request), request.text)
+        await result_writer.submit(request.text, request.platform, result)
         
         # Add request metadata
         result["request_id"] = f"req_{int(start_time)}"
@@ -259,9 +352,10 @@ async def analyze_text(request: AnalyzeRequest):
         
         total_processing_time = time.time() - start_time
         result["total_processing_time"] = round(total_processing_time, 4)
+        analytics_service.observe("endpoint:analyze", total_processing_time)
         
         logger.info(f"✅ Analysis completed in {total_processing_time:.4f}s - Toxicity: {result['toxicity_score']}")
-        return result
+        return FastJSONResponse(encode_result(result))
         
     except Exception as e:
         logger.error(f"❌ Analysis failed: {e}")
@@ -275,61 +369,166 @@ async def analyze_text(request: AnalyzeRequest):
             }
         )
 
-@app.post("/analyze/batch")
-async def analyze_batch(request: BatchAnalyzeRequest):
-    """Analyze multiple texts in batch with Kenya context"""
+@app.post("/analyze/thread")
+async def analyze_thread_message(request: Request, message: AnalyzeThreadRequest):
+    """Analyze one new message of a thread and return both message and thread scores"""
     start_time = time.time()
-    results = []
     
-    for i, text in enumerate(request.texts):
-        try:
-            analysis_context = {
-                "platform": request.platform,
-                "region": "Kenya",
-                "cultural_context": "east_africa"
-            }
-            
-            result = await ai_engine.analyze_optimized(text, request.platform, analysis_context)
-            result["batch_index"] = i
-            result["region"] = "Kenya"
-            results.append(result)
-                    
-        except Exception as e:
-            logger.error(f"Batch analysis failed for text {i}: {e}")
-            results.append({
+    try:
+        analysis_context = {
+            "platform": message.platform,
+            "region": "Kenya",
+            "cultural_context": "east_africa"
+        }
+        result = await verdict_cache.analyze(ai_engine, message.text, message.platform, analysis_context)
+        await analytics_service.track_analysis(result, message.platform, analytics_user(request), message.text)
+        await result_writer.submit(message.text, message.platform, result)
+        thread = await conversation_service.track_message(tenant_id(request), message.thread_id, message.text, result)
+        
+        result["request_id"] = f"req_{int(start_time)}"
+        result["timestamp"] = datetime.now().isoformat()
+        result["region"] = "Kenya"
+        result["total_processing_time"] = round(time.time() - start_time, 4)
+        analytics_service.observe("endpoint:analyze_thread", time.time() - start_time)
+        
+        if thread["escalated"]:
+            logger.info(f"⚠️ Thread {message.thread_id} escalated - score {thread['score']}")
+        return FastJSONResponse(b"".join((
+            b'{"message":', encode_result(result),
+            b',"thread":', dumps(thread), b"}"
+        )))
+        
+    except Exception as e:
+        logger.error(f"❌ Thread analysis failed: {e}")
+        raise HTTPException(
+            status_code=500,
+            detail={
                 "error": "analysis_failed",
-                "text": text[:100] + "..." if len(text) > 100 else text,
-                "batch_index": i,
+                "message": "Unable to analyze thread message",
+                "request_id": f"req_{int(start_time)}",
                 "region": "Kenya"
-            })
+            }
+        )
+
+@app.post("/analyze/batch")
+async def analyze_batch(http_request: Request, request: BatchAnalyzeRequest):
+    """Analyze multiple texts in batch with Kenya context"""
+    start_time = time.time()
+    analysis_context = {
+        "platform": request.platform,
+        "region": "Kenya",
+        "cultural_context": "east_africa"
+    }
+    
+    try:
+        results = await verdict_cache.batch_analyze(ai_engine, request.texts, request.platform, analysis_context)
+    except Exception as e:
+        logger.error(f"Batch analysis failed: {e}")
+        results = [None] * len(request.texts)
+    await analytics_service.track_many(results, request.platform, analytics_user(http_request), request.texts)
+    await result_writer.submit_many(request.texts, request.platform, results)
     
     total_time = time.time() - start_time
+    analytics_service.observe("endpoint:analyze_batch", total_time)
     logger.info(f"✅ Batch analysis completed: {len(results)} texts in {total_time:.4f}s")
     
+    return FastJSONResponse(encode_batch_response(
+        results,
+        request.texts,
+        processing_time=round(total_time, 4),
+        timestamp=datetime.now().isoformat(),
+        region="Kenya"
+    ))
+
+def job_status(meta: dict) -> dict:
     return {
-        "results": results,
-        "batch_size": len(request.texts),
-        "processing_time": round(total_time, 4),
-        "timestamp": datetime.now().isoformat(),
-        "region": "Kenya"
+        "job_id": meta["id"],
+        "status": meta["status"],
+        "platform": meta["platform"],
+        "total": meta["total"],
+        "processed": meta["processed"],
+        "toxic_count": meta["toxic_count"],
+        "progress": round(meta["processed"] / max(1, meta["total"]), 4),
+        "created_at": meta["created_at"],
+        "updated_at": meta["updated_at"],
+        "error": meta.get("error"),
+        "results_url": f"/jobs/{meta['id']}/results"
     }
 
+@app.post("/jobs", status_code=202)
+async def submit_job(request: Request, job: JobSubmitRequest):
+    """Queue a large batch analysis and return immediately with a job ID"""
+    try:
+        meta = await job_manager.submit(tenant_id(request), job.texts, job.platform)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail={"error": "invalid_job", "message": str(e)})
+    except JobLimitExceeded as e:
+        raise HTTPException(status_code=429, detail={"error": "too_many_jobs", "message": str(e)})
+    except Exception as e:
+        logger.error(f"❌ Job submission failed: {e}")
+        raise HTTPException(status_code=503, detail={"error": "jobs_unavailable"})
+    
+    logger.info(f"📥 Job {meta['id']} queued with {meta['total']} texts")
+    return job_status(meta)
+
+@app.get("/jobs/{job_id}")
+async def get_job(request: Request, job_id: str):
+    """Get job status and progress"""
+    meta = await job_manager.get(job_id, tenant_id(request))
+    if meta is None:
+        raise HTTPException(status_code=404, detail={"error": "job_not_found", "job_id": job_id})
+    return job_status(meta)
+
+@app.get("/jobs/{job_id}/results")
+async def get_job_results(request: Request, job_id: str, offset: int = 0, limit: int = 500):
+    """Page through results processed so far"""
+    meta = await job_manager.get(job_id, tenant_id(request))
+    if meta is None:
+        raise HTTPException(status_code=404, detail={"error": "job_not_found", "job_id": job_id})
+    
+    offset = max(0, offset)
+    limit = min(max(1, limit), 1000)
+    items = await job_manager.results(job_id, offset, limit)
+    next_offset = offset + len(items)
+    
+    # Stored items are already JSON - splice them in without re-encoding
+    return FastJSONResponse(b"".join((
+        b'{"job_id":', dumps(job_id),
+        b',"status":', dumps(meta["status"]),
+        b',"offset":', str(offset).encode(),
+        b',"next_offset":', dumps(next_offset if next_offset < meta["total"] else None),
+        b',"results":[', ",".join(items).encode("utf-8"), b"]}",
+    )))
+
+@app.delete("/jobs/{job_id}")
+async def cancel_job(request: Request, job_id: str):
+    """Cancel a queued or running job; results processed so far stay available"""
+    meta = await job_manager.cancel(job_id, tenant_id(request))
+    if meta is None:
+        raise HTTPException(status_code=404, detail={"error": "job_not_found", "job_id": job_id})
+    return job_status(meta)
+
 @app.get("/cultural-context/kenya")
-async def get_kenya_cultural_context():
+async def get_kenya_cultural_context(request: Request):
     """Provide cultural context for content moderation in Kenya"""
-    return {
-        "country": "Kenya",
-        "common_toxic_patterns": [
-            "Gender-based insults in local languages",
-            "Tribal-based harassment",
-            "Socio-economic discrimination",
-        ],
-        "cultural_sensitivities": [
-            "Respect for elders",
-            "Tribal harmony",
-            "Gender respect in local contexts"
-        ]
-    }
+    return catalog_response(request, "cultural_context:kenya")
+
+@app.get("/rules/bundle")
+async def get_rule_bundle(request: Request, since: str = None):
+    """
+    Compact prescreen rules for clients. Send the bundle version back in If-None-Match
+    (or ?since=) to get a 304 when current, or only the changes since that version.
+    """
+    base = rule_bundle_service.base_version(request.headers.get("if-none-match"), since)
+    payload = rule_bundle_service.payload(base)
+    if payload is None:
+        raise HTTPException(status_code=503, detail={"error": "rule_bundle_unavailable"})
+    return payload_response(
+        request,
+        payload,
+        f"public, max-age={settings.RULE_BUNDLE_MAX_AGE}",
+        extra_headers={"Vary": "Accept-Encoding, If-None-Match"}
+    )
 
 @app.get("/performance")
 async def get_performance():
@@ -339,7 +538,15 @@ async def get_performance():
         "service": "ShieldAI API",
         "status": "operational",
         "region": "Kenya",
-        "server_location": "East Africa"
+        "server_location": "East Africa",
+        "redis": redis_manager.stats(),
+        "rate_limiter": rate_limiter.stats(),
+        "analytics": analytics_service.aggregator.stats(),
+        "trending": analytics_service.trending.stats(),
+        "stats_snapshot": stats_snapshot.stats(),
+        "cache": cache_service.stats(),
+        "persistence": result_writer.stats(),
+        "database": pool_stats()
     }
 
 if __name__ == "__main__":
@@ -1,13 +1,24 @@
-from pydantic import BaseModel
+from pydantic import BaseModel, Field
 from typing import Optional, List, Dict, Any
 from datetime import datetime
 
+from app.core.config import settings
+
 class AnalyzeRequest(BaseModel):
     text: str
     platform: str = "general"
     language: Optional[str] = "auto"
 
 class BatchAnalyzeRequest(BaseModel):
+    texts: List[str] = Field(..., max_length=settings.BATCH_MAX_TEXTS)
+    platform: str = "general"
+
+class AnalyzeThreadRequest(BaseModel):
+    thread_id: str
+    text: str
+    platform: str = "general"
+
+class JobSubmitRequest(BaseModel):
     texts: List[str]
     platform: str = "general"
 
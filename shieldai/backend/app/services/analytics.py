@@ -1,66 +1,456 @@
+import asyncio
+import hashlib
+import secrets
 import time
 import json
-from datetime import datetime, timedelta
-from typing import Dict, List, Any, Optional
+from datetime import datetime, timedelta, timezone
+from typing import Callable, Dict, List, Any, Optional
 import logging
 from collections import defaultdict, Counter
 
+from app.core.histogram import LogHistogram
+from app.core.timeseries import Resolution, Rollups, group_points
 from app.core.redis import redis_manager
 from app.core.config import settings
+from app.services.conversations import message_fingerprint
+from app.services.trending import TrendingTracker
 
 logger = logging.getLogger(__name__)
 
+# Dimensions of the unique-user / unique-text HyperLogLogs
+UNIQUE_KINDS = ("users", "texts")
+
+# Shared by the workers of a deployment that runs without ANALYTICS_HASH_KEY
+GENERATED_HASH_KEY = "analytics:_hash_key"
+
+_hash_secret: Optional[bytes] = None
+
+async def init_hash_key(production: bool):
+    """
+    Pick the anonymization secret. A well-known key would let anyone reverse the
+    hashes by hashing guessed IPs or API keys, so production refuses to start
+    without ANALYTICS_HASH_KEY; elsewhere a random secret is generated once and
+    shared with the other workers through Redis.
+    """
+    global _hash_secret
+    configured = settings.ANALYTICS_HASH_KEY
+    if configured:
+        _hash_secret = hashlib.sha256(configured.encode("utf-8")).digest()
+        return
+    if production:
+        raise RuntimeError("ANALYTICS_HASH_KEY must be set in production")
+
+    secret = secrets.token_hex(32)
+    try:
+        pipeline = await redis_manager.pipeline(transaction=False)
+        pipeline.set(GENERATED_HASH_KEY, secret, nx=True)
+        pipeline.get(GENERATED_HASH_KEY)
+        _, secret = await pipeline.execute()
+    except Exception as e:
+        logger.error(f"Could not share the generated analytics hash key: {e}")
+    _hash_secret = hashlib.sha256(secret.encode("utf-8")).digest()
+    logger.warning("⚠️ ANALYTICS_HASH_KEY is not set - using a generated key; set it so anonymized IDs survive a Redis flush")
+
+def anonymize(value: str) -> str:
+    """
+    Keyed hash of a user ID or text fingerprint. Unlike the built-in hash() it is the
+    same on every worker and across restarts; without the secret it can't be
+    reversed by hashing guesses.
+    """
+    global _hash_secret
+    if _hash_secret is None:
+        # Not initialized (scripts, tests): a private key for this process only
+        _hash_secret = secrets.token_bytes(32)
+    return hashlib.blake2b(value.encode("utf-8"), key=_hash_secret, digest_size=16).hexdigest()
+
+class AnalyticsAggregator:
+    """
+    Write-combining buffer for analytics. Events fold into per-key deltas in memory
+    and reach Redis as one pipeline every `flush_interval` seconds or `flush_events`
+    events, whichever comes first. A failed flush is merged back and retried.
+    """
+
+    def __init__(self, redis, flush_interval: float = 1.0, flush_events: int = 1000):
+        self.redis = redis
+        self.flush_interval = flush_interval
+        self.flush_events = flush_events
+        self._task: Optional[asyncio.Task] = None
+        self._wake: Optional[asyncio.Event] = None
+        # Called before every flush to move in-process state into the buffers
+        self._sources: List[Callable[[], None]] = []
+        self._reset()
+        self.flushes = 0
+        self.failures = 0
+        self.events_flushed = 0
+        self.commands_flushed = 0
+        self.last_flush_at: Optional[float] = None
+        self.last_lag = 0.0
+
+    def _reset(self):
+        self._counters = Counter()
+        self._hash_counters = Counter()
+        self._latest: Dict[str, Dict[str, float]] = defaultdict(dict)
+        self._uniques: Dict[str, set] = defaultdict(set)
+        self._scores = Counter()
+        self._trims: Dict[str, int] = {}
+        self._expires: Dict[str, int] = {}
+        self._events = 0
+        self._oldest: Optional[float] = None
+
+    # Recording - memory only, no I/O
+    def incr(self, key: str, amount: int = 1):
+        self._counters[key] += amount
+
+    def hincr(self, key: str, field: str, amount: int = 1):
+        self._hash_counters[(key, field)] += amount
+
+    def zlatest(self, key: str, member: str, score: float):
+        self._latest[key][member] = score
+
+    def pfadd(self, key: str, member: str):
+        self._uniques[key].add(member)
+
+    def zincr(self, key: str, member: str, amount: int = 1):
+        self._scores[(key, member)] += amount
+
+    def ztrim(self, key: str, size: int):
+        """Keep only the `size` highest-scored members of a sorted set"""
+        self._trims[key] = size
+
+    def expire(self, key: str, seconds: int):
+        self._expires[key] = seconds
+
+    def mark(self):
+        """Note that something is buffered, for lag tracking and flushing"""
+        if self._oldest is None:
+            self._oldest = time.time()
+
+    def event(self, count: int = 1):
+        self.mark()
+        self._events += count
+        if self._events >= self.flush_events and self._wake is not None:
+            self._wake.set()
+
+    def add_source(self, drain: Callable[[], None]):
+        self._sources.append(drain)
+
+    @property
+    def pending_events(self) -> int:
+        return self._events
+
+    async def flush(self) -> int:
+        """Write everything buffered in one pipeline; returns the number of events flushed"""
+        for drain in self._sources:
+            drain()
+        if self._oldest is None:
+            return 0
+        snapshot = (
+            self._counters, self._hash_counters, self._latest, self._uniques,
+            self._scores, self._trims, self._expires, self._events, self._oldest
+        )
+        self._reset()
+        counters, hash_counters, latest, uniques, scores, trims, expires, events, oldest = snapshot
+
+        try:
+            pipeline = await self.redis.pipeline(transaction=False)
+            if pipeline is None:
+                raise RuntimeError("Redis is not available")
+            commands = 0
+            for key, delta in counters.items():
+                pipeline.incrby(key, delta)
+                commands += 1
+            for (key, field), delta in hash_counters.items():
+                pipeline.hincrby(key, field, delta)
+                commands += 1
+            for key, members in latest.items():
+                pipeline.zadd(key, members)
+                commands += 1
+            for key, members in uniques.items():
+                pipeline.pfadd(key, *members)
+                commands += 1
+            for (key, member), delta in scores.items():
+                pipeline.zincrby(key, delta, member)
+                commands += 1
+            for key, size in trims.items():
+                pipeline.zremrangebyrank(key, 0, -size - 1)
+                commands += 1
+            for key, seconds in expires.items():
+                pipeline.expire(key, seconds)
+                commands += 1
+            await pipeline.execute()
+        except Exception as e:
+            logger.error(f"Analytics flush of {events} events failed: {e}")
+            self.failures += 1
+            self._merge_back(snapshot)
+            return 0
+
+        now = time.time()
+        self.flushes += 1
+        self.events_flushed += events
+        self.commands_flushed += commands
+        self.last_flush_at = now
+        self.last_lag = now - oldest
+        return events
+
+    def _merge_back(self, snapshot: tuple):
+        counters, hash_counters, latest, uniques, scores, trims, expires, events, oldest = snapshot
+        self._counters.update(counters)
+        self._hash_counters.update(hash_counters)
+        for key, members in latest.items():
+            for member, score in members.items():
+                self._latest[key][member] = max(score, self._latest[key].get(member, score))
+        for key, members in uniques.items():
+            self._uniques[key].update(members)
+        self._scores.update(scores)
+        for key, size in trims.items():
+            self._trims.setdefault(key, size)
+        for key, seconds in expires.items():
+            self._expires.setdefault(key, seconds)
+        self._events += events
+        self._oldest = min(oldest, self._oldest or oldest)
+
+    async def _run(self):
+        while True:
+            try:
+                await asyncio.wait_for(self._wake.wait(), timeout=self.flush_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wake.clear()
+            try:
+                await self.flush()
+            except Exception as e:
+                logger.error(f"Analytics flush loop error: {e}")
+
+    def start(self):
+        if self._task is None:
+            self._wake = asyncio.Event()
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        """Stop the flush loop and write out whatever is still buffered"""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+            self._wake = None
+        await self.flush()
+
+    def stats(self) -> dict:
+        return {
+            "pending_events": self._events,
+            # Age of the oldest event not yet in Redis
+            "lag_seconds": round(time.time() - self._oldest, 3) if self._oldest else 0.0,
+            "last_flush_lag_seconds": round(self.last_lag, 3),
+            "last_flush_at": self.last_flush_at,
+            "flushes": self.flushes,
+            "failures": self.failures,
+            "events_flushed": self.events_flushed,
+            "commands_per_event": round(self.commands_flushed / self.events_flushed, 4) if self.events_flushed else 0.0
+        }
+
 class AnalyticsService:
     def __init__(self):
         self.redis = redis_manager
+        self.latency_retention = settings.LATENCY_RETENTION_MINUTES
+        self.unique_retention_days = settings.ANALYTICS_HLL_RETENTION_DAYS
+        self.rollups = Rollups("analytics:ts", [
+            Resolution("minute", 60, settings.ANALYTICS_MINUTE_RETENTION_HOURS * 3600),
+            Resolution("hour", 3600, settings.ANALYTICS_HOURLY_RETENTION_DAYS * 86400),
+            Resolution("day", 86400, settings.ANALYTICS_DAILY_RETENTION_DAYS * 86400),
+        ])
+        self.aggregator = AnalyticsAggregator(
+            redis_manager,
+            flush_interval=settings.ANALYTICS_FLUSH_INTERVAL_MS / 1000,
+            flush_events=settings.ANALYTICS_FLUSH_EVENTS
+        )
+        self.trending = TrendingTracker(self.aggregator, redis_manager)
+        
+    def start(self):
+        """Start the periodic analytics flush"""
+        self.aggregator.start()
         
-    async def track_analysis(self, analysis_result: Dict[str, Any], platform: str, user_id: str = None):
-        """Track analysis results for real-time analytics"""
+    async def stop(self):
+        """Flush buffered analytics and stop"""
+        await self.aggregator.stop()
+        
+    async def track_analysis(self, analysis_result: Dict[str, Any], platform: str, user_id: str = None, text: str = None):
+        """Track analysis results for real-time analytics (buffered, flushed in the background)"""
+        try:
+            self._record(analysis_result, platform, user_id, text, int(time.time()), datetime.now(timezone.utc))
+        except Exception as e:
+            logger.error(f"Analytics tracking failed: {e}")
+    
+    async def track_many(
+        self,
+        analysis_results: List[Optional[Dict[str, Any]]],
+        platform: str,
+        user_id: str = None,
+        texts: List[str] = None
+    ):
+        """Track every result of a batch; failed items (None) are skipped"""
+        try:
+            timestamp, now = int(time.time()), datetime.now(timezone.utc)
+            texts = texts or [None] * len(analysis_results)
+            for analysis_result, text in zip(analysis_results, texts):
+                if analysis_result is not None:
+                    self._record(analysis_result, platform, user_id, text, timestamp, now)
+        except Exception as e:
+            logger.error(f"Analytics tracking failed: {e}")
+    
+    def _record(
+        self,
+        analysis_result: Dict[str, Any],
+        platform: str,
+        user_id: Optional[str],
+        text: Optional[str],
+        timestamp: int,
+        now: datetime
+    ):
+        aggregator = self.aggregator
+        date_key = now.strftime("%Y-%m-%d")  # UTC day, like the rollup buckets
+        is_toxic = bool(analysis_result.get("is_toxic"))
+        
+        # Real-time counters
+        aggregator.incr("analytics:total_requests")
+        if is_toxic:
+            aggregator.incr("analytics:toxic_requests")
+        
+        # Platform statistics
+        aggregator.zlatest("analytics:platforms", platform, timestamp)
+        aggregator.incr(f"analytics:platform:{platform}")
+        
+        # Minute / hourly / daily rollups, expiring per their retention
+        fields = {"total": 1, f"platform:{platform}": 1}
+        if is_toxic:
+            fields["toxic"] = 1
+        self.rollups.record(aggregator, timestamp, fields)
+        
+        # Unique users and texts per day, overall / per platform / per category
+        dimensions = [None, f"platform:{platform}"]
+        if is_toxic:
+            dimensions.extend(f"category:{category}" for category in analysis_result.get("categories", ()))
+        text_id = anonymize(message_fingerprint(text)) if text else None
+        user_key = anonymize(user_id) if user_id else None
+        members = []
+        if user_key:
+            members.append(("users", user_key))
+        if text_id:
+            members.append(("texts", text_id))
+        for kind, member in members:
+            for dimension in dimensions:
+                key = self._unique_key(kind, dimension, date_key)
+                aggregator.pfadd(key, member)
+                aggregator.expire(key, (self.unique_retention_days + 1) * 86400)
+        
+        # Trending categories, rules, texts and platforms
+        self.trending.record(
+            platform,
+            analysis_result.get("categories", ()) if is_toxic else (),
+            analysis_result.get("detected_issues", ()),
+            text_id
+        )
+        
+        # User behavior (anonymous, stable across workers)
+        if user_id:
+            user_hash = f"analytics:user:{user_key}"
+            aggregator.hincr(user_hash, "total_analyses")
+            if is_toxic:
+                aggregator.hincr(user_hash, "toxic_analyses")
+            aggregator.expire(user_hash, 30 * 24 * 3600)  # 30 days
+        
+        # Engine latency distribution (the engine reports milliseconds); cache hits never ran it
+        if not analysis_result.get("cached"):
+            self.observe("stage:engine", float(analysis_result.get("processing_time", 0)) / 1000)
+        aggregator.event()
+    
+    @staticmethod
+    def _unique_key(kind: str, dimension: Optional[str], period: str) -> str:
+        # Hash tag keeps every day of a series on one shard for multi-key PFCOUNT / PFMERGE
+        series = f"{kind}:{dimension}" if dimension else kind
+        return f"analytics:hll:{{{series}}}:{period}"
+    
+    async def _count_range(self, kind: str, dimension: Optional[str], dates: List[str]) -> int:
+        """Distinct members over `dates` (newest first, today included)"""
+        today, past = dates[0], dates[1:]
+        keys = [self._unique_key(kind, dimension, today)]
+        if len(past) > 1:
+            # Finished days barely change: merge them once and reuse the union for an hour
+            merged = self._unique_key(kind, dimension, f"range:{past[-1]}:{past[0]}")
+            if not await self.redis.exists(merged):
+                pipeline = await self.redis.pipeline()
+                pipeline.pfmerge(merged, *(self._unique_key(kind, dimension, date) for date in past))
+                pipeline.expire(merged, 3600)
+                await pipeline.execute()
+            keys.append(merged)
+        else:
+            keys.extend(self._unique_key(kind, dimension, date) for date in past)
+        pipeline = await self.redis.pipeline()
+        pipeline.pfcount(*keys)
+        return int((await pipeline.execute())[0] or 0)
+    
+    async def get_unique_counts(self, days: int = 7, platform: str = None, category: str = None) -> Dict[str, Any]:
+        """
+        Approximate distinct users and texts (HyperLogLog, ~0.8% error) per day and over
+        the whole period, optionally for one platform or category
+        """
+        days = max(1, min(days, self.unique_retention_days))
+        dimension = f"platform:{platform}" if platform else f"category:{category}" if category else None
+        # UTC days, like the rollup buckets
+        now = datetime.now(timezone.utc)
+        dates = [(now - timedelta(days=i)).strftime("%Y-%m-%d") for i in range(days)]
         try:
-            timestamp = int(time.time())
-            date_key = datetime.now().strftime("%Y-%m-%d")
-            hour_key = datetime.now().strftime("%Y-%m-%d-%H")
-            
-            # Use pipeline for multiple operations
             pipeline = await self.redis.pipeline()
+            for date in dates:
+                for kind in UNIQUE_KINDS:
+                    pipeline.pfcount(self._unique_key(kind, dimension, date))
+            results = await pipeline.execute()
             
-            # Real-time counters
-            pipeline.incr("analytics:total_requests")
-            
-            if analysis_result.get("is_toxic"):
-                pipeline.incr("analytics:toxic_requests")
-            
-            # Platform statistics
-            pipeline.zadd("analytics:platforms", {platform: timestamp})
-            pipeline.incr(f"analytics:platform:{platform}")
-            
-            # Hourly statistics
-            pipeline.incr(f"analytics:hourly:{hour_key}:total")
-            if analysis_result.get("is_toxic"):
-                pipeline.incr(f"analytics:hourly:{hour_key}:toxic")
-            
-            # Daily aggregates
-            pipeline.hincrby(f"analytics:daily:{date_key}", "total", 1)
-            if analysis_result.get("is_toxic"):
-                pipeline.hincrby(f"analytics:daily:{date_key}", "toxic", 1)
-            
-            # User behavior (anonymous)
-            if user_id:
-                user_hash = f"user:{hash(user_id)}"  # Anonymous tracking
-                pipeline.hincrby(user_hash, "total_analyses", 1)
-                if analysis_result.get("is_toxic"):
-                    pipeline.hincrby(user_hash, "toxic_analyses", 1)
-                pipeline.expire(user_hash, 30 * 24 * 3600)  # 30 days
-            
-            # Response time tracking
-            processing_time = analysis_result.get("processing_time", 0)
-            pipeline.rpush("analytics:response_times", processing_time)
-            pipeline.ltrim("analytics:response_times", 0, 999)  # Keep last 1000
+            daily = {}
+            for i, date in enumerate(dates):
+                counts = dict(zip(UNIQUE_KINDS, (int(r or 0) for r in results[i * 2:i * 2 + 2])))
+                if any(counts.values()):
+                    daily[date] = counts
+            total = {kind: await self._count_range(kind, dimension, dates) for kind in UNIQUE_KINDS}
             
-            await pipeline.execute()
+            return {
+                "period_days": days,
+                "dimension": dimension or "all",
+                "daily": daily,
+                "total": total
+            }
             
         except Exception as e:
-            logger.error(f"Analytics tracking failed: {e}")
+            logger.error(f"Unique count query failed: {e}")
+            return {"error": str(e)}
+    
+    @staticmethod
+    def _latency_key(name: str, minute: int) -> str:
+        return f"analytics:latency:{name}:{minute}"
+    
+    def observe(self, name: str, seconds: float):
+        """Record a duration into this minute's histogram for `name` (an endpoint or stage)"""
+        key = self._latency_key(name, int(time.time() // 60))
+        for field, amount in LogHistogram.fields(seconds):
+            self.aggregator.hincr(key, field, amount)
+        self.aggregator.expire(key, (self.latency_retention + 1) * 60)
+        self.aggregator.mark()
+    
+    async def get_latency(self, name: str, window_minutes: int = 5) -> Dict[str, Any]:
+        """Percentiles for `name` over the last `window_minutes`, merged across workers"""
+        window_minutes = max(1, min(window_minutes, self.latency_retention))
+        histogram = LogHistogram()
+        try:
+            current = int(time.time() // 60)
+            keys = [self._latency_key(name, minute) for minute in range(current - window_minutes + 1, current + 1)]
+            for fields in await self.redis.hgetall_many(keys):
+                if fields:
+                    histogram.merge(LogHistogram.from_fields(fields))
+        except Exception as e:
+            logger.error(f"Latency query failed for {name}: {e}")
+        return {"name": name, "window_minutes": window_minutes, **histogram.summary()}
     
     async def get_realtime_stats(self) -> Dict[str, Any]:
         """Get real-time statistics"""
@@ -74,19 +464,18 @@ class AnalyticsService:
             # Platform counts
             pipeline.zcard("analytics:platforms")
             
-            # Response times
-            pipeline.lrange("analytics:response_times", 0, -1)
-            
             results = await pipeline.execute()
             
             total_requests = int(results[0] or 0)
             toxic_requests = int(results[1] or 0)
             platform_count = results[2] or 0
-            response_times = [float(rt) for rt in (results[3] or [])]
+            
+            # Response times from the last five minutes of merged histograms
+            latency = await self.get_latency("stage:engine", 5)
             
             # Calculate metrics
             toxicity_rate = toxic_requests / total_requests if total_requests > 0 else 0
-            avg_response_time = sum(response_times) / len(response_times) if response_times else 0
+            avg_response_time = latency.get("mean_ms", 0) / 1000
             
             return {
                 "total_requests": total_requests,
@@ -94,7 +483,8 @@ class AnalyticsService:
                 "toxicity_rate": round(toxicity_rate, 4),
                 "platform_count": platform_count,
                 "avg_response_time": round(avg_response_time, 3),
-                "response_time_samples": len(response_times),
+                "response_time_samples": latency["count"],
+                "latency": latency,
                 "timestamp": time.time()
             }
             
@@ -102,28 +492,51 @@ class AnalyticsService:
             logger.error(f"Realtime stats failed: {e}")
             return self._get_fallback_stats()
     
-    async def get_daily_stats(self, days: int = 7) -> Dict[str, Any]:
-        """Get daily statistics for the last N days"""
+    async def get_timeseries(
+        self,
+        window_hours: float = 24,
+        resolution: str = None,
+        group_by: str = None
+    ) -> Dict[str, Any]:
+        """
+        Request counters over the last `window_hours` from the finest rollup that covers
+        them (or `resolution`), optionally summed per day, week or month
+        """
         try:
-            dates = []
-            for i in range(days):
-                date = (datetime.now() - timedelta(days=i)).strftime("%Y-%m-%d")
-                dates.append(date)
+            now = time.time()
+            chosen = self.rollups.resolution(resolution) if resolution else None
+            chosen, points = await self.rollups.query(self.redis, now - window_hours * 3600, now, now, chosen)
             
-            pipeline = await self.redis.pipeline()
-            for date in dates:
-                pipeline.hgetall(f"analytics:daily:{date}")
+            # Without a calendar grouping every bucket is its own point
+            series = group_points(points, group_by or "bucket")
             
-            results = await pipeline.execute()
+            return {
+                "window_hours": window_hours,
+                "resolution": chosen.name,
+                "group_by": group_by,
+                "series": series,
+                "total_requests": sum(fields.get("total", 0) for _, fields in points),
+                "total_toxic": sum(fields.get("toxic", 0) for _, fields in points)
+            }
+            
+        except Exception as e:
+            logger.error(f"Timeseries query failed: {e}")
+            return {"error": str(e)}
+    
+    async def get_daily_stats(self, days: int = 7) -> Dict[str, Any]:
+        """Get daily statistics for the last N days (UTC days, one pipelined read)"""
+        try:
+            now = time.time()
+            day = self.rollups.resolution("day")
+            _, points = await self.rollups.query(self.redis, now - (days - 1) * 86400, now, now, day)
             
             daily_stats = {}
-            for i, date in enumerate(dates):
-                data = results[i] or {}
+            for date, data in group_points(points, "day").items():
                 if data:
                     daily_stats[date] = {
-                        "total": int(data.get("total", 0)),
-                        "toxic": int(data.get("toxic", 0)),
-                        "toxicity_rate": round(int(data.get("toxic", 0)) / max(1, int(data.get("total", 0))), 4)
+                        "total": data.get("total", 0),
+                        "toxic": data.get("toxic", 0),
+                        "toxicity_rate": round(data.get("toxic", 0) / max(1, data.get("total", 0)), 4)
                     }
             
             return {
@@ -138,57 +551,49 @@ class AnalyticsService:
             return {"error": str(e)}
     
     async def get_platform_stats(self) -> Dict[str, int]:
-        """Get statistics by platform"""
+        """Requests per platform: names from the analytics:platforms set, counts in one MGET"""
         try:
-            # Get all platform keys
-            platform_keys = await self.redis.keys("analytics:platform:*")
-            
-            pipeline = await self.redis.pipeline()
-            for key in platform_keys:
-                pipeline.get(key)
-            
-            results = await pipeline.execute()
-            
-            platform_stats = {}
-            for i, key in enumerate(platform_keys):
-                platform_name = key.split(":")[-1]
-                count = int(results[i] or 0)
-                platform_stats[platform_name] = count
-            
-            return platform_stats
+            platforms = await self.redis.zrange("analytics:platforms", 0, -1)
+            if not platforms:
+                return {}
+            counts = await self.redis.mget([f"analytics:platform:{platform}" for platform in platforms])
+            return {platform: int(count or 0) for platform, count in zip(platforms, counts)}
             
         except Exception as e:
             logger.error(f"Platform stats failed: {e}")
             return {}
     
     async def cleanup_old_data(self, days_to_keep: int = 30):
-        """Clean up analytics data older than specified days"""
+        """
+        Remove legacy analytics:daily / analytics:hourly keys, written without expiry
+        before the rollups. Rollup buckets expire on their own and need no sweep.
+        """
         try:
             cutoff_date = (datetime.now() - timedelta(days=days_to_keep)).strftime("%Y-%m-%d")
-            
-            # Get all daily keys
-            daily_keys = await self.redis.keys("analytics:daily:*")
-            keys_to_delete = []
-            
-            for key in daily_keys:
-                date_str = key.split(":")[-1]
-                if date_str < cutoff_date:
-                    keys_to_delete.append(key)
-            
-            # Get old hourly keys (keep only 48 hours)
+            # Keep only 48 hours of hourly keys
             hourly_cutoff = (datetime.now() - timedelta(hours=48)).strftime("%Y-%m-%d-%H")
-            hourly_keys = await self.redis.keys("analytics:hourly:*")
-            
-            for key in hourly_keys:
-                hour_str = key.split(":")[-1]
-                if hour_str < hourly_cutoff:
-                    keys_to_delete.append(key)
             
-            if keys_to_delete:
-                deleted = await self.redis.delete(*keys_to_delete)
+            deleted = 0
+            for pattern, cutoff in (("analytics:daily:*", cutoff_date), ("analytics:hourly:*", hourly_cutoff)):
+                async for keys in self.redis.scan_iter(pattern):
+                    keys_to_delete = []
+                    for key in keys:
+                        # Hourly keys look like analytics:hourly:<hour>:<total|toxic>
+                        parts = key.split(":")
+                        period = parts[2] if len(parts) > 2 else ""
+                        if period < cutoff:
+                            keys_to_delete.append(key)
+                    
+                    if keys_to_delete:
+                        # UNLINK frees memory in the background instead of blocking
+                        pipeline = await self.redis.pipeline()
+                        pipeline.unlink(*keys_to_delete)
+                        deleted += (await pipeline.execute())[0]
+            
+            if deleted:
                 logger.info(f"Cleaned up {deleted} old analytics keys")
                 
-            return len(keys_to_delete)
+            return deleted
             
         except Exception as e:
             logger.error(f"Analytics cleanup failed: {e}")
@@ -1,100 +1,522 @@
+import asyncio
+import functools
 import hashlib
-import json
-from typing import Any, Optional, Callable
+import os
+import tempfile
+import time
+from collections import Counter, OrderedDict, defaultdict
+from typing import Any, Awaitable, Callable, Dict, Iterable, List, Optional, Tuple
 import logging
+from app.core.config import settings
 from app.core.redis import redis_manager
+from app.core.serialization import dumps, loads
 
 logger = logging.getLogger(__name__)
 
+# Hottest L1 keys across workers (sorted set scored by hits), for warm starts
+SNAPSHOT_KEY = "cache:_snapshot"
+
+class CacheEntry:
+    """A cached value (None for a cached miss) with its freshness deadline"""
+    
+    __slots__ = ("value", "fresh_until", "stale_until", "negative")
+    
+    def __init__(self, value: Any, fresh_until: float, stale_until: float, negative: bool = False):
+        self.value = value
+        self.fresh_until = fresh_until
+        self.stale_until = stale_until
+        self.negative = negative
+    
+    def to_dict(self) -> dict:
+        return {"v": self.value, "f": self.fresh_until, "s": self.stale_until, "n": self.negative}
+    
+    @classmethod
+    def from_dict(cls, data: Any) -> Optional["CacheEntry"]:
+        if not isinstance(data, dict) or "f" not in data:
+            return None
+        return cls(data.get("v"), float(data["f"]), float(data["s"]), bool(data.get("n")))
+
 class CacheService:
+    """
+    Two-tier read-through cache. L1 is a bounded in-process LRU holding entries for at
+    most `l1_ttl` seconds (so other workers' writes show up quickly); L2 is Redis.
+    Concurrent misses for a key share one load (single-flight), entries past their
+    TTL are served for `stale_ttl` more seconds while one background refresh runs,
+    and loaders returning None are remembered for `negative_ttl` seconds.
+    
+    Keys are cache:<namespace>:v<version>:<key>. Bumping a namespace's version
+    counter invalidates all of it in O(1) - old entries are never read again and
+    expire on their own. Entries can also carry tags; a Redis set per tag lists
+    its keys so they can be dropped without walking the keyspace.
+    
+    The hottest L1 keys are snapshotted periodically and on shutdown, and a new
+    process preloads them in the background within a time and memory budget.
+    """
+    
     def __init__(self):
-        self.default_ttl = 300  # 5 minutes
-        
-    def _generate_key(self, prefix: str, *args, **kwargs) -> str:
+        self.default_ttl = settings.CACHE_DEFAULT_TTL
+        self.stale_ttl = settings.CACHE_STALE_TTL
+        self.negative_ttl = settings.CACHE_NEGATIVE_TTL
+        self.l1_ttl = settings.CACHE_L1_TTL
+        self.l1_max_keys = settings.CACHE_L1_MAX_KEYS
+        self.tag_ttl = settings.CACHE_TAG_TTL
+        # Namespace versions, re-read from Redis at most every l1_ttl seconds
+        self._versions: Dict[str, Tuple[int, float]] = {}
+        self._l1: "OrderedDict[str, Tuple[float, CacheEntry]]" = OrderedDict()
+        self._inflight: Dict[str, asyncio.Task] = {}
+        self._refreshes: set = set()
+        self._stats: Dict[str, Dict[str, int]] = defaultdict(lambda: defaultdict(int))
+        # L1 hits per key since it was loaded, to pick what to snapshot
+        self._heat = Counter()
+        self.snapshot_interval = settings.CACHE_SNAPSHOT_INTERVAL
+        self.snapshot_max_keys = settings.CACHE_SNAPSHOT_MAX_KEYS
+        self.snapshot_path = settings.CACHE_SNAPSHOT_PATH
+        self.warm_max_seconds = settings.CACHE_WARM_MAX_SECONDS
+        self.warm_max_bytes = settings.CACHE_WARM_MAX_MB * 1024 * 1024
+        self.warmup: Dict[str, Any] = {"state": "idle"}
+        self._tasks: List[asyncio.Task] = []
+    
+    @staticmethod
+    def _generate_key(*args, **kwargs) -> str:
         """Generate cache key from function arguments"""
-        key_data = f"{prefix}:{str(args)}:{str(kwargs)}"
-        return f"cache:{hashlib.md5(key_data.encode()).hexdigest()}"
+        key_data = f"{str(args)}:{str(kwargs)}"
+        return hashlib.md5(key_data.encode()).hexdigest()
     
-    async def cached(
-        self, 
-        ttl: int = None, 
-        key_prefix: str = None,
+    @staticmethod
+    def _version_key(namespace: str) -> str:
+        return f"cache:_version:{namespace}"
+    
+    @staticmethod
+    def _tag_key(tag: str) -> str:
+        return f"cache:_tag:{tag}"
+    
+    async def _version(self, namespace: str) -> int:
+        cached = self._versions.get(namespace)
+        now = time.time()
+        if cached is not None and cached[1] > now:
+            return cached[0]
+        version = int(await redis_manager.get(self._version_key(namespace), default=0) or 0)
+        if cached is not None and not redis_manager.available:
+            # Keep local bumps while Redis is out of reach
+            version = max(version, cached[0])
+        self._versions[namespace] = (version, now + self.l1_ttl)
+        return version
+    
+    async def _full_key(self, namespace: str, key: str) -> str:
+        return f"cache:{namespace}:v{await self._version(namespace)}:{key}"
+    
+    def _count(self, prefix: str, event: str):
+        self._stats[prefix][event] += 1
+    
+    # L1
+    def _l1_get(self, key: str) -> Optional[CacheEntry]:
+        item = self._l1.get(key)
+        if item is None:
+            return None
+        if item[0] <= time.time():
+            del self._l1[key]
+            self._heat.pop(key, None)
+            return None
+        self._l1.move_to_end(key)
+        self._heat[key] += 1
+        return item[1]
+    
+    def _l1_put(self, key: str, entry: CacheEntry):
+        self._l1[key] = (min(entry.stale_until, time.time() + self.l1_ttl), entry)
+        self._l1.move_to_end(key)
+        while len(self._l1) > self.l1_max_keys:
+            evicted, _ = self._l1.popitem(last=False)
+            self._heat.pop(evicted, None)
+    
+    async def _lookup(self, key: str, prefix: str) -> Optional[CacheEntry]:
+        entry = self._l1_get(key)
+        if entry is not None:
+            self._count(prefix, "l1_hits")
+            return entry
+        entry = CacheEntry.from_dict(await redis_manager.get(key))
+        if entry is None or entry.stale_until <= time.time():
+            return None
+        self._count(prefix, "l2_hits")
+        self._l1_put(key, entry)
+        return entry
+    
+    async def _store(
+        self,
+        key: str,
+        value: Any,
+        ttl: int,
+        stale_ttl: int,
+        negative_ttl: int,
+        tags: Tuple[str, ...] = ()
+    ) -> CacheEntry:
+        now = time.time()
+        if value is None:
+            entry = CacheEntry(None, now + negative_ttl, now + negative_ttl, negative=True)
+        else:
+            entry = CacheEntry(value, now + ttl, now + ttl + stale_ttl)
+        self._l1_put(key, entry)
+        await redis_manager.set(key, entry.to_dict(), expire=max(1, int(entry.stale_until - now) + 1))
+        if tags:
+            try:
+                pipeline = await redis_manager.pipeline(transaction=False)
+                for tag in tags:
+                    pipeline.sadd(self._tag_key(tag), key)
+                    # Tag sets outlive their entries; keys already expired are harmless to unlink
+                    pipeline.expire(self._tag_key(tag), self.tag_ttl)
+                await pipeline.execute()
+            except Exception as e:
+                logger.error(f"Cache tagging failed for {key}: {e}")
+        return entry
+    
+    async def _load(self, key: str, prefix: str, loader: Callable[[], Awaitable[Any]], ttls: tuple) -> Any:
+        """Run the loader once per key however many callers are waiting for it"""
+        inflight = self._inflight.get(key)
+        if inflight is not None:
+            self._count(prefix, "coalesced")
+        else:
+            # The load is its own task, so a cancelled caller doesn't take it down for everyone else
+            inflight = self._inflight[key] = asyncio.ensure_future(self._fill(key, prefix, loader, ttls))
+            inflight.add_done_callback(functools.partial(self._settle, key))
+        return await asyncio.shield(inflight)
+    
+    async def _fill(self, key: str, prefix: str, loader: Callable[[], Awaitable[Any]], ttls: tuple) -> Any:
+        self._count(prefix, "loads")
+        try:
+            value = await loader()
+        except Exception:
+            self._count(prefix, "errors")
+            raise
+        await self._store(key, value, *ttls)
+        return value
+    
+    def _settle(self, key: str, task: asyncio.Task):
+        if self._inflight.get(key) is task:
+            del self._inflight[key]
+        # Mark the exception as retrieved when every caller had gone away
+        if not task.cancelled():
+            task.exception()
+    
+    def _refresh(self, key: str, prefix: str, loader: Callable[[], Awaitable[Any]], ttls: tuple):
+        if key in self._inflight:
+            return
+        
+        async def refresh():
+            try:
+                await self._load(key, prefix, loader, ttls)
+            except Exception as e:
+                logger.warning(f"Background cache refresh failed for {key}: {e}")
+        
+        task = asyncio.ensure_future(refresh())
+        self._refreshes.add(task)
+        task.add_done_callback(self._refreshes.discard)
+    
+    async def get_or_load(
+        self,
+        namespace: str,
+        key: str,
+        loader: Callable[[], Awaitable[Any]],
+        ttl: int = None,
+        stale_ttl: int = None,
+        negative_ttl: int = None,
+        tags: Iterable[str] = (),
         fallback: bool = True
+    ) -> Any:
+        """
+        Cached value of `key` in `namespace`, loading it with `loader` on a miss. With
+        `fallback`, stale values are returned immediately and refreshed in the
+        background (and keep being served while the refresh fails); without it they
+        count as misses.
+        """
+        ttls = (
+            ttl or self.default_ttl,
+            self.stale_ttl if stale_ttl is None else stale_ttl,
+            self.negative_ttl if negative_ttl is None else negative_ttl,
+            tuple(tags)
+        )
+        key = await self._full_key(namespace, key)
+        entry = await self._lookup(key, namespace)
+        now = time.time()
+        if entry is not None and entry.fresh_until > now:
+            if entry.negative:
+                self._count(namespace, "negative_hits")
+            return entry.value
+        if entry is not None and fallback:
+            self._count(namespace, "stale")
+            self._refresh(key, namespace, loader, ttls)
+            return entry.value
+        
+        self._count(namespace, "misses")
+        return await self._load(key, namespace, loader, ttls)
+    
+    def cached(
+        self,
+        ttl: int = None,
+        key_prefix: str = None,
+        fallback: bool = True,
+        stale_ttl: int = None,
+        negative_ttl: int = None,
+        tags: Iterable[str] = ()
     ):
         """
-        Decorator for caching function results
+        Decorator for caching function results (`key_prefix` is the namespace)
         """
+        tags = tuple(tags)
+        
         def decorator(func: Callable):
+            namespace = key_prefix or f"{func.__module__}.{func.__name__}"
+            
+            @functools.wraps(func)
             async def wrapper(*args, **kwargs):
-                # Generate cache key
-                prefix = key_prefix or f"{func.__module__}:{func.__name__}"
-                cache_key = self._generate_key(prefix, *args, **kwargs)
-                
-                # Try to get from cache
-                cached_result = await redis_manager.get(cache_key)
-                if cached_result is not None:
-                    logger.debug(f"Cache hit for {cache_key}")
-                    return cached_result
-                
-                # Execute function
-                try:
-                    result = await func(*args, **kwargs)
-                    
-                    # Store in cache
-                    if result is not None:
-                        await redis_manager.set(
-                            cache_key, 
-                            result, 
-                            expire=ttl or self.default_ttl
-                        )
-                    
-                    return result
-                    
-                except Exception as e:
-                    logger.error(f"Function execution failed: {e}")
-                    if fallback and cached_result is not None:
-                        logger.info("Using cached result as fallback")
-                        return cached_result
-                    raise
-                    
+                return await self.get_or_load(
+                    namespace,
+                    self._generate_key(*args, **kwargs),
+                    lambda: func(*args, **kwargs),
+                    ttl=ttl,
+                    stale_ttl=stale_ttl,
+                    negative_ttl=negative_ttl,
+                    tags=tags,
+                    fallback=fallback
+                )
             return wrapper
         return decorator
     
+    def _drop_l1(self, keys: Iterable[str] = (), prefix: str = None):
+        doomed = set(keys)
+        if prefix is not None:
+            doomed.update(key for key in self._l1 if key.startswith(prefix))
+        for key in doomed:
+            self._l1.pop(key, None)
+            self._heat.pop(key, None)
+    
+    # Warm start
+    def _hottest(self) -> List[Tuple[str, int, CacheEntry]]:
+        now = time.time()
+        hot = []
+        for key, hits in self._heat.most_common(self.snapshot_max_keys):
+            item = self._l1.get(key)
+            if item is not None and not item[1].negative and item[1].stale_until > now:
+                hot.append((key, hits, item[1]))
+        return hot
+    
+    def _write_snapshot_file(self, hot: List[Tuple[str, int, CacheEntry]]):
+        # Write-then-rename so a crash never leaves a torn snapshot behind; a private temp
+        # file per write, since every worker process snapshots to the same path
+        fd, temp_path = tempfile.mkstemp(
+            dir=os.path.dirname(os.path.abspath(self.snapshot_path)),
+            prefix=os.path.basename(self.snapshot_path) + ".",
+            suffix=".tmp"
+        )
+        try:
+            with os.fdopen(fd, "wb") as f:
+                f.write(dumps([{"k": key, "h": hits, **entry.to_dict()} for key, hits, entry in hot]))
+            os.replace(temp_path, self.snapshot_path)
+        except BaseException:
+            os.unlink(temp_path)
+            raise
+    
+    def _read_snapshot_file(self) -> bytes:
+        with open(self.snapshot_path, "rb") as f:
+            return f.read()
+    
+    async def snapshot(self) -> int:
+        """Persist the hottest L1 keys: entries to CACHE_SNAPSHOT_PATH if set, else key names to Redis"""
+        hot = self._hottest()
+        if not hot:
+            return 0
+        try:
+            if self.snapshot_path:
+                await asyncio.to_thread(self._write_snapshot_file, hot)
+            else:
+                # Workers add their hit counts; the set keeps the overall hottest keys
+                pipeline = await redis_manager.pipeline(transaction=False)
+                if pipeline is None:
+                    return 0
+                for key, hits, _ in hot:
+                    pipeline.zincrby(SNAPSHOT_KEY, hits, key)
+                pipeline.zremrangebyrank(SNAPSHOT_KEY, 0, -self.snapshot_max_keys - 1)
+                pipeline.expire(SNAPSHOT_KEY, max(3600, int(self.snapshot_interval * 10)))
+                await pipeline.execute()
+            # Decay so the snapshot follows what is hot now
+            for key in list(self._heat):
+                self._heat[key] //= 2
+                if not self._heat[key]:
+                    del self._heat[key]
+            return len(hot)
+        except Exception as e:
+            logger.error(f"Cache snapshot failed: {e}")
+            return 0
+    
+    async def _snapshot_entries(self) -> List[Tuple[str, Optional[CacheEntry]]]:
+        """Snapshotted keys, hottest first, with their entries when the snapshot holds them"""
+        if self.snapshot_path:
+            if not os.path.exists(self.snapshot_path):
+                return []
+            records = loads(await asyncio.to_thread(self._read_snapshot_file))
+            return [(record["k"], CacheEntry.from_dict(record)) for record in records]
+        members = await redis_manager.zrange(SNAPSHOT_KEY, 0, self.snapshot_max_keys - 1, desc=True)
+        return [(key, None) for key in members or ()]
+    
+    async def _is_current(self, key: str) -> bool:
+        # cache:<namespace>:v<version>:<digest> - skip keys from invalidated versions
+        parts = key.split(":")
+        if len(parts) < 4 or not parts[2].startswith("v"):
+            return False
+        return parts[2] == f"v{await self._version(parts[1])}"
+    
+    async def warm_start(self, chunk_size: int = 100):
+        """Preload snapshotted entries into L1, hottest first, until the time or memory budget runs out"""
+        started = time.monotonic()
+        progress = self.warmup = {"state": "running", "total": 0, "loaded": 0, "skipped": 0, "bytes": 0}
+        try:
+            snapshot = await self._snapshot_entries()
+            progress["total"] = len(snapshot)
+            budget_left = True
+            for offset in range(0, len(snapshot), chunk_size):
+                chunk = [(key, entry) for key, entry in snapshot[offset:offset + chunk_size]
+                         if key not in self._l1 and await self._is_current(key)]
+                progress["skipped"] += min(chunk_size, len(snapshot) - offset) - len(chunk)
+                missing = [key for key, entry in chunk if entry is None]
+                fetched = dict(zip(missing, await redis_manager.mget(missing))) if missing else {}
+                now = time.time()
+                for key, entry in chunk:
+                    if entry is None:
+                        entry = CacheEntry.from_dict(fetched.get(key))
+                    if entry is None or entry.negative or entry.stale_until <= now:
+                        progress["skipped"] += 1
+                        continue
+                    size = len(dumps(entry.value))
+                    if progress["bytes"] + size > self.warm_max_bytes:
+                        budget_left = False
+                        break
+                    self._l1_put(key, entry)
+                    progress["loaded"] += 1
+                    progress["bytes"] += size
+                if not budget_left or time.monotonic() - started > self.warm_max_seconds:
+                    progress["state"] = "budget_exhausted"
+                    break
+                # Let request handlers run between chunks
+                await asyncio.sleep(0)
+            else:
+                progress["state"] = "done"
+        except Exception as e:
+            progress["state"] = "failed"
+            progress["error"] = str(e)
+            logger.error(f"Cache warm start failed: {e}")
+        progress["elapsed_seconds"] = round(time.monotonic() - started, 3)
+        if progress["loaded"]:
+            logger.info(f"🔥 Cache warmed with {progress['loaded']} of {progress['total']} hot entries in {progress['elapsed_seconds']}s")
+    
+    async def _snapshot_loop(self):
+        while True:
+            await asyncio.sleep(self.snapshot_interval)
+            await self.snapshot()
+    
+    def start(self):
+        """Warm L1 from the last snapshot in the background and keep snapshotting"""
+        if not self._tasks:
+            self._tasks = [
+                asyncio.create_task(self.warm_start()),
+                asyncio.create_task(self._snapshot_loop())
+            ]
+    
+    async def stop(self):
+        """Stop background work and write a final snapshot for the next process"""
+        for task in self._tasks:
+            task.cancel()
+        for task in self._tasks:
+            try:
+                await task
+            except asyncio.CancelledError:
+                pass
+        self._tasks = []
+        await self.snapshot()
+    
+    async def invalidate_namespace(self, namespace: str) -> int:
+        """Invalidate every entry of a namespace by bumping its version; returns the new version"""
+        version = await redis_manager.incr(self._version_key(namespace))
+        if version is None:
+            # Redis unavailable - at least stop serving this worker's copies
+            cached = self._versions.get(namespace)
+            version = (cached[0] if cached else 0) + 1
+        self._versions[namespace] = (int(version), time.time() + self.l1_ttl)
+        self._drop_l1(prefix=f"cache:{namespace}:")
+        logger.info(f"Invalidated cache namespace {namespace} (now v{version})")
+        return int(version)
+    
+    async def invalidate_tag(self, *tags: str) -> int:
+        """Delete every entry carrying any of `tags`; returns the number of keys removed"""
+        keys = set()
+        for tag in tags:
+            keys.update(await redis_manager.smembers(self._tag_key(tag)) or ())
+        self._drop_l1(keys)
+        if not keys:
+            await redis_manager.delete(*(self._tag_key(tag) for tag in tags))
+            return 0
+        deleted = await redis_manager.delete(*keys, *(self._tag_key(tag) for tag in tags))
+        logger.info(f"Invalidated {len(keys)} cache entries tagged {', '.join(tags)}")
+        return deleted
+    
     async def invalidate_pattern(self, pattern: str) -> int:
-        """Invalidate cache keys matching pattern"""
+        """Invalidate cache keys matching pattern (walks the keyspace - prefer namespaces or tags)"""
+        self._drop_l1(prefix=f"cache:{pattern}")
         try:
-            keys = await redis_manager.keys(f"cache:{pattern}*")
-            if keys:
-                deleted = await redis_manager.delete(*keys)
+            deleted = 0
+            async for keys in redis_manager.scan_iter(f"cache:{pattern}*"):
+                pipeline = await redis_manager.pipeline()
+                pipeline.unlink(*keys)
+                deleted += (await pipeline.execute())[0]
+            if deleted:
                 logger.info(f"Invalidated {deleted} cache keys matching {pattern}")
-                return deleted
-            return 0
+            return deleted
         except Exception as e:
             logger.error(f"Cache invalidation error for pattern {pattern}: {e}")
             return 0
     
+    def stats(self) -> dict:
+        return {
+            "l1_keys": len(self._l1),
+            "namespaces": self.prefix_stats(),
+            "warmup": self.warmup
+        }
+    
+    def prefix_stats(self) -> Dict[str, Dict[str, Any]]:
+        """Hit/miss/stale counters per namespace, from this worker"""
+        stats = {}
+        for prefix, counters in self._stats.items():
+            hits = counters["l1_hits"] + counters["l2_hits"]
+            lookups = hits + counters["misses"]
+            stats[prefix] = {
+                **counters,
+                "hit_ratio": round(hits / lookups, 4) if lookups else 0.0
+            }
+        return stats
+    
     async def get_stats(self) -> dict:
         """Get cache statistics"""
         try:
-            # Get all cache keys
-            cache_keys = await redis_manager.keys("cache:*")
-            
             stats = {
-                "total_keys": len(cache_keys),
+                "total_keys": 0,
                 "keys_by_prefix": {},
-                "memory_usage": "N/A"
+                "memory_usage": "N/A",
+                "l1_keys": len(self._l1),
+                "prefixes": self.prefix_stats()
             }
             
-            # Group keys by prefix
-            for key in cache_keys:
-                prefix = key.split(":")[1] if ":" in key else "other"
-                stats["keys_by_prefix"][prefix] = stats["keys_by_prefix"].get(prefix, 0) + 1
-                
-            return stats
+            # Stream cache keys instead of loading the whole keyspace at once
+            async for cache_keys in redis_manager.scan_iter("cache:*"):
+                stats["total_keys"] += len(cache_keys)
+                for key in cache_keys:
+                    prefix = key.split(":")[1] if ":" in key else "other"
+                    if prefix.startswith("_"):
+                        # Namespace versions and tag sets, not entries
+                        continue
+                    stats["keys_by_prefix"][prefix] = stats["keys_by_prefix"].get(prefix, 0) + 1
             
+            return stats
+        
         except Exception as e:
             logger.error(f"Cache stats error: {e}")
             return {"error": str(e)}
 
 # Global cache service instance
-cache_service = CacheService()
\ No newline at end of file
+cache_service = CacheService()
@@ -0,0 +1,76 @@
+import gzip
+import hashlib
+import json
+import logging
+import os
+import time
+from typing import Any, Dict, Optional
+
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+class CatalogPayload:
+    """Serialized, pre-compressed representation of a JSON document"""
+
+    __slots__ = ("body", "gzip_body", "etag", "loaded_at")
+
+    def __init__(self, data: Any, etag: str = None):
+        self.body = json.dumps(data, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+        self.gzip_body = gzip.compress(self.body, compresslevel=9, mtime=0)
+        self.etag = etag or f'"{hashlib.sha256(self.body).hexdigest()[:32]}"'
+        self.loaded_at = time.time()
+
+class CatalogService:
+    def __init__(self, data_dir: str = None, reload_interval: float = None):
+        self.data_dir = data_dir or settings.CATALOG_DATA_DIR
+        self.reload_interval = settings.CATALOG_RELOAD_INTERVAL if reload_interval is None else reload_interval
+        self._catalogs: Dict[str, dict] = {}
+
+    def register(self, name: str, filename: str):
+        """Register a catalog backed by a JSON file in the data directory"""
+        self._catalogs[name] = {
+            "path": os.path.join(self.data_dir, filename),
+            "mtime": None,
+            "payload": None,
+            "checked_at": 0.0,
+        }
+
+    def _load(self, entry: dict, mtime: float):
+        with open(entry["path"], "r", encoding="utf-8") as f:
+            data = json.load(f)
+        entry["payload"] = CatalogPayload(data)
+        entry["mtime"] = mtime
+        logger.info(f"📚 Catalog loaded from {entry['path']} (etag {entry['payload'].etag})")
+
+    def get(self, name: str) -> Optional[CatalogPayload]:
+        """Get the current payload, reloading it if the data file changed"""
+        entry = self._catalogs.get(name)
+        if entry is None:
+            return None
+
+        now = time.monotonic()
+        if entry["payload"] is not None and now - entry["checked_at"] < self.reload_interval:
+            return entry["payload"]
+        entry["checked_at"] = now
+
+        try:
+            mtime = os.stat(entry["path"]).st_mtime
+            if mtime != entry["mtime"]:
+                self._load(entry, mtime)
+        except Exception as e:
+            # Keep serving the last good payload if the file is missing or malformed
+            logger.error(f"Catalog reload failed for {name}: {e}")
+
+        return entry["payload"]
+
+    def preload(self):
+        """Load every registered catalog up front"""
+        for name in self._catalogs:
+            self.get(name)
+
+# Global catalog service instance
+catalog_service = CatalogService()
+catalog_service.register("resources:kenya", "resources_kenya.json")
+catalog_service.register("languages:supported", "languages_supported.json")
+catalog_service.register("cultural_context:kenya", "cultural_context_kenya.json")
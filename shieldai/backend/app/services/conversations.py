@@ -0,0 +1,151 @@
+import hashlib
+import logging
+import re
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Tuple
+
+from redis.exceptions import WatchError
+
+from app.core.config import settings
+from app.core.redis import redis_manager
+
+logger = logging.getLogger(__name__)
+
+_WHITESPACE_RE = re.compile(r"\s+")
+
+def message_fingerprint(text: str) -> str:
+    """Stable short fingerprint of a normalized message"""
+    normalized = _WHITESPACE_RE.sub(" ", text.lower()).strip()
+    return hashlib.blake2b(normalized.encode("utf-8"), digest_size=8).hexdigest()
+
+class ConversationService:
+    """
+    Rolling per-thread state: decayed toxicity score, category counters and the last
+    N message fingerprints. Each message updates the state in O(1), so escalation
+    across a thread is detected without re-analyzing its history.
+    """
+
+    def __init__(self):
+        self.ttl = settings.THREAD_STATE_TTL
+        self.half_life = settings.THREAD_HALF_LIFE
+        self.max_fingerprints = settings.THREAD_FINGERPRINTS
+        self.escalation_score = settings.THREAD_ESCALATION_SCORE
+        self.escalation_messages = settings.THREAD_ESCALATION_MESSAGES
+        self.local_max_threads = settings.THREAD_LOCAL_MAX
+        # Used only while Redis is unavailable
+        self._local: "OrderedDict[str, Tuple[float, Dict[str, str]]]" = OrderedDict()
+
+    @staticmethod
+    def _key(tenant: str, thread_id: str) -> str:
+        return f"thread:{tenant}:{thread_id}"
+
+    def _apply(self, state: Dict[str, str], text: str, result: Any, now: float) -> Dict[str, str]:
+        """Fold one message into the thread state; returns the fields to write"""
+        score = float(state.get("score", 0.0))
+        updated_at = float(state.get("updated_at", now))
+        if score and self.half_life > 0:
+            score *= 0.5 ** (max(0.0, now - updated_at) / self.half_life)
+
+        toxicity = float(result.get("toxicity_score", 0.0))
+        score += toxicity
+
+        fingerprint = message_fingerprint(text)
+        fingerprints = [fp for fp in state.get("fingerprints", "").split(",") if fp]
+        repeated = fingerprint in fingerprints
+        fingerprints.append(fingerprint)
+
+        updates = {
+            "score": round(score, 4),
+            "peak": round(max(score, float(state.get("peak", 0.0))), 4),
+            "updated_at": now,
+            "messages": int(state.get("messages", 0)) + 1,
+            "flagged": int(state.get("flagged", 0)) + (1 if toxicity > 0 else 0),
+            "toxic": int(state.get("toxic", 0)) + (1 if result.get("is_toxic") else 0),
+            "repeats": int(state.get("repeats", 0)) + (1 if repeated else 0),
+            "fingerprints": ",".join(fingerprints[-self.max_fingerprints:]),
+        }
+        if toxicity > 0:
+            for category in result.get("categories", ()):
+                field = f"cat:{category}"
+                updates[field] = int(state.get(field, 0)) + 1
+        return updates
+
+    def _summary(self, thread_id: str, state: Dict[str, Any], repeated: bool) -> Dict[str, Any]:
+        score = float(state.get("score", 0.0))
+        flagged = int(state.get("flagged", 0))
+        escalated = score >= self.escalation_score or flagged >= self.escalation_messages
+        if escalated:
+            warning_level = "high"
+        elif score >= self.escalation_score / 2:
+            warning_level = "medium"
+        elif score > 0:
+            warning_level = "low"
+        else:
+            warning_level = "none"
+
+        return {
+            "thread_id": thread_id,
+            "score": round(score, 3),
+            "peak_score": round(float(state.get("peak", 0.0)), 3),
+            "messages": int(state.get("messages", 0)),
+            "flagged_messages": flagged,
+            "toxic_messages": int(state.get("toxic", 0)),
+            "repeated_messages": int(state.get("repeats", 0)),
+            "repeated_message": repeated,
+            "categories": {
+                field[4:]: int(value) for field, value in state.items() if field.startswith("cat:")
+            },
+            "escalated": escalated,
+            "warning_level": warning_level,
+        }
+
+    async def _update_redis(self, key: str, text: str, result: Any, now: float) -> Tuple[Dict[str, Any], bool]:
+        # Optimistic WATCH/MULTI so concurrent messages in a thread don't overwrite each other
+        for _ in range(3):
+            pipeline = await redis_manager.pipeline()
+            try:
+                await pipeline.watch(key)
+                state = await pipeline.hgetall(key)
+                updates = self._apply(state, text, result, now)
+                pipeline.multi()
+                pipeline.hset(key, mapping=updates)
+                pipeline.expire(key, self.ttl)
+                await pipeline.execute()
+                repeated = updates["repeats"] > int(state.get("repeats", 0))
+                return {**state, **updates}, repeated
+            except WatchError:
+                continue
+            finally:
+                await pipeline.reset()
+        raise RuntimeError(f"Thread state for {key} is under heavy contention")
+
+    def _update_local(self, key: str, text: str, result: Any, now: float) -> Tuple[Dict[str, Any], bool]:
+        expires_at, state = self._local.pop(key, (0.0, {}))
+        if expires_at < now:
+            state = {}
+        updates = self._apply(state, text, result, now)
+        merged = {**state, **{k: str(v) for k, v in updates.items()}}
+        self._local[key] = (now + self.ttl, merged)
+        while len(self._local) > self.local_max_threads:
+            self._local.popitem(last=False)
+        return merged, updates["repeats"] > int(state.get("repeats", 0))
+
+    async def track_message(self, tenant: str, thread_id: str, text: str, result: Any) -> Dict[str, Any]:
+        """Update thread state with an analyzed message and return the thread summary"""
+        key = self._key(tenant, thread_id)
+        now = time.time()
+        if redis_manager.is_connected:
+            try:
+                state, repeated = await self._update_redis(key, text, result, now)
+                return self._summary(thread_id, state, repeated)
+            except Exception as e:
+                logger.error(f"Thread state update failed for {thread_id}: {e}")
+
+        state, repeated = self._update_local(key, text, result, now)
+        summary = self._summary(thread_id, state, repeated)
+        summary["fallback"] = True
+        return summary
+
+# Global conversation service instance
+conversation_service = ConversationService()
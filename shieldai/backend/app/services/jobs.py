@@ -0,0 +1,513 @@
+import asyncio
+import logging
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from collections import defaultdict, deque
+from typing import Any, Dict, List, Optional
+
+from redis.exceptions import WatchError
+
+from app.core.config import settings
+from app.core.redis import redis_manager
+from app.core.serialization import dumps
+from app.services.results import AnalysisRecord
+from app.services.verdict_cache import verdict_cache
+
+logger = logging.getLogger(__name__)
+
+FINISHED_STATUSES = ("completed", "cancelled", "failed")
+_FINISHED_SQL = "('completed', 'cancelled', 'failed')"
+
+class JobLimitExceeded(Exception):
+    """Raised when a tenant already has the maximum number of unfinished jobs"""
+
+def _encode_item(result: Any, index: int, text: str) -> str:
+    if isinstance(result, AnalysisRecord):
+        return result.to_json(b',"index":%d' % index).decode("utf-8")
+    if result is None:
+        return dumps({
+            "error": "analysis_failed",
+            "text": text[:100] + "..." if len(text) > 100 else text,
+            "index": index
+        }).decode("utf-8")
+    item = dict(result)
+    item["index"] = index
+    return dumps(item).decode("utf-8")
+
+class RedisJobStore:
+    """
+    Job metadata, inputs and results in Redis; keys expire once a job finishes.
+    Results are stored as one codec-encoded (compressed) entry per chunk.
+    """
+
+    name = "redis"
+
+    def __init__(self, ttl: int):
+        self.ttl = ttl
+
+    @staticmethod
+    def _key(job_id: str, suffix: str = "") -> str:
+        # Hash tag keeps a job's keys on one shard, so its MULTI blocks stay atomic
+        return f"jobs:{{{job_id}}}{':' + suffix if suffix else ''}"
+
+    @staticmethod
+    def _decode(meta: Dict[str, str]) -> Optional[Dict[str, Any]]:
+        if not meta:
+            return None
+        decoded = dict(meta)
+        for field in ("total", "processed", "toxic_count", "chunk_size"):
+            decoded[field] = int(meta.get(field, 0))
+        for field in ("created_at", "updated_at"):
+            decoded[field] = float(meta.get(field, 0))
+        return decoded
+
+    async def init(self):
+        pass
+
+    async def _pipeline(self, raw: bool = False):
+        pipeline = await redis_manager.pipeline(raw=raw)
+        if pipeline is None:
+            raise RuntimeError("Redis is not connected")
+        return pipeline
+
+    async def create(self, meta: Dict[str, Any], texts: List[str]):
+        job_id = meta["id"]
+        pipeline = await self._pipeline()
+        pipeline.hset(self._key(job_id), mapping={k: str(v) for k, v in meta.items()})
+        for start in range(0, len(texts), 1000):
+            pipeline.rpush(self._key(job_id, "texts"), *texts[start:start + 1000])
+        pipeline.sadd("jobs:active", job_id)
+        pipeline.sadd(f"jobs:tenant:{meta['tenant']}", job_id)
+        await pipeline.execute()
+
+    async def get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        return self._decode(await redis_manager.hgetall(self._key(job_id)))
+
+    async def count_unfinished(self, tenant: str) -> int:
+        return len(await redis_manager.smembers(f"jobs:tenant:{tenant}"))
+
+    async def unfinished(self) -> List[str]:
+        return list(await redis_manager.smembers("jobs:active"))
+
+    async def claim(self, job_id: str, owner: str, lease: int) -> bool:
+        pipeline = await self._pipeline()
+        pipeline.set(self._key(job_id, "lease"), owner, nx=True, ex=lease)
+        pipeline.get(self._key(job_id, "lease"))
+        claimed, holder = await pipeline.execute()
+        if not claimed and holder == owner:
+            await redis_manager.expire(self._key(job_id, "lease"), lease)
+        return bool(claimed) or holder == owner
+
+    async def release(self, job_id: str, owner: str):
+        if await redis_manager.get(self._key(job_id, "lease")) == owner:
+            await redis_manager.delete(self._key(job_id, "lease"))
+
+    async def read_texts(self, job_id: str, offset: int, count: int) -> List[str]:
+        pipeline = await self._pipeline()
+        pipeline.lrange(self._key(job_id, "texts"), offset, offset + count - 1)
+        return (await pipeline.execute())[0]
+
+    async def append_results(self, job_id: str, offset: int, items: List[str], toxic: int):
+        # Results and progress move together so a restart resumes exactly where we stopped
+        results_key = self._key(job_id, "results")
+        pipeline = await self._pipeline(raw=True)
+        pipeline.rpush(results_key, redis_manager.encode(results_key, items))
+        pipeline.hset(self._key(job_id), mapping={"processed": offset + len(items), "updated_at": time.time()})
+        pipeline.hincrby(self._key(job_id), "toxic_count", toxic)
+        await pipeline.execute()
+
+    async def read_results(self, job_id: str, offset: int, limit: int) -> List[str]:
+        meta = await self.get(job_id)
+        if meta is None:
+            return []
+        chunk_size = meta["chunk_size"]
+        first, last = offset // chunk_size, (offset + limit - 1) // chunk_size
+
+        results_key = self._key(job_id, "results")
+        pipeline = await self._pipeline(raw=True)
+        pipeline.lrange(results_key, first, last)
+        items = []
+        for chunk in (await pipeline.execute())[0]:
+            items.extend(redis_manager.decode(results_key, chunk))
+        start = offset - first * chunk_size
+        return items[start:start + limit]
+
+    async def set_status(self, job_id: str, status: str, error: str = None, only_unfinished: bool = False) -> bool:
+        """
+        Update a job's status; with `only_unfinished`, a job that already finished
+        (a cancel that raced the last chunk) is left alone. Returns whether it changed.
+        """
+        key = self._key(job_id)
+        for _ in range(3):
+            pipeline = await self._pipeline()
+            try:
+                # WATCH so a concurrent status change aborts this one instead of being overwritten
+                await pipeline.watch(key)
+                meta = self._decode(await pipeline.hgetall(key))
+                if meta is None or (only_unfinished and meta["status"] in FINISHED_STATUSES):
+                    return False
+                fields = {"status": status, "updated_at": time.time()}
+                if error:
+                    fields["error"] = error
+                pipeline.multi()
+                pipeline.hset(key, mapping=fields)
+                if status in FINISHED_STATUSES:
+                    pipeline.delete(self._key(job_id, "texts"))
+                    for suffix in ("", "results"):
+                        pipeline.expire(self._key(job_id, suffix), self.ttl)
+                await pipeline.execute()
+                break
+            except WatchError:
+                continue
+            finally:
+                await pipeline.reset()
+        else:
+            raise RuntimeError(f"Status of job {job_id} is under heavy contention")
+
+        if status in FINISHED_STATUSES:
+            # The index sets live outside the job's hash tag, so they can't join the transaction
+            pipeline = await self._pipeline()
+            pipeline.srem("jobs:active", job_id)
+            pipeline.srem(f"jobs:tenant:{meta['tenant']}", job_id)
+            await pipeline.execute()
+        return True
+
+class SQLiteJobStore:
+    """Local fallback when Redis is unavailable; survives restarts of a single host"""
+
+    name = "sqlite"
+
+    def __init__(self, path: str, ttl: int):
+        self.path = path
+        self.ttl = ttl
+        self._conn: Optional[sqlite3.Connection] = None
+        self._lock = threading.Lock()
+
+    def _run(self, sql: str, params=(), fetch: bool = False):
+        with self._lock:
+            cursor = self._conn.execute(sql, params)
+            rows = cursor.fetchall() if fetch else None
+            self._conn.commit()
+            return rows
+
+    async def _exec(self, *args, **kwargs):
+        return await asyncio.to_thread(self._run, *args, **kwargs)
+
+    def _connect(self):
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._conn = sqlite3.connect(self.path, check_same_thread=False)
+        self._conn.row_factory = sqlite3.Row
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript("""
+            CREATE TABLE IF NOT EXISTS jobs (
+                id TEXT PRIMARY KEY, tenant TEXT, platform TEXT, status TEXT,
+                total INTEGER, processed INTEGER, toxic_count INTEGER, chunk_size INTEGER,
+                created_at REAL, updated_at REAL, error TEXT,
+                lease_owner TEXT, lease_until REAL
+            );
+            CREATE INDEX IF NOT EXISTS idx_jobs_status ON jobs(status);
+            CREATE TABLE IF NOT EXISTS job_texts (
+                job_id TEXT, idx INTEGER, text TEXT, PRIMARY KEY (job_id, idx)
+            ) WITHOUT ROWID;
+            CREATE TABLE IF NOT EXISTS job_results (
+                job_id TEXT, idx INTEGER, payload TEXT, PRIMARY KEY (job_id, idx)
+            ) WITHOUT ROWID;
+        """)
+        # Drop finished jobs past their retention
+        cutoff = time.time() - self.ttl
+        expired = [row[0] for row in self._conn.execute(
+            f"SELECT id FROM jobs WHERE status IN {_FINISHED_SQL} AND updated_at < ?", (cutoff,)
+        )]
+        for job_id in expired:
+            for table in ("job_results", "job_texts"):
+                self._conn.execute(f"DELETE FROM {table} WHERE job_id = ?", (job_id,))
+            self._conn.execute("DELETE FROM jobs WHERE id = ?", (job_id,))
+        self._conn.commit()
+
+    async def init(self):
+        await asyncio.to_thread(self._connect)
+
+    async def create(self, meta: Dict[str, Any], texts: List[str]):
+        def _create():
+            with self._lock:
+                with self._conn:
+                    self._conn.execute(
+                        "INSERT INTO jobs (id, tenant, platform, status, total, processed, toxic_count, chunk_size, created_at, updated_at) "
+                        "VALUES (:id, :tenant, :platform, :status, :total, :processed, :toxic_count, :chunk_size, :created_at, :updated_at)",
+                        meta
+                    )
+                    self._conn.executemany(
+                        "INSERT INTO job_texts (job_id, idx, text) VALUES (?, ?, ?)",
+                        ((meta["id"], i, text) for i, text in enumerate(texts))
+                    )
+        await asyncio.to_thread(_create)
+
+    async def get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        rows = await self._exec(
+            "SELECT id, tenant, platform, status, total, processed, toxic_count, chunk_size, created_at, updated_at, error "
+            "FROM jobs WHERE id = ?", (job_id,), fetch=True
+        )
+        if not rows:
+            return None
+        return {k: v for k, v in dict(rows[0]).items() if v is not None}
+
+    async def count_unfinished(self, tenant: str) -> int:
+        rows = await self._exec(
+            f"SELECT COUNT(*) FROM jobs WHERE tenant = ? AND status NOT IN {_FINISHED_SQL}", (tenant,), fetch=True
+        )
+        return rows[0][0]
+
+    async def unfinished(self) -> List[str]:
+        rows = await self._exec(
+            f"SELECT id FROM jobs WHERE status NOT IN {_FINISHED_SQL} ORDER BY created_at", fetch=True
+        )
+        return [row[0] for row in rows]
+
+    async def claim(self, job_id: str, owner: str, lease: int) -> bool:
+        def _claim():
+            now = time.time()
+            with self._lock:
+                cursor = self._conn.execute(
+                    "UPDATE jobs SET lease_owner = ?, lease_until = ? "
+                    "WHERE id = ? AND (lease_owner IS NULL OR lease_owner = ? OR lease_until < ?)",
+                    (owner, now + lease, job_id, owner, now)
+                )
+                self._conn.commit()
+                return cursor.rowcount == 1
+        return await asyncio.to_thread(_claim)
+
+    async def release(self, job_id: str, owner: str):
+        await self._exec(
+            "UPDATE jobs SET lease_owner = NULL, lease_until = NULL WHERE id = ? AND lease_owner = ?", (job_id, owner)
+        )
+
+    async def read_texts(self, job_id: str, offset: int, count: int) -> List[str]:
+        rows = await self._exec(
+            "SELECT text FROM job_texts WHERE job_id = ? AND idx >= ? AND idx < ? ORDER BY idx",
+            (job_id, offset, offset + count), fetch=True
+        )
+        return [row[0] for row in rows]
+
+    async def append_results(self, job_id: str, offset: int, items: List[str], toxic: int):
+        def _append():
+            with self._lock:
+                with self._conn:
+                    self._conn.executemany(
+                        "INSERT OR REPLACE INTO job_results (job_id, idx, payload) VALUES (?, ?, ?)",
+                        ((job_id, offset + i, item) for i, item in enumerate(items))
+                    )
+                    self._conn.execute(
+                        "UPDATE jobs SET processed = ?, toxic_count = toxic_count + ?, updated_at = ? WHERE id = ?",
+                        (offset + len(items), toxic, time.time(), job_id)
+                    )
+        await asyncio.to_thread(_append)
+
+    async def read_results(self, job_id: str, offset: int, limit: int) -> List[str]:
+        rows = await self._exec(
+            "SELECT payload FROM job_results WHERE job_id = ? AND idx >= ? AND idx < ? ORDER BY idx",
+            (job_id, offset, offset + limit), fetch=True
+        )
+        return [row[0] for row in rows]
+
+    async def set_status(self, job_id: str, status: str, error: str = None, only_unfinished: bool = False) -> bool:
+        def _set():
+            sql = "UPDATE jobs SET status = ?, error = COALESCE(?, error), updated_at = ? WHERE id = ?"
+            if only_unfinished:
+                sql += f" AND status NOT IN {_FINISHED_SQL}"
+            with self._lock:
+                with self._conn:
+                    changed = self._conn.execute(sql, (status, error, time.time(), job_id)).rowcount == 1
+                    if changed and status in FINISHED_STATUSES:
+                        self._conn.execute("DELETE FROM job_texts WHERE job_id = ?", (job_id,))
+                    return changed
+        return await asyncio.to_thread(_set)
+
+class JobManager:
+    """
+    Queues large batch analyses and processes them in chunks on background workers.
+    Progress is checkpointed after every chunk, so unfinished jobs resume after a restart.
+    The per-tenant concurrency bound is enforced per process: with several app workers
+    a tenant can run up to max_concurrent_per_tenant jobs in each of them.
+    """
+
+    def __init__(self):
+        self.store = None
+        self.engine = None
+        self.owner = f"worker-{uuid.uuid4().hex}"
+        self.chunk_size = settings.JOBS_CHUNK_SIZE
+        self.max_texts = settings.JOBS_MAX_TEXTS
+        self.max_concurrent_per_tenant = settings.JOBS_MAX_CONCURRENT_PER_TENANT
+        self.max_unfinished_per_tenant = settings.JOBS_MAX_UNFINISHED_PER_TENANT
+        self.lease_ttl = settings.JOBS_LEASE_TTL
+        self._queue: asyncio.Queue = asyncio.Queue()
+        self._queued = set()
+        self._running: Dict[str, int] = defaultdict(int)
+        self._deferred: Dict[str, deque] = defaultdict(deque)
+        self._tasks: List[asyncio.Task] = []
+
+    async def start(self, engine):
+        """Pick a store, re-enqueue unfinished jobs and start the workers"""
+        self.engine = engine
+        if redis_manager.is_connected:
+            self.store = RedisJobStore(settings.JOBS_RESULT_TTL)
+        else:
+            self.store = SQLiteJobStore(settings.JOBS_SQLITE_PATH, settings.JOBS_RESULT_TTL)
+        await self.store.init()
+
+        for _ in range(settings.JOBS_WORKERS):
+            self._tasks.append(asyncio.create_task(self._worker()))
+        self._tasks.append(asyncio.create_task(self._recover_loop()))
+        logger.info(f"✅ Job workers started ({settings.JOBS_WORKERS} workers, {self.store.name} store)")
+
+    async def stop(self):
+        # Running jobs keep their checkpoint and lease expiry lets any worker resume them
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+    def _enqueue(self, job_id: str):
+        if job_id not in self._queued:
+            self._queued.add(job_id)
+            self._queue.put_nowait(job_id)
+
+    async def submit(self, tenant: str, texts: List[str], platform: str) -> Dict[str, Any]:
+        if self.store is None:
+            raise RuntimeError("Job manager is not running")
+        if not texts:
+            raise ValueError("At least one text is required")
+        if len(texts) > self.max_texts:
+            raise ValueError(f"A job can contain at most {self.max_texts} texts")
+        if await self.store.count_unfinished(tenant) >= self.max_unfinished_per_tenant:
+            raise JobLimitExceeded(f"At most {self.max_unfinished_per_tenant} unfinished jobs per tenant")
+
+        now = time.time()
+        meta = {
+            "id": f"job_{uuid.uuid4().hex}",
+            "tenant": tenant,
+            "platform": platform,
+            "status": "queued",
+            "total": len(texts),
+            "processed": 0,
+            "toxic_count": 0,
+            "chunk_size": self.chunk_size,
+            "created_at": now,
+            "updated_at": now,
+        }
+        await self.store.create(meta, texts)
+        self._enqueue(meta["id"])
+        return meta
+
+    async def get(self, job_id: str, tenant: str) -> Optional[Dict[str, Any]]:
+        meta = await self.store.get(job_id)
+        if meta is None or meta.get("tenant") != tenant:
+            return None
+        return meta
+
+    async def cancel(self, job_id: str, tenant: str) -> Optional[Dict[str, Any]]:
+        meta = await self.get(job_id, tenant)
+        if meta is None:
+            return None
+        if meta["status"] not in FINISHED_STATUSES:
+            # Workers notice the status change before their next chunk
+            if await self.store.set_status(job_id, "cancelled", only_unfinished=True):
+                meta["status"] = "cancelled"
+            else:
+                meta = await self.get(job_id, tenant)
+        return meta
+
+    async def results(self, job_id: str, offset: int, limit: int) -> List[str]:
+        return await self.store.read_results(job_id, offset, limit)
+
+    async def _recover_loop(self):
+        """Pick up unfinished jobs, including ones whose owner died mid-run"""
+        while True:
+            try:
+                for job_id in await self.store.unfinished():
+                    self._enqueue(job_id)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Job recovery scan failed: {e}")
+            await asyncio.sleep(self.lease_ttl)
+
+    async def _worker(self):
+        while True:
+            job_id = await self._queue.get()
+            self._queued.discard(job_id)
+            try:
+                meta = await self.store.get(job_id)
+                if meta is None or meta["status"] in FINISHED_STATUSES:
+                    continue
+                tenant = meta["tenant"]
+                if self._running[tenant] >= self.max_concurrent_per_tenant:
+                    # Park it until one of the tenant's running jobs finishes; the recovery
+                    # scan re-enqueues parked jobs too, so park each one only once
+                    if job_id not in self._deferred[tenant]:
+                        self._deferred[tenant].append(job_id)
+                    continue
+                if not await self.store.claim(job_id, self.owner, self.lease_ttl):
+                    continue
+
+                self._running[tenant] += 1
+                try:
+                    await self._run(meta)
+                finally:
+                    self._running[tenant] -= 1
+                    await self.store.release(job_id, self.owner)
+                    if self._deferred[tenant]:
+                        self._enqueue(self._deferred[tenant].popleft())
+                    if not self._running[tenant] and not self._deferred[tenant]:
+                        del self._running[tenant], self._deferred[tenant]
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Job {job_id} failed: {e}")
+                try:
+                    await self.store.set_status(job_id, "failed", error=str(e), only_unfinished=True)
+                except Exception as status_error:
+                    logger.error(f"Could not mark job {job_id} as failed: {status_error}")
+
+    async def _run(self, meta: Dict[str, Any]):
+        job_id = meta["id"]
+        offset = meta["processed"]
+        # Chunks must keep the size the job started with (Redis results are stored per chunk)
+        chunk_size = meta.get("chunk_size") or self.chunk_size
+        if meta["status"] == "queued":
+            await self.store.set_status(job_id, "running", only_unfinished=True)
+
+        while offset < meta["total"]:
+            current = await self.store.get(job_id)
+            if current is None or current["status"] == "cancelled":
+                logger.info(f"Job {job_id} cancelled at {offset}/{meta['total']}")
+                return
+            if not await self.store.claim(job_id, self.owner, self.lease_ttl):
+                logger.warning(f"Job {job_id} lease lost at {offset}/{meta['total']}")
+                return
+
+            texts = await self.store.read_texts(job_id, offset, chunk_size)
+            if not texts:
+                raise RuntimeError(f"Job inputs missing at offset {offset}")
+            results = await verdict_cache.batch_analyze(self.engine, texts, meta["platform"])
+            items = [_encode_item(result, offset + i, text) for i, (result, text) in enumerate(zip(results, texts))]
+            toxic = sum(1 for result in results if result is not None and result.get("is_toxic"))
+            await self.store.append_results(job_id, offset, items, toxic)
+            offset += len(items)
+
+            # Let interactive requests run between chunks
+            await asyncio.sleep(0)
+
+        # A cancel that arrived during the last chunk wins
+        if await self.store.set_status(job_id, "completed", only_unfinished=True):
+            logger.info(f"✅ Job {job_id} completed: {meta['total']} texts")
+        else:
+            logger.info(f"Job {job_id} finished its last chunk after being cancelled")
+
+# Global job manager instance
+job_manager = JobManager()
@@ -0,0 +1,226 @@
+import asyncio
+import json
+import logging
+import time
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Optional
+
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+# Results go through the app's SQLAlchemy engine - without it they are not persisted
+try:
+    from sqlalchemy import insert
+    from app.database import check_database, engine
+    from app.models import AnalysisResult
+    DATABASE_AVAILABLE = True
+except ImportError:
+    DATABASE_AVAILABLE = False
+
+# Columns of models.AnalysisResult written per row (id is assigned by the database)
+COLUMNS = (
+    "text", "platform", "is_toxic", "toxicity_score", "confidence", "warning_level",
+    "detected_issues", "cultural_context", "processing_time", "created_at"
+)
+
+Row = Dict[str, Any]
+
+# Queued by stop(): everything before it gets written, then the writer exits
+_STOP = object()
+
+def result_row(text: str, platform: str, result: Any) -> Row:
+    """Flatten an analysis result into an analysis_results row"""
+    return dict(zip(COLUMNS, (
+        text,
+        platform,
+        bool(result.get("is_toxic", False)),
+        float(result.get("toxicity_score", 0.0)),
+        float(result.get("confidence", 0.0) or 0.0),
+        result.get("warning_level", "low"),
+        json.dumps(list(result.get("detected_issues", ()) or ()), ensure_ascii=False),
+        json.dumps(result.get("cultural_context") or {}, ensure_ascii=False),
+        float(result.get("processing_time", 0.0)),
+        datetime.now(timezone.utc),
+    )))
+
+class ResultWriter:
+    """
+    Write-behind persistence of analysis results. Handlers enqueue rows on a
+    bounded queue and return; one background writer drains it in batches of up
+    to `batch_size` (or whatever arrived within `flush_interval`) with a single
+    bulk insert each, through a connection from the app's database pool. A full queue makes submitters wait up to
+    `enqueue_timeout` before the row is dropped and counted, so a slow database
+    degrades history, not request latency.
+    """
+
+    def __init__(self):
+        self.enabled = settings.RESULTS_PERSISTENCE_ENABLED
+        self.batch_size = settings.RESULTS_BATCH_SIZE
+        self.flush_interval = settings.RESULTS_FLUSH_INTERVAL_MS / 1000
+        self.enqueue_timeout = settings.RESULTS_ENQUEUE_TIMEOUT_MS / 1000
+        self.max_retries = 3
+        self.backend: Optional[str] = None
+        self._queue: Optional[asyncio.Queue] = None
+        self._task: Optional[asyncio.Task] = None
+        self._stopping = False
+        self.enqueued = 0
+        self.written = 0
+        self.dropped = 0
+        self.batches = 0
+        self.failures = 0
+        self.waited = 0
+        self.last_batch_size = 0
+        self.last_batch_seconds = 0.0
+        self.last_error: Optional[str] = None
+
+    @property
+    def running(self) -> bool:
+        return self._task is not None
+
+    async def start(self):
+        """Start the writer; the analysis_results table is created with the other tables at startup"""
+        if not self.enabled or self._task is not None:
+            return
+        if not DATABASE_AVAILABLE:
+            logger.warning("Database layer unavailable - analysis results are not persisted")
+            return
+        if not await check_database():
+            logger.error("❌ Result persistence unavailable: database not reachable")
+            return
+        self.backend = engine.url.get_backend_name()
+        self._queue = asyncio.Queue(maxsize=settings.RESULTS_QUEUE_SIZE)
+        self._task = asyncio.create_task(self._run())
+        logger.info(f"✅ Result persistence started ({self.backend})")
+
+    @staticmethod
+    async def _insert(rows: List[Row]):
+        # One executemany in one transaction; SQLAlchemy sends it as multi-row INSERTs
+        async with engine.begin() as conn:
+            await conn.execute(insert(AnalysisResult), rows)
+
+    async def _put(self, row: Row, deadline: float) -> bool:
+        try:
+            self._queue.put_nowait(row)
+        except asyncio.QueueFull:
+            # Backpressure: wait for the writer until the deadline, then shed the row
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                return False
+            self.waited += 1
+            try:
+                await asyncio.wait_for(self._queue.put(row), timeout=remaining)
+            except asyncio.TimeoutError:
+                return False
+        self.enqueued += 1
+        return True
+
+    async def submit(self, text: str, platform: str, result: Any) -> bool:
+        """Queue one result for persistence; False if it had to be dropped"""
+        return await self.submit_many([text], platform, [result]) == 1
+
+    async def submit_many(self, texts: List[str], platform: str, results: List[Any]) -> int:
+        """
+        Queue every successful result of a batch; returns how many were accepted. The
+        whole batch shares one enqueue deadline, so a full queue delays the request by
+        at most `enqueue_timeout` however many texts it had.
+        """
+        if self._task is None or self._stopping:
+            return 0
+        rows = [result_row(text, platform, result) for text, result in zip(texts, results) if result is not None]
+        deadline = time.monotonic() + self.enqueue_timeout
+        for accepted, row in enumerate(rows):
+            if not await self._put(row, deadline):
+                self.dropped += len(rows) - accepted
+                return accepted
+        return len(rows)
+
+    def _take(self, rows: List[Row]) -> bool:
+        """Move queued rows into `rows` up to the batch size; True once the stop marker is reached"""
+        while len(rows) < self.batch_size:
+            try:
+                row = self._queue.get_nowait()
+            except asyncio.QueueEmpty:
+                return False
+            if row is _STOP:
+                return True
+            rows.append(row)
+        return False
+
+    async def _write(self, rows: List[Row]):
+        for attempt in range(self.max_retries):
+            start = time.perf_counter()
+            try:
+                await self._insert(rows)
+                self.written += len(rows)
+                self.batches += 1
+                self.last_batch_size = len(rows)
+                self.last_batch_seconds = time.perf_counter() - start
+                return
+            except Exception as e:
+                self.failures += 1
+                self.last_error = str(e)
+                logger.error(f"Persisting {len(rows)} analysis results failed (attempt {attempt + 1}): {e}")
+                await asyncio.sleep(0.5 * 2 ** attempt)
+        self.dropped += len(rows)
+
+    async def _run(self):
+        stopping = False
+        while not stopping:
+            row = await self._queue.get()
+            if row is _STOP:
+                break
+            rows = [row]
+            # Give a small trickle time to form a batch
+            deadline = time.monotonic() + self.flush_interval
+            stopping = self._take(rows)
+            while not stopping and len(rows) < self.batch_size and time.monotonic() < deadline:
+                await asyncio.sleep(min(0.01, self.flush_interval))
+                stopping = self._take(rows)
+            if rows:
+                await self._write(rows)
+
+    async def stop(self):
+        """Stop taking results and write everything still queued"""
+        if self._task is None:
+            return
+        self._stopping = True
+        task, self._task = self._task, None
+        if not task.done():
+            # A full queue only drains while the writer is alive - don't wait on a dead one
+            marker = asyncio.ensure_future(self._queue.put(_STOP))
+            await asyncio.wait({marker, task}, return_when=asyncio.FIRST_COMPLETED)
+            if not marker.done():
+                marker.cancel()
+            await asyncio.gather(task, return_exceptions=True)
+        if task.done() and not task.cancelled() and task.exception() is not None:
+            logger.error(f"Result writer failed: {task.exception()}")
+        # Whatever the writer didn't get to, including rows from submitters that were
+        # still waiting on a full queue
+        while not self._queue.empty():
+            rows = []
+            self._take(rows)
+            if rows:
+                await self._write(rows)
+        logger.info(f"Result persistence stopped ({self.written} rows written, {self.dropped} dropped)")
+
+    def stats(self) -> dict:
+        return {
+            "enabled": self.enabled,
+            "backend": self.backend,
+            "queued": self._queue.qsize() if self._queue else 0,
+            "capacity": self._queue.maxsize if self._queue else 0,
+            "enqueued": self.enqueued,
+            "written": self.written,
+            "dropped": self.dropped,
+            "backpressure_waits": self.waited,
+            "batches": self.batches,
+            "failures": self.failures,
+            "avg_batch_size": round(self.written / self.batches, 1) if self.batches else 0.0,
+            "last_batch_size": self.last_batch_size,
+            "last_batch_ms": round(self.last_batch_seconds * 1000, 3),
+            "last_error": self.last_error
+        }
+
+# Global result writer instance
+result_writer = ResultWriter()
@@ -1,111 +1,298 @@
+import asyncio
+import math
 import time
-from typing import Optional, Tuple
+from collections import OrderedDict
+from typing import List, Optional, Tuple
 import logging
 from app.core.redis import redis_manager
 from app.core.config import settings
 
 logger = logging.getLogger(__name__)
 
+# GCRA over several windows in one atomic call. Each window keeps a single value -
+# its theoretical arrival time (TAT) in ms - so memory is O(1) per identifier and window.
+# KEYS: one per window. ARGV: cost, then limit / window_ms pairs.
+# Nothing is written unless every window admits the request, so rejections are free.
+# Returns {rejected_window_index_or_0, then remaining, retry_after_ms, reset_after_ms per window}.
+GCRA_SCRIPT = """
+local clock = redis.call('TIME')
+local now = tonumber(clock[1]) * 1000 + math.floor(tonumber(clock[2]) / 1000)
+local cost = tonumber(ARGV[1])
+local rejected = 0
+local tats = {}
+local out = {}
+for i, key in ipairs(KEYS) do
+    local limit = tonumber(ARGV[i * 2])
+    local window = tonumber(ARGV[i * 2 + 1])
+    local interval = window / limit
+    local tat = tonumber(redis.call('GET', key)) or now
+    if tat < now then tat = now end
+    local new_tat = tat + cost * interval
+    local allow_at = new_tat - window
+    if allow_at > now then
+        if rejected == 0 then rejected = i end
+        out[#out + 1] = math.max(0, math.floor((now - (tat - window)) / interval))
+        out[#out + 1] = math.ceil(allow_at - now)
+        out[#out + 1] = math.ceil(tat - now)
+    else
+        out[#out + 1] = math.floor((now - allow_at) / interval)
+        out[#out + 1] = 0
+        out[#out + 1] = math.ceil(new_tat - now)
+    end
+    tats[i] = new_tat
+end
+if rejected == 0 then
+    for i, key in ipairs(KEYS) do
+        redis.call('SET', key, string.format('%.3f', tats[i]), 'PX', math.max(1, math.ceil(tats[i] - now)))
+    end
+end
+table.insert(out, 1, rejected)
+return out
+"""
+
+class TokenLease:
+    """Tokens taken from Redis ahead of time for one identifier and set of limits"""
+
+    __slots__ = ("tokens", "expires_at", "windows")
+
+    def __init__(self, tokens: int, expires_at: float, windows: List[dict]):
+        self.tokens = tokens
+        self.expires_at = expires_at
+        self.windows = windows
+
+    def details(self) -> dict:
+        # Leased tokens are already counted in Redis but still usable here
+        details = dict(min(self.windows, key=lambda d: d["remaining"]))
+        details["remaining"] += self.tokens
+        details["retry_after"] = 0
+        return details
+
 class RateLimiter:
+    """
+    Two-level limiter: each worker leases a small quota of tokens from the Redis GCRA
+    buckets and spends it locally, so Redis is consulted only when a lease runs out.
+    Clients near a limit get no lease and are checked exactly on every request.
+    While Redis is unreachable the same GCRA runs in process memory, so limits still
+    hold per worker instead of failing open.
+    """
+
     def __init__(self):
         self.windows = {
             'minute': 60,
             'hour': 3600,
             'day': 86400
         }
-    
-    async def is_rate_limited(
-        self, 
-        identifier: str, 
-        limit: int, 
-        window: int,
+        self.accuracy = settings.RATE_LIMIT_LOCAL_ACCURACY
+        self.lease_ttl = settings.RATE_LIMIT_LEASE_TTL
+        self.max_leases = settings.RATE_LIMIT_LOCAL_MAX_KEYS
+        self._leases: "OrderedDict[tuple, TokenLease]" = OrderedDict()
+        # Per-process TATs (ms) used while Redis is unreachable
+        self._local_tats: "OrderedDict[str, float]" = OrderedDict()
+        self._reconciled_at = time.monotonic()
+        self.checks = 0
+        self.local_hits = 0
+        self.redis_calls = 0
+        self.refunded_tokens = 0
+        self.fallback_checks = 0
+
+    @staticmethod
+    def _key(identifier: str, window: int) -> str:
+        # Hash tag keeps every window of an identifier on one shard for the script
+        return f"rate_limit:{{{identifier}}}:{window}"
+
+    async def _gcra(self, identifier: str, limits: List[Tuple[int, int]], cost: int) -> Tuple[int, List[dict]]:
+        """Run the GCRA script; a negative cost returns tokens. Returns (rejected window index or 0, per-window details)"""
+        args = [cost]
+        for limit, window in limits:
+            args.extend((limit, window * 1000))
+        result = await redis_manager.evalsha(
+            GCRA_SCRIPT, [self._key(identifier, window) for _, window in limits], args
+        )
+        return int(result[0]), self._details(limits, result[1:])
+
+    @staticmethod
+    def _details(limits: List[Tuple[int, int]], values: list) -> List[dict]:
+        """Per-window details from flat remaining / retry_after_ms / reset_after_ms triples"""
+        now = time.time()
+        details = []
+        for i, (limit, window) in enumerate(limits):
+            remaining, retry_after_ms, reset_after_ms = (int(v) for v in values[i * 3:i * 3 + 3])
+            details.append({
+                "limit": limit,
+                "window": window,
+                "remaining": remaining,
+                "reset_time": now + reset_after_ms / 1000,
+                "retry_after": retry_after_ms / 1000
+            })
+        return details
+
+    def _gcra_local(self, identifier: str, limits: List[Tuple[int, int]], cost: int) -> Tuple[int, List[dict]]:
+        """GCRA_SCRIPT in process memory, for while Redis is unreachable"""
+        self.fallback_checks += 1
+        now = time.time() * 1000
+        rejected = 0
+        values = []
+        tats = []
+        for i, (limit, window) in enumerate(limits, 1):
+            window_ms = window * 1000
+            interval = window_ms / limit
+            key = self._key(identifier, window)
+            tat = max(self._local_tats.get(key, now), now)
+            new_tat = tat + cost * interval
+            allow_at = new_tat - window_ms
+            if allow_at > now:
+                rejected = rejected or i
+                values.extend((max(0, math.floor((now - (tat - window_ms)) / interval)),
+                               math.ceil(allow_at - now), math.ceil(tat - now)))
+            else:
+                values.extend((math.floor((now - allow_at) / interval), 0, math.ceil(new_tat - now)))
+            tats.append((key, new_tat))
+
+        if not rejected:
+            for key, tat in tats:
+                self._local_tats[key] = tat
+                self._local_tats.move_to_end(key)
+            while len(self._local_tats) > self.max_leases:
+                self._local_tats.popitem(last=False)
+        return rejected, self._details(limits, values)
+
+    def _lease_size(self, limits: List[Tuple[int, int]], previous: Optional[TokenLease]) -> int:
+        # Only identifiers seen before get a lease, sized off their last known headroom
+        if self.accuracy <= 0 or previous is None:
+            return 0
+        cap = min(int(limit * self.accuracy) for limit, _ in limits)
+        headroom = min(d["remaining"] for d in previous.windows) // 2
+        return max(0, min(cap, headroom))
+
+    def _store_lease(self, lease_key: tuple, lease: TokenLease):
+        self._leases[lease_key] = lease
+        while len(self._leases) > self.max_leases:
+            evicted_key, evicted = self._leases.popitem(last=False)
+            if evicted.tokens > 0:
+                asyncio.ensure_future(self._refund([(evicted_key, evicted.tokens)]))
+
+    def _reconcile(self, now: float):
+        """Hand tokens from expired leases back to Redis (in the background)"""
+        if now - self._reconciled_at < self.lease_ttl:
+            return
+        self._reconciled_at = now
+        expired = [(key, lease) for key, lease in self._leases.items() if lease.expires_at <= now]
+        for key, _ in expired:
+            del self._leases[key]
+        refunds = [(key, lease.tokens) for key, lease in expired if lease.tokens > 0]
+        if refunds:
+            asyncio.ensure_future(self._refund(refunds))
+
+    async def _refund(self, refunds: List[Tuple[tuple, int]]):
+        results = await asyncio.gather(
+            *(self._gcra(identifier, list(limits), -tokens) for (identifier, limits), tokens in refunds),
+            return_exceptions=True
+        )
+        for ((identifier, _), tokens), result in zip(refunds, results):
+            if isinstance(result, Exception):
+                logger.warning(f"Rate limit lease refund failed for {identifier}: {result}")
+            else:
+                self.refunded_tokens += tokens
+
+    async def check_limits(
+        self,
+        identifier: str,
+        limits: List[Tuple[int, int]],
         cost: int = 1
     ) -> Tuple[bool, dict]:
         """
-        Check if request should be rate limited using sliding window algorithm
+        Check (limit, window_seconds) pairs for an identifier. Served from the local lease
+        when it covers `cost`; otherwise one atomic GCRA round trip that also takes the
+        next lease and returns any leftover tokens. Details describe the rejecting window,
+        or the tightest one if the request is allowed.
         """
+        limits = [(limit, window) for limit, window in limits if limit > 0]
+        if not limits:
+            return False, {}
+        self.checks += 1
+        if not redis_manager.is_connected:
+            # Scripts can't run on the in-memory fallback - limit per process instead
+            return self._local_result(identifier, limits, cost)
+
+        now = time.monotonic()
+        lease_key = (identifier, tuple(limits))
+        lease = self._leases.pop(lease_key, None)
+        if lease is not None and lease.expires_at > now and lease.tokens >= cost:
+            lease.tokens -= cost
+            self._leases[lease_key] = lease
+            self.local_hits += 1
+            return False, lease.details()
+
+        self._reconcile(now)
+        leftover = lease.tokens if lease is not None else 0
+        extra = self._lease_size(limits, lease)
+        self.redis_calls += 1
         try:
-            key = f"rate_limit:{identifier}:{window}"
-            current_time = time.time()
-            window_start = current_time - window
-            
-            # Use Redis pipeline for atomic operations
-            pipeline = await redis_manager.pipeline()
-            
-            # Remove old timestamps
-            pipeline.zremrangebyscore(key, 0, window_start)
-            
-            # Count current requests in window
-            pipeline.zcard(key)
-            
-            # Add current request
-            pipeline.zadd(key, {str(current_time): current_time})
-            
-            # Set expiration
-            pipeline.expire(key, window + 10)  # Extra 10 seconds grace period
-            
-            results = await pipeline.execute()
-            
-            current_count = results[1] if results else 0
-            
-            # Check if limit exceeded
-            if current_count + cost > limit:
-                # Get oldest timestamp to calculate reset time
-                oldest = await redis_manager.zrange(key, 0, 0, withscores=True)
-                reset_time = oldest[0][1] + window if oldest else current_time + window
-                
-                return True, {
-                    "limit": limit,
-                    "remaining": 0,
-                    "reset_time": reset_time,
-                    "retry_after": max(0, reset_time - current_time)
-                }
-            
-            return False, {
-                "limit": limit,
-                "remaining": limit - (current_count + cost),
-                "reset_time": current_time + window,
-                "retry_after": 0
-            }
-            
+            rejected, details = await self._gcra(identifier, limits, cost + extra - leftover)
+            if rejected and extra:
+                # No room for a lease - nothing was written, so retry for this request alone
+                extra = 0
+                rejected, details = await self._gcra(identifier, limits, cost - leftover)
         except Exception as e:
             logger.error(f"Rate limit check failed for {identifier}: {e}")
-            # Fail open - don't rate limit if Redis is down
-            return False, {
-                "limit": limit,
-                "remaining": limit,
-                "reset_time": time.time() + window,
-                "retry_after": 0
-            }
-    
+            # Leftover lease tokens are lost with the lease; limit per process meanwhile
+            return self._local_result(identifier, limits, cost)
+
+        if rejected:
+            # Leftover tokens were not spent; keep the observed headroom for sizing
+            self._store_lease(lease_key, TokenLease(leftover, now + self.lease_ttl, details))
+            return True, details[rejected - 1]
+
+        fresh = TokenLease(extra, now + self.lease_ttl, details)
+        self._store_lease(lease_key, fresh)
+        return False, fresh.details()
+
+    def _local_result(self, identifier: str, limits: List[Tuple[int, int]], cost: int) -> Tuple[bool, dict]:
+        rejected, details = self._gcra_local(identifier, limits, cost)
+        if rejected:
+            return True, details[rejected - 1]
+        return False, min(details, key=lambda d: d["remaining"])
+
+    async def is_rate_limited(
+        self,
+        identifier: str,
+        limit: int,
+        window: int,
+        cost: int = 1
+    ) -> Tuple[bool, dict]:
+        """
+        Check if request should be rate limited (GCRA, single window)
+        """
+        return await self.check_limits(identifier, [(limit, window)], cost)
+
     async def check_api_rate_limit(
-        self, 
-        user_id: Optional[str] = None, 
-        ip_address: Optional[str] = None
+        self,
+        user_id: Optional[str] = None,
+        ip_address: Optional[str] = None,
+        cost: int = 1
     ) -> Tuple[bool, dict]:
         """
-        Check rate limits for API endpoints
+        Check rate limits for API endpoints - every window in one atomic call
         """
         identifier = user_id or ip_address or "anonymous"
-        
-        limits = [
+
+        return await self.check_limits(identifier, [
             (settings.RATE_LIMIT_PER_MINUTE, self.windows['minute']),
             (settings.RATE_LIMIT_PER_HOUR, self.windows['hour']),
-        ]
-        
-        for limit, window in limits:
-            is_limited, details = await self.is_rate_limited(
-                f"{identifier}:{window}", limit, window
-            )
-            if is_limited:
-                return True, details
-        
-        return False, {
-            "limit": limits[0][0],
-            "remaining": limits[0][0],
-            "reset_time": time.time() + self.windows['minute'],
-            "retry_after": 0
+        ], cost)
+
+    def stats(self) -> dict:
+        return {
+            "checks": self.checks,
+            "local_hits": self.local_hits,
+            "redis_calls": self.redis_calls,
+            "redis_ratio": round(self.redis_calls / self.checks, 4) if self.checks else 0.0,
+            "active_leases": len(self._leases),
+            "refunded_tokens": self.refunded_tokens,
+            "fallback_checks": self.fallback_checks,
+            "fallback_keys": len(self._local_tats),
+            "accuracy": self.accuracy
         }
 
 # Global rate limiter instance
-rate_limiter = RateLimiter()
\ No newline at end of file
+rate_limiter = RateLimiter()
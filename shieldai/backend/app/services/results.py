@@ -0,0 +1,209 @@
+import math
+import operator
+from typing import Any, Dict, List, Optional, Sequence
+
+from app.core.serialization import dumps
+
+# Constant sub-objects shared by every analysis result - treat as read-only
+CULTURAL_CONTEXT = {
+    "region": "kenya",
+    "model_type": "rule_based",
+    "local_context_aware": True
+}
+SAFE_CATEGORIES = ("safe",)
+NO_ISSUES = ("No toxic patterns detected",)
+
+_CULTURAL_CONTEXT_JSON = dumps(CULTURAL_CONTEXT)
+_SAFE_CATEGORIES_JSON = dumps(SAFE_CATEGORIES)
+_NO_ISSUES_JSON = dumps(NO_ISSUES)
+
+def _number(value) -> bytes:
+    """JSON number for an int or float, numpy scalars included; NaN and infinities are refused"""
+    try:
+        return b"%d" % operator.index(value)
+    except TypeError:
+        pass
+    number = float(value)
+    if not math.isfinite(number):
+        raise ValueError(f"{number!r} is not a valid JSON number")
+    return repr(number).encode("ascii")
+
+class AnalysisRecord:
+    """
+    Compact analysis result. Per-result values live in slots; constant fields are
+    class attributes shared by every instance. Supports dict-style access so callers
+    written against the old dict results keep working.
+    """
+
+    __slots__ = (
+        "toxicity_score",
+        "is_toxic",
+        "categories",
+        "warning_level",
+        "processing_time",
+        "detected_issues",
+        # Request metadata, filled in by the API layer
+        "request_id",
+        "timestamp",
+        "region",
+        "total_processing_time",
+        "batch_index",
+        # Served from the verdict cache
+        "cached",
+    )
+
+    confidence = 0.85
+    model_type = "rule_based"
+    cultural_context = CULTURAL_CONTEXT
+
+    _FIELDS = ("toxicity_score", "is_toxic", "categories", "confidence", "warning_level",
+               "processing_time", "detected_issues", "cultural_context", "model_type")
+    _METADATA = ("request_id", "timestamp", "region", "total_processing_time", "batch_index", "cached")
+
+    def __init__(
+        self,
+        toxicity_score: float,
+        is_toxic: bool,
+        categories: Sequence[str],
+        warning_level: str,
+        processing_time: float,
+        detected_issues: Sequence[str]
+    ):
+        self.toxicity_score = toxicity_score
+        self.is_toxic = is_toxic
+        self.categories = categories
+        self.warning_level = warning_level
+        self.processing_time = processing_time
+        self.detected_issues = detected_issues
+        self.request_id = None
+        self.timestamp = None
+        self.region = None
+        self.total_processing_time = None
+        self.batch_index = None
+        self.cached = None
+
+    # Dict-style compatibility
+    def __getitem__(self, key: str) -> Any:
+        if key in self._FIELDS or (key in self._METADATA and getattr(self, key) is not None):
+            return getattr(self, key)
+        raise KeyError(key)
+
+    def __setitem__(self, key: str, value: Any):
+        if key not in self._METADATA:
+            raise KeyError(key)
+        setattr(self, key, value)
+
+    def __contains__(self, key: str) -> bool:
+        try:
+            self[key]
+            return True
+        except KeyError:
+            return False
+
+    def get(self, key: str, default: Any = None) -> Any:
+        try:
+            return self[key]
+        except KeyError:
+            return default
+
+    def to_dict(self) -> Dict[str, Any]:
+        data = {field: getattr(self, field) for field in self._FIELDS}
+        data["categories"] = list(self.categories)
+        data["detected_issues"] = list(self.detected_issues)
+        for field in self._METADATA:
+            value = getattr(self, field)
+            if value is not None:
+                data[field] = value
+        return data
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "AnalysisRecord":
+        # Re-use the shared tuples so decoded records stay compact
+        categories = tuple(data.get("categories") or SAFE_CATEGORIES)
+        issues = tuple(data.get("detected_issues") or NO_ISSUES)
+        return cls(
+            toxicity_score=data.get("toxicity_score", 0.0),
+            is_toxic=data.get("is_toxic", False),
+            categories=SAFE_CATEGORIES if categories == SAFE_CATEGORIES else categories,
+            warning_level=data.get("warning_level", "none"),
+            processing_time=data.get("processing_time", 0.0),
+            detected_issues=NO_ISSUES if issues == NO_ISSUES else issues,
+        )
+
+    def to_json(self, extra: bytes = b"") -> bytes:
+        """
+        Encode straight to JSON bytes without building an intermediate dict.
+        `extra` is an already-encoded `,"key":value` fragment appended to the object.
+        """
+        categories = self.categories
+        issues = self.detected_issues
+        parts = [
+            b'{"toxicity_score":', _number(self.toxicity_score),
+            b',"is_toxic":', b"true" if self.is_toxic else b"false",
+            b',"categories":', _SAFE_CATEGORIES_JSON if categories is SAFE_CATEGORIES else dumps(categories),
+            b',"confidence":', _number(self.confidence),
+            b',"warning_level":', dumps(self.warning_level),
+            b',"processing_time":', _number(self.processing_time),
+            b',"detected_issues":', _NO_ISSUES_JSON if issues is NO_ISSUES else dumps(issues),
+            b',"cultural_context":', _CULTURAL_CONTEXT_JSON,
+            b',"model_type":', dumps(self.model_type),
+        ]
+        if self.request_id is not None:
+            parts += (b',"request_id":', dumps(self.request_id))
+        if self.timestamp is not None:
+            parts += (b',"timestamp":', dumps(self.timestamp))
+        if self.region is not None:
+            parts += (b',"region":', dumps(self.region))
+        if self.total_processing_time is not None:
+            parts += (b',"total_processing_time":', _number(self.total_processing_time))
+        if self.batch_index is not None:
+            parts += (b',"batch_index":', _number(self.batch_index))
+        if self.cached is not None:
+            parts += (b',"cached":', b"true" if self.cached else b"false")
+        parts += (extra, b"}")
+        return b"".join(parts)
+
+def encode_result(result: Any) -> bytes:
+    """Encode a single analysis result (record or legacy dict)"""
+    if isinstance(result, AnalysisRecord):
+        return result.to_json()
+    return dumps(result)
+
+def encode_batch_response(
+    results: List[Optional[Any]],
+    texts: Sequence[str],
+    processing_time: float,
+    timestamp: str,
+    region: str = "Kenya"
+) -> bytes:
+    """
+    Encode a batch response in one pass. Items are written directly into the output
+    buffer; `None` entries are reported as per-item failures.
+    """
+    region_json = dumps(region)
+    items = []
+    for i, result in enumerate(results):
+        if isinstance(result, AnalysisRecord):
+            items.append(result.to_json(b',"batch_index":%d,"region":%s' % (i, region_json)))
+        elif result is None:
+            text = texts[i]
+            items.append(dumps({
+                "error": "analysis_failed",
+                "text": text[:100] + "..." if len(text) > 100 else text,
+                "batch_index": i,
+                "region": region
+            }))
+        else:
+            item = dict(result)
+            item["batch_index"] = i
+            item["region"] = region
+            items.append(dumps(item))
+
+    return b"".join((
+        b'{"results":[', b",".join(items),
+        b'],"batch_size":', _number(len(texts)),
+        b',"processing_time":', _number(processing_time),
+        b',"timestamp":', dumps(timestamp),
+        b',"region":', region_json,
+        b"}",
+    ))
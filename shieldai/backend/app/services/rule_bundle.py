@@ -0,0 +1,166 @@
+import hashlib
+import json
+import logging
+import re
+import time
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Tuple
+
+from app.core.config import settings
+from app.core.redis import redis_manager
+from app.services.catalog import CatalogPayload
+
+logger = logging.getLogger(__name__)
+
+BUNDLE_FORMAT = 1
+HISTORY_KEY = "rules:bundles"
+
+_GROUP_RE = re.compile(r"\(([^()]*)\)")
+_REGEX_META = set(".^$*+?{}[]|()\\")
+
+def _literal_alternatives(group: str) -> Optional[List[str]]:
+    """Split `a|b|c` into literals, or None if any branch is not a plain string"""
+    alternatives = []
+    for branch in group.split("|"):
+        literal = branch.replace("\\'", "'")
+        if not literal or any(ch in _REGEX_META for ch in literal):
+            return None
+        alternatives.append(literal.lower())
+    return alternatives
+
+def extract_prefilter_keywords(pattern: str) -> Optional[List[str]]:
+    """
+    Pick the most selective required alternation group of a rule. Every group in
+    our rules is mandatory (joined by `.*`), so a text that contains none of the
+    group's literals can never match the rule.
+    """
+    best = None
+    for group in _GROUP_RE.findall(pattern):
+        alternatives = _literal_alternatives(group)
+        if alternatives is None:
+            continue
+        if best is None or min(map(len, alternatives)) > min(map(len, best)):
+            best = alternatives
+    return best
+
+def _pattern_id(pattern: str) -> str:
+    return hashlib.sha256(pattern.encode("utf-8")).hexdigest()[:12]
+
+class RuleBundleService:
+    """Builds versioned client rule bundles and deltas between them"""
+
+    def __init__(self, history_size: int = None, min_pattern_score: float = None):
+        self.history_size = history_size or settings.RULE_BUNDLE_HISTORY
+        self.min_pattern_score = settings.RULE_BUNDLE_MIN_SCORE if min_pattern_score is None else min_pattern_score
+        self._history: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+        self._current: Optional[Dict[str, Any]] = None
+        self._full_payload: Optional[CatalogPayload] = None
+        self._delta_payloads: Dict[str, CatalogPayload] = {}
+
+    def build(self, toxic_patterns: List[Tuple[str, float, str]]) -> Dict[str, Any]:
+        """Export the read-only prescreen subset of the engine's rules"""
+        keywords = set()
+        patterns = {}
+        for pattern, score, category in toxic_patterns:
+            extracted = extract_prefilter_keywords(pattern)
+            if extracted:
+                keywords.update(extracted)
+            # Rules without a literal prefilter are shipped as patterns so the
+            # client never drops a text the server would flag
+            if score >= self.min_pattern_score or not extracted:
+                patterns[_pattern_id(pattern)] = {
+                    "pattern": pattern.replace("\\'", "'"),
+                    "flags": "i",
+                    "score": score,
+                    "category": category,
+                }
+
+        content = {"keywords": sorted(keywords), "patterns": patterns}
+        version = hashlib.sha256(
+            json.dumps(content, sort_keys=True, separators=(",", ":")).encode("utf-8")
+        ).hexdigest()[:16]
+        return {"format": BUNDLE_FORMAT, "version": version, "created_at": int(time.time()), **content}
+
+    def _remember(self, bundle: Dict[str, Any]):
+        self._history.pop(bundle["version"], None)
+        self._history[bundle["version"]] = bundle
+        while len(self._history) > self.history_size:
+            self._history.popitem(last=False)
+
+    async def publish(self, toxic_patterns: List[Tuple[str, float, str]]) -> Dict[str, Any]:
+        """Build the bundle for the loaded rules and record it in the version history"""
+        bundle = self.build(toxic_patterns)
+
+        # Older versions survive restarts through Redis so clients can still get deltas
+        stored = await redis_manager.get(HISTORY_KEY, default=[])
+        for previous in stored if isinstance(stored, list) else []:
+            if isinstance(previous, dict) and previous.get("version") not in self._history:
+                self._remember(previous)
+
+        is_new = bundle["version"] not in self._history
+        if not is_new:
+            bundle = self._history[bundle["version"]]
+        self._remember(bundle)
+        if is_new:
+            await redis_manager.set(HISTORY_KEY, list(self._history.values()))
+
+        self._current = bundle
+        self._full_payload = CatalogPayload({"type": "full", **bundle}, etag=self.etag(bundle["version"]))
+        self._delta_payloads = {}
+        logger.info(
+            f"📦 Rule bundle {bundle['version']} published: {len(bundle['keywords'])} keywords, "
+            f"{len(bundle['patterns'])} patterns"
+        )
+        return bundle
+
+    @staticmethod
+    def etag(version: str) -> str:
+        return f'"{version}"'
+
+    @property
+    def version(self) -> Optional[str]:
+        return self._current["version"] if self._current else None
+
+    def base_version(self, if_none_match: Optional[str], since: Optional[str] = None) -> Optional[str]:
+        """Find the client's bundle version among the ones we can diff against"""
+        candidates = [since] if since else []
+        if if_none_match:
+            candidates += [tag.strip().removeprefix("W/").strip('"') for tag in if_none_match.split(",")]
+        for candidate in candidates:
+            if candidate and candidate in self._history:
+                return candidate
+        return None
+
+    def payload(self, base: Optional[str] = None) -> Optional[CatalogPayload]:
+        """Full bundle, or a delta from `base` when that version is still known"""
+        if self._current is None:
+            return None
+        if not base or base == self._current["version"] or base not in self._history:
+            return self._full_payload
+
+        delta = self._delta_payloads.get(base)
+        if delta is None:
+            old = self._history[base]
+            new = self._current
+            old_keywords, new_keywords = set(old["keywords"]), set(new["keywords"])
+            delta = CatalogPayload({
+                "type": "delta",
+                "format": BUNDLE_FORMAT,
+                "base_version": base,
+                "version": new["version"],
+                "created_at": new["created_at"],
+                "keywords_added": sorted(new_keywords - old_keywords),
+                "keywords_removed": sorted(old_keywords - new_keywords),
+                "patterns_added": {pid: rule for pid, rule in new["patterns"].items() if pid not in old["patterns"]},
+                # Same pattern (so same ID) with a new score or category - replace the client's copy
+                "patterns_changed": {
+                    pid: rule for pid, rule in new["patterns"].items()
+                    if pid in old["patterns"] and old["patterns"][pid] != rule
+                },
+                "patterns_removed": sorted(pid for pid in old["patterns"] if pid not in new["patterns"]),
+            }, etag=self.etag(new["version"]))
+            self._delta_payloads[base] = delta
+        return delta
+
+# Global rule bundle service instance
+rule_bundle_service = RuleBundleService()
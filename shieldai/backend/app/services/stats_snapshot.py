@@ -0,0 +1,119 @@
+import asyncio
+import hashlib
+import json
+import logging
+import time
+from typing import Any, Dict, Optional
+
+from app.core.config import settings
+from app.services.analytics import analytics_service
+from app.services.catalog import CatalogPayload
+
+logger = logging.getLogger(__name__)
+
+# Endpoint and stage histograms summarized in the snapshot
+SNAPSHOT_LATENCIES = ("endpoint:analyze", "endpoint:analyze_batch", "endpoint:analyze_thread", "stage:engine")
+
+class StatsSnapshotService:
+    """
+    Builds the dashboard statistics in the background every `interval` seconds and
+    keeps them as a serialized, pre-compressed payload. /stats serves the latest
+    snapshot without touching Redis; the ETag only changes when the numbers do.
+    """
+
+    def __init__(self, analytics, interval: float = None):
+        self.analytics = analytics
+        self.interval = settings.STATS_SNAPSHOT_INTERVAL if interval is None else interval
+        self.started_at = time.time()
+        self.data: Optional[Dict[str, Any]] = None
+        self.payload: Optional[CatalogPayload] = None
+        self.generated_at: Optional[float] = None
+        self.builds = 0
+        self.failures = 0
+        self.last_build_seconds = 0.0
+        self._task: Optional[asyncio.Task] = None
+
+    async def build(self) -> Dict[str, Any]:
+        analytics = self.analytics
+        realtime, daily, platforms, unique, *latencies = await asyncio.gather(
+            analytics.get_realtime_stats(),
+            analytics.get_daily_stats(7),
+            analytics.get_platform_stats(),
+            analytics.get_unique_counts(1),
+            *(analytics.get_latency(name, 5) for name in SNAPSHOT_LATENCIES)
+        )
+        return {
+            "total_requests": realtime["total_requests"],
+            "toxic_requests": realtime["toxic_requests"],
+            "toxicity_rate": realtime["toxicity_rate"],
+            "platform_count": realtime["platform_count"],
+            "avg_response_time": realtime["avg_response_time"],
+            "platforms": platforms,
+            "daily_stats": daily.get("daily_stats", {}),
+            "unique_today": unique.get("total", {}),
+            "latency": {latency.pop("name"): latency for latency in latencies},
+            "region_focus": "Kenya",
+            "cities_served": ["Nairobi", "Mombasa", "Kisumu", "Nakuru", "Eldoret"],
+            "fallback": realtime.get("fallback", False),
+            "source": "snapshot"
+        }
+
+    async def refresh(self) -> bool:
+        """Rebuild the snapshot; on failure the previous one stays in service"""
+        start = time.perf_counter()
+        try:
+            data = await self.build()
+        except Exception as e:
+            self.failures += 1
+            logger.error(f"Stats snapshot build failed: {e}")
+            return False
+
+        # Weak ETag over the numbers only: an unchanged snapshot still revalidates, but
+        # uptime_seconds / generated_at differ, so the bytes are not the same
+        etag = 'W/"' + hashlib.sha256(
+            json.dumps(data, sort_keys=True, separators=(",", ":")).encode("utf-8")
+        ).hexdigest()[:32] + '"'
+        now = time.time()
+        data["uptime_seconds"] = int(now - self.started_at)
+        data["generated_at"] = now
+        self.payload = CatalogPayload(data, etag)
+        self.data = data
+        self.generated_at = now
+        self.builds += 1
+        self.last_build_seconds = time.perf_counter() - start
+        return True
+
+    def age(self) -> float:
+        return time.time() - self.generated_at if self.generated_at else 0.0
+
+    async def _run(self):
+        while True:
+            await asyncio.sleep(self.interval)
+            await self.refresh()
+
+    async def start(self):
+        """Build the first snapshot, then keep refreshing it in the background"""
+        if self._task is None:
+            await self.refresh()
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    def stats(self) -> dict:
+        return {
+            "interval": self.interval,
+            "age_seconds": round(self.age(), 3),
+            "builds": self.builds,
+            "failures": self.failures,
+            "last_build_seconds": round(self.last_build_seconds, 4)
+        }
+
+# Global stats snapshot instance
+stats_snapshot = StatsSnapshotService(analytics_service)
@@ -0,0 +1,151 @@
+import time
+import logging
+from collections import Counter
+from typing import Any, Dict, Iterable, List, Optional
+
+from app.core.config import settings
+from app.core.sketches import TopK
+
+logger = logging.getLogger(__name__)
+
+TRENDING_KINDS = ("category", "rule", "text", "platform")
+
+class TrendingTracker:
+    """
+    Heavy hitters per kind (category, rule, text fingerprint, platform), overall and
+    per platform. Each worker keeps one TopK sketch per series for the current minute
+    - constant memory and O(depth) work per item - and the analytics aggregator
+    drains the candidates' new counts into per-minute Redis sorted sets, where the
+    workers' counts add up. Queries sum the minutes of a window and compare them
+    with the window before it.
+    """
+
+    def __init__(self, aggregator, redis):
+        self.aggregator = aggregator
+        self.redis = redis
+        self.capacity = settings.TRENDING_CAPACITY
+        self.width = settings.TRENDING_SKETCH_WIDTH
+        self.depth = settings.TRENDING_SKETCH_DEPTH
+        self.retention_minutes = settings.TRENDING_RETENTION_MINUTES
+        self.keep_per_minute = settings.TRENDING_KEEP_PER_MINUTE
+        self._minute = int(time.time() // 60)
+        self._sketches: Dict[str, TopK] = {}
+        # Count already handed to the aggregator per series and candidate, reset every minute
+        self._sent: Dict[str, Dict[str, int]] = {}
+        aggregator.add_source(self.drain)
+
+    @staticmethod
+    def _series(kind: str, platform: Optional[str]) -> str:
+        return f"{kind}:platform:{platform}" if platform else kind
+
+    @staticmethod
+    def _key(series: str, minute: int) -> str:
+        return f"analytics:trending:{series}:{minute}"
+
+    def _add(self, series: str, item: str):
+        sketch = self._sketches.get(series)
+        if sketch is None:
+            sketch = self._sketches[series] = TopK(self.capacity, self.width, self.depth)
+        sketch.add(item)
+
+    def record(self, platform: str, categories: Iterable[str], rules: Iterable[str], text_id: Optional[str]):
+        minute = int(time.time() // 60)
+        if minute != self._minute:
+            # New minute: hand over what is left of the last one and start fresh sketches
+            self.drain()
+            self._sketches.clear()
+            self._sent.clear()
+            self._minute = minute
+
+        items = [("platform", platform)]
+        items.extend(("category", category) for category in categories)
+        items.extend(("rule", rule) for rule in rules)
+        if text_id:
+            items.append(("text", text_id))
+        for kind, item in items:
+            self._add(kind, item)
+            if kind != "platform":
+                self._add(self._series(kind, platform), item)
+
+    def drain(self):
+        """Buffer each candidate's growth since the last drain into this minute's sorted sets"""
+        for series, sketch in self._sketches.items():
+            # Kept for the whole minute, evicted candidates included: one that is re-admitted
+            # only sends its growth since then, not its full estimate again
+            sent = self._sent.setdefault(series, {})
+            key = self._key(series, self._minute)
+            changed = False
+            for item, count in sketch.candidates.items():
+                delta = count - sent.get(item, 0)
+                if delta > 0:
+                    self.aggregator.zincr(key, item, delta)
+                    sent[item] = count
+                    changed = True
+            if changed:
+                self.aggregator.ztrim(key, self.keep_per_minute)
+                self.aggregator.expire(key, (self.retention_minutes + 1) * 60)
+                self.aggregator.mark()
+
+    async def _window(self, series: str, minutes: Iterable[int]) -> Counter:
+        pipeline = await self.redis.pipeline(transaction=False)
+        if pipeline is None:
+            raise RuntimeError("Redis is not available")
+        for minute in minutes:
+            pipeline.zrevrange(self._key(series, minute), 0, -1, withscores=True)
+        totals = Counter()
+        for members in await pipeline.execute():
+            for item, score in members or ():
+                totals[item] += int(score)
+        return totals
+
+    async def get_trending(
+        self,
+        kind: str = "category",
+        platform: str = None,
+        window_minutes: int = 15,
+        limit: int = 20,
+        order_by: str = "count"
+    ) -> Dict[str, Any]:
+        """
+        Top items of `kind` over the last `window_minutes` across all workers, with their
+        count in the previous window of the same length. `order_by="growth"` ranks by
+        change instead of volume.
+        """
+        if kind not in TRENDING_KINDS:
+            return {"error": f"Unknown kind: {kind}", "kinds": list(TRENDING_KINDS)}
+        window_minutes = max(1, min(window_minutes, self.retention_minutes // 2))
+        series = self._series(kind, platform if kind != "platform" else None)
+        try:
+            current = int(time.time() // 60)
+            recent = await self._window(series, range(current - window_minutes + 1, current + 1))
+            previous = await self._window(series, range(current - 2 * window_minutes + 1, current - window_minutes + 1))
+
+            items: List[Dict[str, Any]] = []
+            for item, count in recent.items():
+                before = previous.get(item, 0)
+                items.append({
+                    "item": item,
+                    "count": count,
+                    "previous": before,
+                    "growth": round((count - before) / max(1, before), 4)
+                })
+            items.sort(key=lambda entry: entry["growth" if order_by == "growth" else "count"], reverse=True)
+
+            return {
+                "kind": kind,
+                "platform": platform,
+                "window_minutes": window_minutes,
+                "items": items[:limit]
+            }
+
+        except Exception as e:
+            logger.error(f"Trending query failed for {series}: {e}")
+            return {"error": str(e)}
+
+    def stats(self) -> dict:
+        return {
+            "minute": self._minute,
+            "series": len(self._sketches),
+            "candidates": sum(len(sketch.candidates) for sketch in self._sketches.values()),
+            "items_seen": sum(sketch.sketch.total for sketch in self._sketches.values())
+        }
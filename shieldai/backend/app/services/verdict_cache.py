@@ -0,0 +1,85 @@
+import hashlib
+import logging
+import time
+from typing import Any, Dict, List, Optional
+
+from app.core.config import settings
+from app.core.redis import redis_manager
+from app.services.results import AnalysisRecord
+
+logger = logging.getLogger(__name__)
+
+class VerdictCache:
+    """Caches analysis results per text and rule version, looked up in bulk for batches"""
+
+    def __init__(self, ttl: int = None):
+        self.ttl = settings.VERDICT_CACHE_TTL if ttl is None else ttl
+
+    @property
+    def enabled(self) -> bool:
+        return self.ttl > 0 and redis_manager.is_connected
+
+    @staticmethod
+    def key(engine, text: str) -> str:
+        digest = hashlib.blake2b(text.encode("utf-8"), digest_size=16).hexdigest()
+        return f"cache:verdict:{getattr(engine, 'rules_version', 'v0')}:{digest}"
+
+    async def _lookup(self, keys: List[str]) -> List[Optional[AnalysisRecord]]:
+        """
+        Cached verdicts for `keys` (None for misses) in one MGET. Hits are marked as
+        cached and report the lookup time, not the engine time of the original analysis.
+        """
+        started = time.perf_counter()
+        cached = await redis_manager.mget(keys)
+        lookup_ms = round((time.perf_counter() - started) * 1000, 2)
+        results = []
+        for value in cached:
+            record = None
+            if isinstance(value, dict):
+                record = AnalysisRecord.from_dict(value)
+                record.processing_time = lookup_ms
+                record.cached = True
+            results.append(record)
+        return results
+
+    async def _store(self, verdicts: Dict[str, AnalysisRecord]):
+        if verdicts:
+            await redis_manager.mset({key: record.to_dict() for key, record in verdicts.items()}, expire=self.ttl)
+
+    async def analyze(self, engine, text: str, platform: str, context: dict = None) -> Any:
+        if not self.enabled:
+            return await engine.analyze_optimized(text, platform, context)
+
+        key = self.key(engine, text)
+        cached = (await self._lookup([key]))[0]
+        if cached is not None:
+            return cached
+
+        result = await engine.analyze_optimized(text, platform, context)
+        if isinstance(result, AnalysisRecord):
+            await self._store({key: result})
+        return result
+
+    async def batch_analyze(self, engine, texts: List[str], platform: str, context: dict = None) -> List[Optional[Any]]:
+        """One MGET for the whole batch, engine only for the misses, one write for the new verdicts"""
+        if not self.enabled or not texts:
+            return await engine.batch_analyze(texts, platform, context)
+
+        keys = [self.key(engine, text) for text in texts]
+        results = await self._lookup(keys)
+
+        misses = [i for i, result in enumerate(results) if result is None]
+        if misses:
+            fresh = await engine.batch_analyze([texts[i] for i in misses], platform, context)
+            to_store = {}
+            for i, result in zip(misses, fresh):
+                results[i] = result
+                if isinstance(result, AnalysisRecord):
+                    to_store[keys[i]] = result
+            await self._store(to_store)
+
+        logger.debug(f"Verdict cache: {len(texts) - len(misses)}/{len(texts)} hits")
+        return results
+
+# Global verdict cache instance
+verdict_cache = VerdictCache()
@@ -0,0 +1,11 @@
+import pytest
+
+from app.core.redis import redis_manager
+
+
+@pytest.fixture(autouse=True)
+def memory_redis():
+    """Services talk to the shared RedisManager, which serves from its in-memory backend here"""
+    redis_manager.memory_store.clear()
+    yield redis_manager
+    redis_manager.memory_store.clear()
@@ -0,0 +1,172 @@
+import asyncio
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+from app.services import analytics
+
+
+def run(coro):
+    return asyncio.run(coro)
+
+
+@pytest.fixture
+def hash_key(monkeypatch):
+    monkeypatch.setattr(analytics, "_hash_secret", None)
+    return monkeypatch
+
+
+def test_production_refuses_to_start_without_a_hash_key(hash_key):
+    hash_key.delenv("ANALYTICS_HASH_KEY", raising=False)
+    with pytest.raises(RuntimeError):
+        run(analytics.init_hash_key(production=True))
+
+
+def test_configured_hash_key_is_stable(hash_key):
+    hash_key.setenv("ANALYTICS_HASH_KEY", "deployment-secret")
+    run(analytics.init_hash_key(production=True))
+    first = analytics.anonymize("ip:10.0.0.1")
+    hash_key.setattr(analytics, "_hash_secret", None)
+    run(analytics.init_hash_key(production=True))
+    assert analytics.anonymize("ip:10.0.0.1") == first
+
+
+def test_generated_hash_key_is_shared_between_workers(hash_key):
+    hash_key.delenv("ANALYTICS_HASH_KEY", raising=False)
+    run(analytics.init_hash_key(production=False))
+    first = analytics.anonymize("ip:10.0.0.1")
+
+    # Another worker starting later picks up the same key
+    hash_key.setattr(analytics, "_hash_secret", None)
+    run(analytics.init_hash_key(production=False))
+    assert analytics.anonymize("ip:10.0.0.1") == first
+
+    hash_key.setenv("ANALYTICS_HASH_KEY", "shieldai-analytics")
+    run(analytics.init_hash_key(production=False))
+    assert analytics.anonymize("ip:10.0.0.1") != first
+
+
+def test_platform_stats_read_the_platform_set_without_scanning(memory_redis, monkeypatch):
+    async def scenario():
+        service = analytics.AnalyticsService()
+        for platform, toxic in (("twitter", True), ("twitter", False), ("whatsapp", False)):
+            await service.track_analysis({"is_toxic": toxic, "categories": ["insult"]}, platform)
+        await service.aggregator.flush()
+
+        async def no_scan(*args, **kwargs):
+            raise AssertionError("platform stats must not walk the keyspace")
+            yield
+
+        monkeypatch.setattr(memory_redis, "scan_iter", no_scan)
+        assert await service.get_platform_stats() == {"twitter": 2, "whatsapp": 1}
+
+    run(scenario())
+
+
+# Write-combining aggregator
+
+class FailingOnce:
+    """Redis stand-in whose first pipeline can't be had"""
+
+    def __init__(self, redis):
+        self.redis = redis
+        self.failed = False
+
+    async def pipeline(self, transaction: bool = True):
+        if not self.failed:
+            self.failed = True
+            return None
+        return await self.redis.pipeline(transaction=transaction)
+
+
+def test_flush_combines_events_into_one_write_per_key(memory_redis):
+    async def scenario():
+        aggregator = analytics.AnalyticsAggregator(memory_redis)
+        for _ in range(100):
+            aggregator.incr("analytics:total_requests")
+            aggregator.hincr("analytics:user:u1", "total_analyses")
+            aggregator.event()
+        aggregator.zlatest("analytics:platforms", "twitter", 10)
+        aggregator.zlatest("analytics:platforms", "twitter", 20)
+
+        assert await aggregator.flush() == 100
+        assert aggregator.pending_events == 0
+        stats = aggregator.stats()
+        assert stats["flushes"] == 1 and stats["commands_per_event"] == 0.03
+        assert await memory_redis.get("analytics:total_requests") == 100
+        assert await memory_redis.hget("analytics:user:u1", "total_analyses") == 100
+        assert await memory_redis.zrange("analytics:platforms", 0, -1, withscores=True) == [("twitter", 20.0)]
+        assert await aggregator.flush() == 0
+
+    run(scenario())
+
+
+def test_failed_flush_is_merged_back_and_retried(memory_redis):
+    async def scenario():
+        aggregator = analytics.AnalyticsAggregator(FailingOnce(memory_redis))
+        aggregator.incr("counter", 2)
+        aggregator.event()
+        assert await aggregator.flush() == 0
+        assert aggregator.failures == 1
+
+        # Events recorded meanwhile are added to the ones that failed
+        aggregator.incr("counter", 3)
+        aggregator.event()
+        assert await aggregator.flush() == 2
+        assert await memory_redis.get("counter") == 5
+
+    run(scenario())
+
+
+def test_event_threshold_wakes_the_flush_loop(memory_redis):
+    async def scenario():
+        aggregator = analytics.AnalyticsAggregator(memory_redis, flush_interval=60, flush_events=10)
+        aggregator.start()
+        for _ in range(10):
+            aggregator.incr("counter")
+            aggregator.event()
+        await asyncio.sleep(0.05)
+        assert aggregator.flushes == 1
+        aggregator.incr("counter")
+        aggregator.event()
+        await aggregator.stop()
+        assert await memory_redis.get("counter") == 11
+
+    run(scenario())
+
+
+# Unique users and texts
+
+def test_unique_counts_per_day_dimension_and_period(memory_redis):
+    async def scenario():
+        service = analytics.AnalyticsService()
+        now = datetime.now(timezone.utc)
+        yesterday, earlier = now - timedelta(days=1), now - timedelta(days=2)
+        toxic = {"is_toxic": True, "categories": ["insult"]}
+        safe = {"is_toxic": False, "categories": []}
+        for moment, user, text, result, platform in (
+            (now, "alice", "hello", safe, "twitter"),
+            (now, "alice", "hello", safe, "twitter"),
+            (now, "bob", "you idiot", toxic, "whatsapp"),
+            (yesterday, "carol", "hello", safe, "twitter"),
+            (earlier, "alice", "morning", safe, "twitter"),
+            (earlier, "dave", "morning", safe, "twitter"),
+        ):
+            service._record(result, platform, user, text, int(moment.timestamp()), moment)
+        await service.aggregator.flush()
+
+        counts = await service.get_unique_counts(3)
+        assert counts["daily"][now.strftime("%Y-%m-%d")] == {"users": 2, "texts": 2}
+        assert counts["daily"][earlier.strftime("%Y-%m-%d")] == {"users": 2, "texts": 1}
+        # alice, bob, carol, dave / hello, you idiot, morning - repeats across days count once
+        assert counts["total"] == {"users": 4, "texts": 3}
+
+        assert (await service.get_unique_counts(1, platform="whatsapp"))["total"] == {"users": 1, "texts": 1}
+        assert (await service.get_unique_counts(3, category="insult"))["total"] == {"users": 1, "texts": 1}
+
+        # Every daily HyperLogLog expires after the retention period
+        keys = [key for key in await memory_redis.keys("analytics:hll:*") if ":range:" not in key]
+        ttls = [await memory_redis.ttl(key) for key in keys]
+        assert keys and all(0 < ttl <= (service.unique_retention_days + 1) * 86400 for ttl in ttls)
+
+    run(scenario())
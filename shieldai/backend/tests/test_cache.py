@@ -0,0 +1,250 @@
+import asyncio
+
+from app.core.serialization import loads
+from app.services import cache as cache_module
+from app.services.cache import CacheService
+
+
+def run(coro):
+    return asyncio.run(coro)
+
+
+def test_cancelled_caller_does_not_fail_coalesced_waiters():
+    async def scenario():
+        cache = CacheService()
+        release = asyncio.Event()
+        calls = []
+
+        async def loader():
+            calls.append(1)
+            await release.wait()
+            return {"verdict": "safe"}
+
+        first = asyncio.create_task(cache.get_or_load("verdicts", "k", loader))
+        await asyncio.sleep(0.01)
+        second = asyncio.create_task(cache.get_or_load("verdicts", "k", loader))
+        await asyncio.sleep(0.01)
+
+        first.cancel()
+        await asyncio.sleep(0)
+        release.set()
+        assert await second == {"verdict": "safe"}
+        assert first.cancelled()
+        assert calls == [1]
+        assert not cache._inflight
+        assert cache.prefix_stats()["verdicts"]["coalesced"] == 1
+
+    run(scenario())
+
+
+def test_loader_errors_reach_every_waiter_and_are_not_cached():
+    async def scenario():
+        cache = CacheService()
+        attempts = []
+
+        async def failing():
+            attempts.append(1)
+            await asyncio.sleep(0.01)
+            raise ValueError("backend down")
+
+        results = await asyncio.gather(
+            cache.get_or_load("ns", "k", failing),
+            cache.get_or_load("ns", "k", failing),
+            return_exceptions=True
+        )
+        assert all(isinstance(result, ValueError) for result in results)
+        assert attempts == [1]
+
+        async def working():
+            return 7
+        assert await cache.get_or_load("ns", "k", working) == 7
+
+    run(scenario())
+
+
+def test_negative_results_are_cached():
+    async def scenario():
+        cache = CacheService()
+        calls = []
+
+        async def missing():
+            calls.append(1)
+            return None
+
+        assert await cache.get_or_load("ns", "k", missing) is None
+        assert await cache.get_or_load("ns", "k", missing) is None
+        assert calls == [1]
+        assert cache.prefix_stats()["ns"]["negative_hits"] == 1
+
+    run(scenario())
+
+
+def test_stale_entries_are_served_while_one_refresh_runs():
+    async def scenario():
+        cache = CacheService()
+        values = iter([1, 2])
+
+        async def loader():
+            await asyncio.sleep(0.01)
+            return next(values)
+
+        assert await cache.get_or_load("ns", "k", loader, ttl=1) == 1
+        for _, entry in cache._l1.values():
+            entry.fresh_until = 0
+        assert await cache.get_or_load("ns", "k", loader, ttl=1) == 1
+        assert await cache.get_or_load("ns", "k", loader, ttl=1) == 1
+        await asyncio.gather(*cache._refreshes)
+        assert await cache.get_or_load("ns", "k", loader, ttl=1) == 2
+
+    run(scenario())
+
+
+# Invalidation
+
+def counting_loader(calls: list, value):
+    async def loader():
+        calls.append(value)
+        return value
+    return loader
+
+
+def test_namespace_invalidation_reaches_other_workers():
+    async def scenario():
+        worker, other = CacheService(), CacheService()
+        other.l1_ttl = 0.01
+        calls = []
+        assert await worker.get_or_load("rules", "k", counting_loader(calls, 1)) == 1
+        assert await other.get_or_load("rules", "k", counting_loader(calls, 2)) == 1
+        assert await worker.get_or_load("verdicts", "k", counting_loader(calls, 3)) == 3
+
+        assert await worker.invalidate_namespace("rules") == 1
+        assert await worker.get_or_load("rules", "k", counting_loader(calls, 4)) == 4
+        await asyncio.sleep(0.02)
+        assert await other.get_or_load("rules", "k", counting_loader(calls, 5)) == 4
+        # Other namespaces keep their entries
+        assert await worker.get_or_load("verdicts", "k", counting_loader(calls, 6)) == 3
+        assert calls == [1, 3, 4]
+
+    run(scenario())
+
+
+def test_tag_invalidation_drops_tagged_entries_only():
+    async def scenario():
+        cache = CacheService()
+        calls = []
+        await cache.get_or_load("ns", "a", counting_loader(calls, "a"), tags=["tenant:1"])
+        await cache.get_or_load("ns", "b", counting_loader(calls, "b"), tags=["tenant:1", "tenant:2"])
+        await cache.get_or_load("ns", "c", counting_loader(calls, "c"), tags=["tenant:2"])
+
+        assert await cache.invalidate_tag("tenant:1") >= 2
+        for key in ("a", "b", "c"):
+            await cache.get_or_load("ns", key, counting_loader(calls, key))
+        assert calls == ["a", "b", "c", "a", "b"]
+        assert await cache.invalidate_tag("unknown") == 0
+
+    run(scenario())
+
+
+# Warm start
+
+async def warm(cache: CacheService, keys) -> list:
+    calls = []
+    for key in keys:
+        await cache.get_or_load("verdicts", key, counting_loader(calls, key.upper()))
+        # A hit, so the key counts as hot
+        await cache.get_or_load("verdicts", key, counting_loader(calls, key.upper()))
+    return calls
+
+
+def test_warm_start_from_a_snapshot_file(tmp_path):
+    async def scenario():
+        path = str(tmp_path / "hot.json")
+        cache = CacheService()
+        cache.snapshot_path = path
+        await warm(cache, ["a", "b"])
+        assert await cache.snapshot() == 2
+
+        fresh = CacheService()
+        fresh.snapshot_path = path
+        await fresh.warm_start()
+        assert fresh.warmup["state"] == "done" and fresh.warmup["loaded"] == 2
+        calls = []
+        assert await fresh.get_or_load("verdicts", "a", counting_loader(calls, "reloaded")) == "A"
+        assert calls == []
+        assert fresh.prefix_stats()["verdicts"]["l1_hits"] == 1
+
+    run(scenario())
+
+
+def test_warm_start_from_redis_skips_invalidated_namespaces():
+    async def scenario():
+        cache = CacheService()
+        await warm(cache, ["a", "b"])
+        assert await cache.snapshot() == 2
+
+        fresh = CacheService()
+        await fresh.warm_start()
+        assert fresh.warmup["loaded"] == 2
+
+        await cache.invalidate_namespace("verdicts")
+        later = CacheService()
+        await later.warm_start()
+        assert later.warmup["loaded"] == 0 and later.warmup["skipped"] == 2
+
+    run(scenario())
+
+
+def test_warm_start_stops_at_the_memory_budget(tmp_path):
+    async def scenario():
+        cache = CacheService()
+        cache.snapshot_path = str(tmp_path / "hot.json")
+        await warm(cache, ["a", "b", "c"])
+        await cache.snapshot()
+
+        fresh = CacheService()
+        fresh.snapshot_path = cache.snapshot_path
+        fresh.warm_max_bytes = 8
+        await fresh.warm_start()
+        assert fresh.warmup["state"] == "budget_exhausted"
+        assert 0 < fresh.warmup["loaded"] < 3
+
+    run(scenario())
+
+
+def test_failed_snapshot_write_leaves_no_temp_file_and_keeps_the_old_one(tmp_path, monkeypatch):
+    async def scenario():
+        cache = CacheService()
+        cache.snapshot_path = str(tmp_path / "hot.json")
+        await warm(cache, ["a"])
+        await cache.snapshot()
+        before = (tmp_path / "hot.json").read_bytes()
+
+        def broken(value):
+            raise RuntimeError("disk full")
+
+        await warm(cache, ["b"])
+        monkeypatch.setattr(cache_module, "dumps", broken)
+        assert await cache.snapshot() == 0
+        assert (tmp_path / "hot.json").read_bytes() == before
+        assert sorted(path.name for path in tmp_path.iterdir()) == ["hot.json"]
+
+    run(scenario())
+
+
+def test_concurrent_snapshot_writers_use_their_own_temp_files(tmp_path):
+    async def scenario():
+        path = str(tmp_path / "hot.json")
+        workers = [CacheService() for _ in range(4)]
+        for i, worker in enumerate(workers):
+            worker.snapshot_path = path
+            await warm(worker, [f"k{i}", f"k{i}x"])
+        hot = [worker._hottest() for worker in workers]
+        await asyncio.gather(*(
+            asyncio.to_thread(worker._write_snapshot_file, entries)
+            for worker, entries in zip(workers, hot) for _ in range(5)
+        ))
+        assert sorted(path.name for path in tmp_path.iterdir()) == ["hot.json"]
+        records = loads((tmp_path / "hot.json").read_bytes())
+        assert len(records) == 2
+
+    run(scenario())
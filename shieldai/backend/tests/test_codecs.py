@@ -0,0 +1,80 @@
+import asyncio
+import json
+
+import pytest
+
+from app.core import codecs
+from app.core.codecs import Codec, FLAG_ZLIB, TAG_JSON, TAG_MSGPACK, TAG_STR, codec_for, parse_codec_config
+from app.core.redis import RedisManager
+
+
+def run(coro):
+    return asyncio.run(coro)
+
+
+VALUES = ["habari", "", {"score": 0.5, "labels": ["insult", "threat"], "nested": {"ok": True}}, [1, 2, 3], 42, None]
+
+
+@pytest.mark.parametrize("binary", [False, True])
+@pytest.mark.parametrize("compress", [False, True])
+def test_values_round_trip(binary, compress):
+    codec = Codec("test", binary=binary, compress=compress, compress_threshold=16)
+    for value in VALUES + [{"text": "mbaya sana " * 100}]:
+        assert codec.decode(codec.encode(value)) == value
+
+
+def test_tags_name_the_format_and_compression():
+    codec = Codec("test", binary=True, compress=True, compress_threshold=64)
+    assert codec.encode("sawa")[0] == TAG_STR
+    assert codec.encode({"a": 1})[0] == (TAG_MSGPACK if codecs.MSGPACK_AVAILABLE else TAG_JSON)
+
+    large = codec.encode({"text": "mbaya sana " * 100})
+    assert large[0] & FLAG_ZLIB and len(large) < 200
+
+    # Any codec reads any tag, so changing a namespace's format needs no migration
+    assert Codec("json").decode(large) == {"text": "mbaya sana " * 100}
+
+
+def test_legacy_untagged_values_still_decode():
+    codec = Codec("test", binary=True, compress=True)
+    assert codec.decode(b'{"score": 0.5}') == {"score": 0.5}
+    assert codec.decode("[1, 2]") == [1, 2]
+    assert codec.decode(b"12") == 12
+    assert codec.decode(b"plain text") == "plain text"
+    assert codec.decode("Jambo") == "Jambo"
+    assert codec.decode(b"") == ""
+    assert codec.decode(None) is None
+
+
+def test_codec_config_parsing():
+    parsed = parse_codec_config("cache:msgpack+zlib, rules:json ,bad:xml,worse,jobs:json+lz4", 128)
+    assert set(parsed) == {"cache", "rules"}
+    assert parsed["cache"].compress and parsed["cache"].compress_threshold == 128
+    assert not parsed["rules"].compress and not parsed["rules"].binary
+    assert codec_for(parsed, "cache:user:1") is parsed["cache"]
+    assert codec_for(parsed, "analytics:total") is None
+    assert codec_for({}, "cache:user:1") is None
+
+
+def test_manager_reads_values_written_before_the_namespace_had_a_codec():
+    manager = RedisManager()
+    manager.codecs = parse_codec_config("cache:json+zlib", 16)
+
+    async def scenario():
+        # Written by an older deploy as plain JSON text
+        manager.memory_client.run("set", "cache:old", json.dumps({"score": 0.2}))
+        manager.memory_client.run("set", "cache:text", "just text")
+        assert await manager.get("cache:old") == {"score": 0.2}
+        assert await manager.get("cache:text") == "just text"
+
+        assert await manager.set("cache:new", {"text": "mbaya " * 50})
+        stored = manager.raw_memory_client.run("get", "cache:new")
+        assert stored[0] == TAG_JSON | FLAG_ZLIB
+        assert await manager.mget(["cache:old", "cache:new", "cache:missing"], default="-") == \
+            [{"score": 0.2}, {"text": "mbaya " * 50}, "-"]
+
+        assert await manager.mset({"cache:a": [1], "analytics:b": 2})
+        assert manager.raw_memory_client.run("get", "cache:a")[0] == TAG_JSON
+        assert await manager.mget(["cache:a", "analytics:b"]) == [[1], 2]
+
+    run(scenario())
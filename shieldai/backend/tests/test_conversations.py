@@ -0,0 +1,98 @@
+import asyncio
+
+import pytest
+
+from app.core.redis import RedisManager
+from app.services.conversations import ConversationService
+
+
+def run(coro):
+    return asyncio.run(coro)
+
+
+def result(score, categories=()):
+    return {"toxicity_score": score, "is_toxic": score >= 0.5, "categories": list(categories)}
+
+
+@pytest.fixture
+def connected(monkeypatch):
+    monkeypatch.setattr(RedisManager, "is_connected", property(lambda self: True))
+
+
+def test_messages_fold_into_thread_state(connected):
+    service = ConversationService()
+
+    async def scenario():
+        first = await service.track_message("tenant", "t1", "Wewe ni mjinga", result(0.6, ["insult"]))
+        assert first["messages"] == 1 and first["warning_level"] == "low" and "fallback" not in first
+        await service.track_message("tenant", "t1", "hello", result(0.0))
+        last = await service.track_message("tenant", "t1", "wewe  NI mjinga", result(0.9, ["insult"]))
+
+        assert last["messages"] == 3 and last["flagged_messages"] == 2 and last["toxic_messages"] == 2
+        assert last["repeated_message"] and last["repeated_messages"] == 1
+        assert last["categories"] == {"insult": 2}
+        assert last["escalated"] and last["warning_level"] == "high"
+
+    run(scenario())
+
+
+def test_a_concurrent_write_makes_the_update_retry(connected, memory_redis):
+    service = ConversationService()
+    apply = service._apply
+    attempts = []
+
+    def racing_apply(state, text, result, now):
+        attempts.append(dict(state))
+        if len(attempts) == 1:
+            # Another worker updates the thread between our read and our MULTI
+            memory_redis.memory_client.run("hset", "thread:tenant:t1", mapping={"messages": 5, "flagged": 4})
+        return apply(state, text, result, now)
+    service._apply = racing_apply
+
+    async def scenario():
+        summary = await service.track_message("tenant", "t1", "mbaya", result(0.7))
+        # The retry read the other worker's state instead of overwriting it
+        assert len(attempts) == 2 and attempts[1]["messages"] == "5"
+        assert summary["messages"] == 6 and summary["flagged_messages"] == 5
+
+    run(scenario())
+
+
+def test_persistent_contention_falls_back_to_local_state(connected, memory_redis):
+    service = ConversationService()
+    apply = service._apply
+    attempts = []
+
+    def always_racing(state, text, result, now):
+        attempts.append(state)
+        memory_redis.memory_client.run("hincrby", "thread:tenant:t1", "messages", 1)
+        return apply(state, text, result, now)
+    service._apply = always_racing
+
+    async def scenario():
+        summary = await service.track_message("tenant", "t1", "mbaya", result(0.7))
+        # Three optimistic attempts, then the local state takes the message
+        assert len(attempts) == 4 and attempts[-1] == {}
+        assert summary["fallback"] and summary["messages"] == 1
+
+    run(scenario())
+
+
+def test_local_state_decays_and_stays_bounded():
+    service = ConversationService()
+    service.local_max_threads = 2
+
+    async def scenario():
+        for thread in ("a", "b", "c"):
+            summary = await service.track_message("tenant", thread, "mbaya", result(1.0))
+            assert summary["fallback"]
+        assert list(service._local) == ["thread:tenant:b", "thread:tenant:c"]
+
+    run(scenario())
+
+    # One half-life later the score has halved before the next message is added
+    key = "thread:tenant:c"
+    expires_at, state = service._local[key]
+    state["updated_at"] = str(float(state["updated_at"]) - service.half_life)
+    merged, _ = service._update_local(key, "sawa", result(0.0), float(state["updated_at"]) + service.half_life)
+    assert float(merged["score"]) == pytest.approx(0.5)
@@ -0,0 +1,114 @@
+import asyncio
+
+import pytest
+from sqlalchemy import text
+
+from app import database
+from app.models import AnalysisResult
+
+
+def run(coro):
+    return asyncio.run(coro)
+
+
+@pytest.fixture
+def use_database(monkeypatch):
+    """Point the app's database layer at `url` for one test"""
+    def use(url):
+        monkeypatch.setenv("DATABASE_URL", url)
+        engine = database.get_database_engine()
+        monkeypatch.setattr(database, "engine", engine)
+        monkeypatch.setattr(database, "SessionLocal", database.async_sessionmaker(engine, expire_on_commit=False))
+        return engine
+    return use
+
+
+def test_configured_urls_resolve_to_async_drivers():
+    assert database.async_database_url("postgres://u:p@db:5432/shield").drivername == "postgresql+asyncpg"
+    assert database.async_database_url("postgresql://u:p@db/shield").drivername == "postgresql+asyncpg"
+    assert database.async_database_url("sqlite:///./shieldai.db").drivername == "sqlite+aiosqlite"
+    with pytest.raises(ValueError):
+        database.async_database_url("mysql://u:p@db/shield")
+
+
+def test_postgres_settings_build_the_url(monkeypatch):
+    monkeypatch.delenv("DATABASE_URL", raising=False)
+    monkeypatch.setenv("POSTGRES_DB", "shield")
+    monkeypatch.setenv("POSTGRES_USER", "shield")
+    monkeypatch.setenv("POSTGRES_PASSWORD", "secret")
+    assert database.async_database_url(database.settings.DATABASE_URL).render_as_string(hide_password=False) == \
+        "postgresql+asyncpg://shield:secret@db:5432/shield"
+
+
+def test_sqlite_file_gets_a_pool_and_tuned_connections(monkeypatch, tmp_path, use_database):
+    monkeypatch.setenv("SQLITE_SYNCHRONOUS", "FULL")
+    monkeypatch.setenv("SQLITE_MMAP_SIZE", str(64 * 1024 * 1024))
+    monkeypatch.setenv("DATABASE_POOL_SIZE", "3")
+    engine = use_database(f"sqlite:///{tmp_path / 'data' / 'shieldai.db'}")
+
+    async def scenario():
+        try:
+            assert await database.check_database()
+            async with engine.connect() as conn:
+                assert (await conn.execute(text("PRAGMA journal_mode"))).scalar() == "wal"
+                assert (await conn.execute(text("PRAGMA synchronous"))).scalar() == 2
+                assert (await conn.execute(text("PRAGMA mmap_size"))).scalar() == 64 * 1024 * 1024
+                assert (await conn.execute(text("PRAGMA busy_timeout"))).scalar() == 5000
+                stats = database.pool_stats()
+                assert stats["backend"] == "sqlite" and stats["driver"] == "aiosqlite"
+                assert stats["size"] == 3 and stats["checkedout"] == 1 and stats["max_overflow"] == 20
+        finally:
+            await engine.dispose()
+
+    run(scenario())
+    assert (tmp_path / "data" / "shieldai.db").exists()
+
+
+def test_sessions_write_through_the_engine(tmp_path, use_database):
+    engine = use_database(f"sqlite:///{tmp_path / 'shieldai.db'}")
+
+    async def scenario():
+        try:
+            await database.create_tables()
+            sessions = database.get_db()
+            db = await sessions.__anext__()
+            db.add(AnalysisResult(text="habari", platform="twitter"))
+            await db.commit()
+            await sessions.aclose()
+
+            async with database.SessionLocal() as db:
+                row = (await db.execute(text("SELECT text, is_toxic FROM analysis_results"))).one()
+            assert tuple(row) == ("habari", 0)
+        finally:
+            await engine.dispose()
+
+    run(scenario())
+
+
+def test_in_memory_sqlite_has_no_pool_counters(use_database):
+    engine = use_database("sqlite:///:memory:")
+
+    async def scenario():
+        try:
+            assert await database.check_database()
+        finally:
+            await engine.dispose()
+
+    run(scenario())
+    stats = database.pool_stats()
+    assert stats["backend"] == "sqlite" and "size" not in stats
+
+
+def test_unreachable_database_fails_the_check(tmp_path, use_database):
+    # A directory can't be opened as a database file
+    engine = use_database(f"sqlite:///{tmp_path}")
+
+    async def scenario():
+        try:
+            assert await database.check_database() is False
+        finally:
+            await engine.dispose()
+            # aiosqlite closes the failed connection on its own thread; let it report back
+            await asyncio.sleep(0.05)
+
+    run(scenario())
@@ -0,0 +1,60 @@
+import asyncio
+import random
+
+from app.core.histogram import PRECISION, LogHistogram
+from app.services.analytics import AnalyticsService
+
+
+def run(coro):
+    return asyncio.run(coro)
+
+
+def test_quantiles_stay_within_the_bucket_precision():
+    rng = random.Random(7)
+    values = sorted(rng.lognormvariate(-4, 1.5) for _ in range(20000))
+    histogram = LogHistogram()
+    for value in values:
+        histogram.record(value)
+    for q in (0.5, 0.9, 0.99):
+        exact = values[int(q * len(values)) - 1]
+        assert abs(histogram.quantile(q) - exact) / exact <= PRECISION
+
+
+def test_merge_equals_recording_everything_in_one_histogram():
+    first, second, combined = LogHistogram(), LogHistogram(), LogHistogram()
+    for i in range(1, 500):
+        (first if i % 2 else second).record(i / 1000)
+        combined.record(i / 1000)
+    first.merge(second)
+    assert first.counts == combined.counts
+    assert first.summary() == combined.summary()
+
+
+def test_redis_fields_round_trip():
+    histogram = LogHistogram()
+    fields = {}
+    for seconds in (0.001, 0.001, 0.25, 3.0):
+        histogram.record(seconds)
+        for field, amount in LogHistogram.fields(seconds):
+            fields[field] = str(int(fields.get(field, 0)) + amount)
+    restored = LogHistogram.from_fields(fields)
+    assert restored.counts == histogram.counts
+    assert restored.count == 4
+    assert abs(restored.total - histogram.total) < 1e-5
+
+
+def test_workers_histograms_merge_in_redis():
+    async def scenario():
+        workers = [AnalyticsService(), AnalyticsService()]
+        for i, worker in enumerate(workers):
+            for _ in range(50):
+                worker.observe("endpoint:analyze", 0.01 * (i + 1))
+            await worker.aggregator.flush()
+
+        latency = await workers[0].get_latency("endpoint:analyze", 5)
+        assert latency["count"] == 100
+        assert abs(latency["p50_ms"] - 10) <= 10 * PRECISION
+        assert abs(latency["p99_ms"] - 20) <= 20 * PRECISION
+        assert (await workers[0].get_latency("endpoint:other", 5))["count"] == 0
+
+    run(scenario())
@@ -0,0 +1,73 @@
+import gzip
+import json
+import os
+
+from fastapi import Request
+
+from app.core.http import FastJSONResponse, etag_matches, payload_response
+from app.services.catalog import CatalogPayload, CatalogService
+from app.services.results import AnalysisRecord, NO_ISSUES, SAFE_CATEGORIES
+
+
+def request(**headers):
+    return Request({
+        "type": "http", "method": "GET", "path": "/", "query_string": b"",
+        "headers": [(name.replace("_", "-").encode(), value.encode()) for name, value in headers.items()],
+    })
+
+
+def test_etag_matching_is_weak_and_handles_lists():
+    assert etag_matches('"abc"', '"abc"')
+    assert etag_matches('W/"abc"', '"abc"')
+    assert etag_matches('"xyz", W/"abc"', 'W/"abc"')
+    assert etag_matches("*", '"abc"')
+    assert not etag_matches('"xyz"', '"abc"')
+    assert not etag_matches(None, '"abc"')
+
+
+def test_payload_is_served_as_bytes_gzipped_or_not_modified():
+    payload = CatalogPayload({"resources": [{"name": "Kenya Red Cross", "phone": "1199"}] * 20})
+
+    plain = payload_response(request(), payload, "public, max-age=60", {"Age": "3"})
+    assert plain.status_code == 200 and plain.body == payload.body
+    assert json.loads(plain.body)["resources"][0]["phone"] == "1199"
+    assert plain.headers["etag"] == payload.etag and plain.headers["age"] == "3"
+    assert "content-encoding" not in plain.headers
+
+    zipped = payload_response(request(accept_encoding="br, gzip"), payload, "public, max-age=60")
+    assert zipped.headers["content-encoding"] == "gzip"
+    assert gzip.decompress(zipped.body) == payload.body
+
+    revalidated = payload_response(request(if_none_match=f"W/{payload.etag}"), payload, "public, max-age=60")
+    assert revalidated.status_code == 304 and revalidated.body == b""
+    assert revalidated.headers["etag"] == payload.etag
+
+
+def test_fast_json_response_passes_bytes_through_and_encodes_records():
+    assert FastJSONResponse(b'{"ok":true}').body == b'{"ok":true}'
+    assert FastJSONResponse(memoryview(b"[]")).body == b"[]"
+
+    record = AnalysisRecord(0.1, False, SAFE_CATEGORIES, "low", 2.0, NO_ISSUES)
+    body = json.loads(FastJSONResponse({"result": record}).body)
+    assert body["result"]["toxicity_score"] == 0.1 and body["result"]["is_toxic"] is False
+
+
+def test_catalog_reloads_on_change_and_keeps_the_last_good_payload(tmp_path):
+    path = tmp_path / "resources.json"
+    path.write_text(json.dumps({"version": 1}))
+    catalogs = CatalogService(data_dir=str(tmp_path), reload_interval=0)
+    catalogs.register("resources", "resources.json")
+
+    first = catalogs.get("resources")
+    assert json.loads(first.body) == {"version": 1}
+    assert catalogs.get("resources") is first
+
+    path.write_text(json.dumps({"version": 2}))
+    os.utime(path, (1, 1))
+    second = catalogs.get("resources")
+    assert json.loads(second.body) == {"version": 2} and second.etag != first.etag
+
+    path.write_text("{broken")
+    os.utime(path, (2, 2))
+    assert catalogs.get("resources") is second
+    assert catalogs.get("missing") is None
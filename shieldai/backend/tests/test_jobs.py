@@ -0,0 +1,74 @@
+import asyncio
+
+import pytest
+
+from app.services.jobs import JobManager, RedisJobStore, SQLiteJobStore
+from app.services.results import AnalysisRecord, NO_ISSUES, SAFE_CATEGORIES
+
+
+def run(coro):
+    return asyncio.run(coro)
+
+
+class Engine:
+    rules_version = "v1"
+
+    def __init__(self):
+        self.on_batch = []
+
+    async def batch_analyze(self, texts, platform, context=None):
+        if self.on_batch:
+            await self.on_batch.pop(0)()
+        return [AnalysisRecord(0.9 if "bad" in text else 0.0, "bad" in text, SAFE_CATEGORIES, "none", 1.0, NO_ISSUES)
+                for text in texts]
+
+
+@pytest.fixture(params=["redis", "sqlite"])
+def manager(request, tmp_path):
+    manager = JobManager()
+    manager.chunk_size = 2
+    if request.param == "redis":
+        manager.store = RedisJobStore(ttl=60)
+    else:
+        manager.store = SQLiteJobStore(str(tmp_path / "jobs.db"), ttl=60)
+    manager.engine = Engine()
+    return manager
+
+
+def test_job_runs_to_completion_in_chunks(manager):
+    async def scenario():
+        await manager.store.init()
+        meta = await manager.submit("tenant", ["ok", "bad", "ok", "bad", "ok"], "twitter")
+        await manager._run(await manager.store.get(meta["id"]))
+
+        done = await manager.get(meta["id"], "tenant")
+        assert done["status"] == "completed"
+        assert done["processed"] == 5 and done["toxic_count"] == 2
+        assert len(await manager.results(meta["id"], 1, 3)) == 3
+        assert await manager.store.count_unfinished("tenant") == 0
+
+    run(scenario())
+
+
+def test_cancel_during_the_last_chunk_is_not_overwritten(manager):
+    async def scenario():
+        await manager.store.init()
+        meta = await manager.submit("tenant", ["ok", "bad", "ok"], "twitter")
+
+        async def nothing():
+            pass
+
+        async def cancel():
+            assert (await manager.cancel(meta["id"], "tenant"))["status"] == "cancelled"
+
+        # Second (last) chunk: the cancel lands while the engine is working on it
+        manager.engine.on_batch = [nothing, cancel]
+        await manager._run(await manager.store.get(meta["id"]))
+
+        final = await manager.get(meta["id"], "tenant")
+        assert final["status"] == "cancelled"
+        assert await manager.store.count_unfinished("tenant") == 0
+        # Finishing an already-cancelled job is refused
+        assert not await manager.store.set_status(meta["id"], "completed", only_unfinished=True)
+
+    run(scenario())
@@ -0,0 +1,94 @@
+import asyncio
+
+from app.core.config import settings
+from app.core.middleware import BODY_COST, RateLimitMiddleware, client_identity
+from app.services.rate_limiter import RateLimiter
+
+
+async def ok_app(scope, receive, send):
+    await send({"type": "http.response.start", "status": 200, "headers": []})
+    await send({"type": "http.response.body", "body": b"{}"})
+
+
+def make_middleware(limit: int = 60, **kwargs):
+    return RateLimitMiddleware(
+        ok_app,
+        limiter=RateLimiter(),
+        limits=lambda: [(limit, 60)],
+        costs={("POST", "/analyze"): 1, ("POST", "/analyze/batch"): BODY_COST},
+        bytes_per_unit=1000,
+        **kwargs
+    )
+
+
+def call(middleware, path: str, headers: dict = None, client: str = "10.0.0.1") -> tuple:
+    scope = {
+        "type": "http",
+        "method": "POST",
+        "path": path,
+        "headers": [(k.lower().encode(), v.encode()) for k, v in (headers or {}).items()],
+        "client": (client, 1234),
+    }
+    messages = []
+
+    async def receive():
+        return {"type": "http.request", "body": b"", "more_body": False}
+
+    async def send(message):
+        messages.append(message)
+
+    asyncio.run(middleware(scope, receive, send))
+    start = messages[0]
+    return start["status"], dict(start["headers"])
+
+
+def test_batch_body_cap_follows_the_tightest_limit():
+    middleware = make_middleware(limit=60)
+    status, headers = call(middleware, "/analyze/batch", {"Content-Length": "60000"})
+    assert status == 200
+    assert headers[b"ratelimit-remaining"] == b"0"
+    status, headers = call(middleware, "/analyze/batch", {"Content-Length": "60001"}, client="10.0.0.2")
+    assert status == 413
+    assert headers[b"ratelimit-policy"] == b"60;w=60"
+
+
+def test_oversized_and_unsized_batches_are_refused():
+    middleware = make_middleware(max_body_bytes=10000)
+    assert call(middleware, "/analyze/batch", {"Content-Length": "10000"})[0] == 200
+    assert call(middleware, "/analyze/batch", {"Content-Length": "10001"})[0] == 413
+    assert call(middleware, "/analyze/batch")[0] == 411
+
+
+def test_default_settings_admit_a_full_size_batch_with_budget_to_spare():
+    middleware = RateLimitMiddleware(
+        ok_app,
+        limiter=RateLimiter(),
+        limits=lambda: [(settings.RATE_LIMIT_PER_MINUTE, 60), (settings.RATE_LIMIT_PER_HOUR, 3600)],
+        costs={("POST", "/analyze/batch"): BODY_COST},
+        bytes_per_unit=settings.RATE_LIMIT_BYTES_PER_UNIT,
+        max_body_bytes=settings.BATCH_MAX_BYTES
+    )
+    status, headers = call(middleware, "/analyze/batch", {"Content-Length": str(settings.BATCH_MAX_BYTES)})
+    assert status == 200
+    # 256 KiB at 8 KiB per unit: 32 of the minute's 60 units
+    assert headers[b"ratelimit-remaining"] == b"28"
+    status, _ = call(middleware, "/analyze/batch", {"Content-Length": str(settings.BATCH_MAX_BYTES + 1)}, client="10.0.0.2")
+    assert status == 413
+
+
+def test_random_api_keys_share_the_ip_bucket(monkeypatch):
+    monkeypatch.setenv("API_KEYS", "known-key")
+    middleware = make_middleware(limit=3)
+    statuses = [call(middleware, "/analyze", {"X-API-Key": f"random-{i}"})[0] for i in range(4)]
+    assert statuses == [200, 200, 200, 429]
+
+    # A configured key has its own bucket
+    assert call(middleware, "/analyze", {"X-API-Key": "known-key"})[0] == 200
+
+
+def test_client_identity_ignores_unverified_headers(monkeypatch):
+    monkeypatch.setenv("API_KEYS", "known-key")
+    scope = {"client": ("10.0.0.9", 1)}
+    assert client_identity(scope, {"x-user-id": "someone"}) == "ip:10.0.0.9"
+    assert client_identity(scope, {"x-api-key": "guess"}) == "ip:10.0.0.9"
+    assert client_identity(scope, {"x-api-key": "known-key"}).startswith("key:")
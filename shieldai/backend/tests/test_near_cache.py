@@ -0,0 +1,98 @@
+import asyncio
+
+from app.core.memory_backend import InMemoryRedis, MemoryStore
+from app.core.near_cache import NearCache
+from app.core.redis import RedisManager
+
+
+def run(coro):
+    return asyncio.run(coro)
+
+
+def attached(namespaces=("rules",), **kwargs):
+    near = NearCache(namespaces, **kwargs)
+    near.attach("redis:6379/0", "tracking")
+    return near
+
+
+def test_entries_are_only_served_while_the_invalidation_stream_is_attached():
+    near = NearCache(["rules"])
+    near.put("rules:v1", b"bundle", near.epoch)
+    assert near.get("rules:v1") == (False, None) and not near.handles("rules:v1")
+
+    near.listeners = 2
+    near.attach("a", "tracking")
+    assert not near.enabled
+    near.attach("b", "pubsub")
+    # Writers publish invalidations as soon as one node lacks tracking
+    assert near.mode == "pubsub" and near.handles("rules:v1") and not near.handles("cache:x")
+
+    near.put("rules:v1", b"bundle", near.epoch)
+    assert near.get("rules:v1") == (True, b"bundle")
+    near.detach("b")
+    assert not near.enabled and near.get("rules:v1") == (False, None)
+
+
+def test_invalidations_drop_keys_and_beat_racing_reads():
+    near = attached()
+    near.put("rules:a", b"1", near.epoch)
+    near.put("rules:b", b"2", near.epoch)
+    near.invalidate(b"rules:a")
+    assert near.get("rules:a") == (False, None) and near.get("rules:b") == (True, b"2")
+
+    # A read that started before the invalidation must not store its stale value
+    epoch = near.epoch
+    near.invalidate(["rules:c"])
+    near.put("rules:c", b"stale", epoch)
+    assert near.get("rules:c") == (False, None)
+    near.put("rules:d", b"fine", epoch)
+    assert near.get("rules:d") == (True, b"fine")
+
+    # None is a flush
+    near.invalidate(None)
+    assert near.get("rules:b") == (False, None)
+    assert near.stats()["invalidations"] == 3
+
+
+def test_size_and_age_bounds():
+    near = attached(max_entries=2)
+    for key in ("rules:a", "rules:b", "rules:c"):
+        near.put(key, b"x", near.epoch)
+    assert near.get("rules:a") == (False, None)
+    assert near.stats()["entries"] == 2
+
+    expired = attached(max_age=0)
+    expired.put("rules:a", b"x", expired.epoch)
+    assert expired.get("rules:a") == (False, None)
+
+
+def test_manager_serves_hot_keys_locally_until_invalidated():
+    remote = MemoryStore()
+    writer = InMemoryRedis(remote, decode_responses=True, journal=False)
+    manager = RedisManager()
+    manager.redis_client = InMemoryRedis(remote, decode_responses=True, journal=False)
+    manager.raw_client = InMemoryRedis(remote, decode_responses=False, journal=False)
+    manager.codecs = {}
+    manager.near_cache = attached()
+
+    async def scenario():
+        assert await manager.set("rules:current", "v1")
+        assert await manager.get("rules:current") == "v1"
+
+        # Another instance writes; we keep the local copy until Redis says otherwise
+        writer.run("set", "rules:current", "v2")
+        assert await manager.get("rules:current") == "v1"
+        manager.near_cache.invalidate("rules:current")
+        assert await manager.get("rules:current") == "v2"
+        assert await manager.mget(["rules:current", "cache:other"]) == ["v2", None]
+
+        # Our own writes drop the local copy straight away
+        assert await manager.set("rules:current", "v3")
+        assert await manager.get("rules:current") == "v3"
+        await manager.delete("rules:current")
+        assert await manager.get("rules:current") is None
+
+        stats = manager.near_cache.stats()["namespaces"]["rules"]
+        assert stats["hits"] >= 2 and stats["misses"] >= 3
+
+    run(scenario())
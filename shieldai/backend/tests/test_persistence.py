@@ -0,0 +1,133 @@
+import asyncio
+import json
+import time
+
+import pytest
+from sqlalchemy import func, select
+
+from app import database
+from app.models import AnalysisResult
+from app.services import persistence
+from app.services.persistence import ResultWriter
+
+
+class Died(BaseException):
+    """Escapes the writer's retry loop, so the background task dies with it"""
+
+
+def run(engine, scenario):
+    async def main():
+        await database.create_tables()
+        try:
+            await scenario()
+        finally:
+            await engine.dispose()
+    asyncio.run(main())
+
+
+@pytest.fixture
+def engine(monkeypatch, tmp_path):
+    monkeypatch.setenv("DATABASE_URL", f"sqlite:///{tmp_path / 'shieldai.db'}")
+    engine = database.get_database_engine()
+    monkeypatch.setattr(database, "engine", engine)
+    monkeypatch.setattr(persistence, "engine", engine)
+    return engine
+
+
+def writer(monkeypatch, queue_size=100, batch_size=50, enqueue_timeout_ms=100):
+    monkeypatch.setenv("RESULTS_QUEUE_SIZE", str(queue_size))
+    monkeypatch.setenv("RESULTS_ENQUEUE_TIMEOUT_MS", str(enqueue_timeout_ms))
+    writer = ResultWriter()
+    writer.enabled = True
+    writer.batch_size = batch_size
+    writer.flush_interval = 0.01
+    return writer
+
+
+def result(score):
+    return {"is_toxic": score > 0.5, "toxicity_score": score, "confidence": 0.9, "warning_level": "low",
+            "detected_issues": ["insult"] if score > 0.5 else [], "cultural_context": {"lang": "sw"},
+            "processing_time": 1.5}
+
+
+async def stored_rows(engine):
+    async with engine.connect() as conn:
+        return (await conn.execute(select(AnalysisResult).order_by(AnalysisResult.id))).all()
+
+
+def test_results_are_written_in_batches_and_drained_on_stop(monkeypatch, engine):
+    results = writer(monkeypatch, batch_size=3)
+
+    async def scenario():
+        await results.start()
+        assert results.running and results.backend == "sqlite"
+        texts = [f"text {i}" for i in range(7)]
+        assert await results.submit_many(texts, "twitter", [result(i / 10) for i in range(6)] + [None]) == 6
+        assert await results.submit("mbaya sana", "tiktok", result(0.9))
+        await results.stop()
+
+        rows = await stored_rows(engine)
+        assert [row.text for row in rows] == [f"text {i}" for i in range(6)] + ["mbaya sana"]
+        assert rows[-1].platform == "tiktok" and rows[-1].is_toxic
+        assert json.loads(rows[-1].detected_issues) == ["insult"]
+        assert json.loads(rows[-1].cultural_context) == {"lang": "sw"}
+        stats = results.stats()
+        assert stats["written"] == 7 and stats["dropped"] == 0
+        assert stats["batches"] >= 3 and stats["last_batch_size"] <= 3
+        # Nothing is taken once stopped
+        assert await results.submit("late", "twitter", result(0.1)) is False
+
+    run(engine, scenario)
+
+
+def test_a_full_queue_delays_a_batch_by_one_deadline_and_drops_the_rest(monkeypatch, engine):
+    results = writer(monkeypatch, queue_size=2, batch_size=1, enqueue_timeout_ms=50)
+    release = asyncio.Event()
+
+    async def scenario():
+        insert = results._insert
+
+        async def slow(rows):
+            await release.wait()
+            await insert(rows)
+        results._insert = slow
+
+        await results.start()
+        start = time.monotonic()
+        accepted = await results.submit_many([f"text {i}" for i in range(20)], "twitter", [result(0.1)] * 20)
+        elapsed = time.monotonic() - start
+
+        # One deadline for the whole batch, not one per row still waiting
+        assert elapsed < 0.5
+        assert 2 <= accepted <= 3
+        assert results.dropped == 20 - accepted and results.waited >= 1
+
+        release.set()
+        await results.stop()
+        async with engine.connect() as conn:
+            assert await conn.scalar(select(func.count()).select_from(AnalysisResult)) == accepted
+
+    run(engine, scenario)
+
+
+def test_stop_does_not_hang_on_a_dead_writer_with_a_full_queue(monkeypatch, engine):
+    results = writer(monkeypatch, queue_size=2, batch_size=1, enqueue_timeout_ms=200)
+
+    async def scenario():
+        insert = results._insert
+
+        async def die_once(rows):
+            results._insert = insert
+            raise Died()
+        results._insert = die_once
+
+        await results.start()
+        assert await results.submit_many(["first", "second", "third"], "twitter", [result(0.1)] * 3) == 3
+        await asyncio.sleep(0.05)
+        assert results._task.done() and results._queue.full()
+
+        # The stop marker can never be queued; stop() writes what's left itself
+        await asyncio.wait_for(results.stop(), timeout=2)
+        assert [row.text for row in await stored_rows(engine)] == ["second", "third"]
+
+    run(engine, scenario)
@@ -0,0 +1,121 @@
+import asyncio
+
+from app.core.redis import RedisManager
+from app.services.rate_limiter import RateLimiter
+
+
+def run(coro):
+    return asyncio.run(coro)
+
+
+def test_limits_hold_without_redis():
+    async def scenario():
+        limiter = RateLimiter()
+        limits = [(5, 60), (100, 3600)]
+        outcomes = [await limiter.check_limits("ip:1", limits) for _ in range(7)]
+        assert [limited for limited, _ in outcomes] == [False] * 5 + [True] * 2
+        limited, details = outcomes[-1]
+        assert details["window"] == 60 and details["remaining"] == 0
+        assert 11 <= details["retry_after"] <= 12
+
+        # Identifiers have separate buckets, and a rejection costs nothing
+        assert not (await limiter.check_limits("ip:2", limits, cost=5))[0]
+        assert limiter.stats()["fallback_checks"] == 8
+
+    run(scenario())
+
+
+def test_cost_larger_than_the_limit_is_rejected():
+    async def scenario():
+        limiter = RateLimiter()
+        limited, details = await limiter.check_limits("ip:1", [(5, 60)], cost=6)
+        assert limited
+        assert not (await limiter.check_limits("ip:1", [(5, 60)], cost=5))[0]
+
+    run(scenario())
+
+
+def leasing_limiter(monkeypatch, accuracy=0.1, lease_ttl=0.05):
+    """A limiter whose 'Redis' is another limiter's in-process GCRA, which mirrors GCRA_SCRIPT"""
+    monkeypatch.setattr(RedisManager, "is_connected", property(lambda self: True))
+    limiter, remote = RateLimiter(), RateLimiter()
+    limiter.accuracy = accuracy
+    limiter.lease_ttl = lease_ttl
+
+    async def gcra(identifier, limits, cost):
+        return remote._gcra_local(identifier, limits, cost)
+    limiter._gcra = gcra
+    return limiter, remote
+
+
+def remaining(remote, identifier, limits):
+    # A zero-cost check reports the bucket without spending from it
+    return remote._gcra_local(identifier, limits, 0)[1][0]["remaining"]
+
+
+def test_leases_serve_requests_locally(monkeypatch):
+    limiter, remote = leasing_limiter(monkeypatch, lease_ttl=60)
+    limits = [(100, 60)]
+
+    async def scenario():
+        for _ in range(12):
+            assert not (await limiter.check_limits("ip:1", limits))[0]
+        # First call has no lease, the second takes one of 10 tokens (100 * 0.1) with it
+        assert limiter.redis_calls == 2 and limiter.local_hits == 10
+        assert remaining(remote, "ip:1", limits) == 88
+        # The next lease is taken along with the request that found the last one empty
+        limited, details = await limiter.check_limits("ip:1", limits)
+        assert not limited and remaining(remote, "ip:1", limits) == 77
+        assert details["remaining"] == 77 + 10
+
+    run(scenario())
+
+
+def test_expired_lease_tokens_are_refunded(monkeypatch):
+    limiter, remote = leasing_limiter(monkeypatch)
+    limits = [(100, 60)]
+
+    async def scenario():
+        await limiter.check_limits("ip:1", limits)
+        await limiter.check_limits("ip:1", limits)
+        assert remaining(remote, "ip:1", limits) == 88
+
+        await asyncio.sleep(0.06)
+        # The next trip to Redis reconciles expired leases in the background
+        await limiter.check_limits("ip:2", limits)
+        await asyncio.sleep(0.01)
+        assert limiter.refunded_tokens == 10
+        assert remaining(remote, "ip:1", limits) == 98
+        assert limiter.stats()["active_leases"] == 1
+
+    run(scenario())
+
+
+def test_evicted_lease_tokens_are_refunded(monkeypatch):
+    limiter, remote = leasing_limiter(monkeypatch, lease_ttl=60)
+    limiter.max_leases = 1
+    limits = [(100, 60)]
+
+    async def scenario():
+        await limiter.check_limits("ip:1", limits)
+        await limiter.check_limits("ip:1", limits)
+        await limiter.check_limits("ip:2", limits)
+        await asyncio.sleep(0.01)
+        assert limiter.refunded_tokens == 10
+        assert remaining(remote, "ip:1", limits) == 98
+
+    run(scenario())
+
+
+def test_failed_refunds_are_not_counted(monkeypatch):
+    limiter, _ = leasing_limiter(monkeypatch)
+
+    async def unreachable(identifier, limits, cost):
+        raise ConnectionError("Connection refused")
+    limiter._gcra = unreachable
+
+    async def scenario():
+        await limiter._refund([(("ip:1", ((100, 60),)), 10)])
+        assert limiter.refunded_tokens == 0
+
+    run(scenario())
@@ -0,0 +1,332 @@
+import asyncio
+import time
+
+import pytest
+from redis.exceptions import ConnectionError as RedisConnectionError, ResponseError, WatchError
+
+from app.core.memory_backend import InMemoryRedis, MemoryStore
+from app.core.redis import CircuitBreaker, RedisManager
+
+
+def run(coro):
+    return asyncio.run(coro)
+
+
+class FlakyPipeline:
+    def __init__(self, owner, pipeline):
+        self._owner = owner
+        self._pipeline = pipeline
+
+    def __getattr__(self, name):
+        queue = getattr(self._pipeline, name)
+
+        def command(*args, **kwargs):
+            queue(*args, **kwargs)
+            return self
+        return command
+
+    async def execute(self, raise_on_error: bool = True):
+        self._owner.check()
+        return await self._pipeline.execute(raise_on_error=raise_on_error)
+
+
+class FlakyRedis:
+    """A 'remote' Redis backed by its own MemoryStore that can be taken down"""
+
+    def __init__(self, client: InMemoryRedis):
+        self.client = client
+        self.down = False
+        self.ping_delay = 0.0
+
+    def check(self):
+        if self.down:
+            raise RedisConnectionError("Connection refused")
+
+    async def ping(self):
+        await asyncio.sleep(self.ping_delay)
+        self.check()
+        return True
+
+    def pipeline(self, transaction: bool = True):
+        return FlakyPipeline(self, self.client.pipeline(transaction))
+
+    def __getattr__(self, name):
+        command = getattr(self.client, name)
+
+        async def call(*args, **kwargs):
+            self.check()
+            return await command(*args, **kwargs)
+        return call
+
+
+def make_manager():
+    remote = MemoryStore()
+    manager = RedisManager()
+    manager.breaker = CircuitBreaker(failure_threshold=2, recovery_timeout=0.05)
+    manager.redis_client = FlakyRedis(InMemoryRedis(remote, decode_responses=True, journal=False))
+    manager.raw_client = FlakyRedis(InMemoryRedis(remote, decode_responses=False, journal=False))
+    return manager, remote
+
+
+def set_down(manager, down: bool):
+    manager.redis_client.down = down
+    manager.raw_client.down = down
+
+
+# Circuit breaker
+
+def test_breaker_opens_after_threshold_and_lets_one_probe_through():
+    breaker = CircuitBreaker(failure_threshold=3, recovery_timeout=0.05)
+    assert not breaker.record_failure()
+    assert not breaker.record_failure()
+    assert breaker.record_failure()
+    assert breaker.state == CircuitBreaker.OPEN
+    assert not breaker.allow_request()
+
+    time.sleep(0.06)
+    assert breaker.allow_request()
+    assert breaker.state == CircuitBreaker.HALF_OPEN
+    assert not breaker.allow_request()
+
+    # A failed probe re-opens it for another timeout
+    assert breaker.record_failure()
+    assert breaker.state == CircuitBreaker.OPEN
+    time.sleep(0.06)
+    assert breaker.allow_request()
+    breaker.record_success()
+    assert breaker.state == CircuitBreaker.CLOSED
+    assert breaker.failures == 0
+
+
+# Fallback and reconcile
+
+def test_writes_fall_back_to_memory_while_redis_is_down():
+    async def scenario():
+        manager, remote = make_manager()
+        assert await manager.set("greeting", "hello")
+        assert remote.lookup("greeting") == b"hello"
+
+        set_down(manager, True)
+        for _ in range(5):
+            await manager.incr("analytics:total")
+        assert not manager.is_connected
+        assert manager.available
+        assert await manager.get("analytics:total") == 5
+        assert remote.lookup("analytics:total") is None
+        assert len(manager.memory_store.journal) == 5
+
+    run(scenario())
+
+
+def test_recovery_replays_the_journal_in_the_background():
+    async def scenario():
+        manager, remote = make_manager()
+        await manager.incr("analytics:total", 10)
+
+        set_down(manager, True)
+        for _ in range(3):
+            await manager.incr("analytics:total")
+        await manager.hset("analytics:platform", "twitter", 1)
+
+        set_down(manager, False)
+        manager.redis_client.ping_delay = 0.2
+        await asyncio.sleep(0.06)
+
+        # The call that triggers the probe is served from the fallback, without waiting for it
+        started = time.monotonic()
+        assert await manager.incr("analytics:total") == 4
+        assert time.monotonic() - started < 0.1
+        assert manager._recovery is not None
+        assert not manager.is_connected
+
+        await manager._recovery
+        assert manager.is_connected
+        assert int(remote.lookup("analytics:total")) == 14
+        assert remote.lookup("analytics:platform") == {"twitter": b"1"}
+        assert not manager.memory_store.data
+        assert not manager.memory_store.journal
+
+    run(scenario())
+
+
+def test_failed_probe_keeps_the_journal_and_reopens_the_breaker():
+    async def scenario():
+        manager, remote = make_manager()
+        set_down(manager, True)
+        for _ in range(3):
+            await manager.incr("counter")
+
+        await asyncio.sleep(0.06)
+        await manager.get("counter")
+        await manager._recovery
+        assert manager.breaker.state == CircuitBreaker.OPEN
+        assert len(manager.memory_store.journal) == 3
+
+        set_down(manager, False)
+        await asyncio.sleep(0.06)
+        await manager.get("counter")
+        await manager._recovery
+        assert manager.is_connected
+        assert int(remote.lookup("counter")) == 3
+
+    run(scenario())
+
+
+def test_late_success_does_not_close_an_open_breaker():
+    manager, _ = make_manager()
+    manager.breaker.trip()
+    manager._record_success()
+    assert manager.breaker.state == CircuitBreaker.OPEN
+
+
+# SCAN iteration
+
+def test_scan_iter_walks_every_matching_key_in_batches():
+    async def scenario():
+        manager, _ = make_manager()
+        for i in range(25):
+            await manager.set(f"cache:user:{i}", i)
+        await manager.set("analytics:total", 1)
+
+        seen, batches = set(), 0
+        async for batch in manager.scan_iter("cache:*", count=10):
+            batches += 1
+            assert len(batch) <= 10
+            seen.update(batch)
+            # Keys written during the walk don't make it lose the ones already there
+            await manager.set(f"cache:late:{batches}", 0)
+        assert {f"cache:user:{i}" for i in range(25)} <= seen
+        assert batches >= 3 and "analytics:total" not in seen
+
+    run(scenario())
+
+
+def test_unlinks_of_scanned_keys_are_replayed_after_an_outage():
+    async def scenario():
+        manager, remote = make_manager()
+        set_down(manager, True)
+        for i in range(3):
+            await manager.set(f"cache:user:{i}", i)
+        await manager.set("cache:other", 1)
+
+        # Batch-wise invalidation against the fallback, as CacheService.invalidate_pattern does it
+        async for keys in manager.scan_iter("cache:user:*", count=2):
+            pipeline = await manager.pipeline()
+            pipeline.unlink(*keys)
+            await pipeline.execute()
+        assert [key async for batch in manager.scan_iter("cache:*") for key in batch] == ["cache:other"]
+
+        set_down(manager, False)
+        await asyncio.sleep(0.06)
+        await manager.get("cache:other")
+        await manager._recovery
+        assert manager.is_connected
+        assert remote.lookup("cache:other") is not None and await manager.get("cache:other") == 1
+        assert all(remote.lookup(f"cache:user:{i}") is None for i in range(3))
+
+    run(scenario())
+
+
+# In-memory backend
+
+def test_watch_detects_writes_and_ignores_reads():
+    async def scenario():
+        client = InMemoryRedis(MemoryStore())
+        await client.hset("thread", mapping={"repeats": 1})
+
+        pipeline = client.pipeline()
+        await pipeline.watch("thread")
+        await pipeline.hgetall("thread")
+        pipeline.multi()
+        pipeline.hset("thread", mapping={"repeats": 2})
+        await pipeline.execute()
+
+        pipeline = client.pipeline()
+        await pipeline.watch("thread")
+        await client.hincrby("thread", "repeats", 1)
+        pipeline.multi()
+        pipeline.hset("thread", mapping={"repeats": 5})
+        with pytest.raises(WatchError):
+            await pipeline.execute()
+        assert await client.hget("thread", "repeats") == "3"
+
+    run(scenario())
+
+
+def test_versions_are_only_kept_for_watched_keys():
+    async def scenario():
+        store = MemoryStore()
+        client = InMemoryRedis(store)
+        for i in range(100):
+            await client.set(f"key:{i}", i)
+            await client.delete(f"key:{i}")
+        assert store.versions == {}
+
+        first, second = client.pipeline(), client.pipeline()
+        await first.watch("shared")
+        await second.watch("shared")
+        await first.reset()
+        assert "shared" in store.versions
+        await second.execute()
+        assert store.versions == {} and store.watchers == {}
+
+    run(scenario())
+
+
+def test_clear_invalidates_watches():
+    async def scenario():
+        store = MemoryStore()
+        client = InMemoryRedis(store)
+        await client.set("key", "value")
+        pipeline = client.pipeline()
+        await pipeline.watch("key")
+        store.clear()
+        pipeline.multi()
+        pipeline.set("key", "other")
+        with pytest.raises(WatchError):
+            await pipeline.execute()
+
+    run(scenario())
+
+
+def test_lru_bound_and_expiry():
+    async def scenario():
+        client = InMemoryRedis(MemoryStore(max_keys=3))
+        for i in range(5):
+            await client.set(f"key:{i}", i)
+        assert await client.get("key:0") is None
+        assert await client.get("key:4") == "4"
+
+        await client.set("short", "lived", px=10)
+        await asyncio.sleep(0.02)
+        assert await client.get("short") is None
+
+    run(scenario())
+
+
+def test_zadd_flags_follow_redis():
+    async def scenario():
+        client = InMemoryRedis(MemoryStore())
+        assert await client.zadd("z", {"a": 1, "b": 2}) == 2
+        assert await client.zadd("z", {"a": 5, "c": 3}, nx=True) == 1
+        assert await client.zadd("z", {"a": 7, "d": 4}, xx=True) == 0
+        assert await client.zrange("z", 0, -1, withscores=True) == [("b", 2.0), ("c", 3.0), ("a", 7.0)]
+
+        assert await client.zadd("z", {"a": 6, "b": 9}, gt=True, ch=True) == 1
+        assert await client.zadd("z", {"a": 1, "b": 10}, lt=True, ch=True) == 1
+        assert await client.zadd("z", {"e": 1}, gt=True) == 1
+
+        assert await client.zadd("z", {"a": 2}, incr=True) == 3.0
+        assert await client.zadd("z", {"a": 2}, incr=True, nx=True) is None
+        assert await client.zadd("z", {"new": 2}, incr=True, xx=True) is None
+        assert await client.zadd("missing", {"a": 1}, xx=True) == 0
+        assert await client.zcard("missing") == 0
+
+        with pytest.raises(ResponseError):
+            await client.zadd("z", {"a": 1}, nx=True, xx=True)
+        with pytest.raises(ResponseError):
+            await client.zadd("z", {"a": 1}, gt=True, lt=True)
+        with pytest.raises(ResponseError):
+            await client.zadd("z", {"a": 1, "b": 2}, incr=True)
+
+    run(scenario())
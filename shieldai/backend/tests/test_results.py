@@ -0,0 +1,57 @@
+import json
+
+import pytest
+
+from app.services.results import AnalysisRecord, NO_ISSUES, SAFE_CATEGORIES, encode_batch_response, encode_result
+
+
+class Float64(float):
+    """Stand-in for numpy.float64, whose repr on NumPy 2 is np.float64(...)"""
+
+    def __repr__(self):
+        return f"np.float64({float(self)})"
+
+
+class Int64:
+    """Stand-in for numpy.int64: not an int subclass, but usable as an index"""
+
+    def __init__(self, value):
+        self.value = value
+
+    def __index__(self):
+        return self.value
+
+
+def record(score=0.25, **overrides) -> AnalysisRecord:
+    result = AnalysisRecord(score, score > 0.5, SAFE_CATEGORIES, "none", 1.5, NO_ISSUES)
+    for field, value in overrides.items():
+        setattr(result, field, value)
+    return result
+
+
+def test_record_json_round_trips():
+    result = record(request_id="req_1", timestamp="2026-01-01T00:00:00", total_processing_time=0.01)
+    assert json.loads(result.to_json()) == json.loads(json.dumps(result.to_dict()))
+    assert json.loads(encode_result(result))["request_id"] == "req_1"
+
+
+def test_numpy_scalars_encode_as_plain_numbers():
+    result = record(score=Float64(0.5), batch_index=Int64(3))
+    decoded = json.loads(result.to_json())
+    assert decoded["toxicity_score"] == 0.5
+    assert decoded["batch_index"] == 3
+
+
+@pytest.mark.parametrize("value", [float("nan"), float("inf"), float("-inf")])
+def test_non_finite_numbers_are_refused(value):
+    with pytest.raises(ValueError):
+        record(score=value).to_json()
+
+
+def test_batch_response_is_valid_json_with_failures():
+    body = encode_batch_response([record(), None], ["fine", "x" * 150], 0.125, "2026-01-01T00:00:00")
+    decoded = json.loads(body)
+    assert decoded["batch_size"] == 2
+    assert decoded["results"][0]["batch_index"] == 0
+    assert decoded["results"][1]["error"] == "analysis_failed"
+    assert decoded["results"][1]["text"].endswith("...")
@@ -0,0 +1,42 @@
+import asyncio
+import json
+
+from app.services.rule_bundle import RuleBundleService
+
+
+def run(coro):
+    return asyncio.run(coro)
+
+
+RULES = [
+    (r"\b(idiot|stupid)\b", 0.6, "insult"),
+    (r"\b(kill|hurt)\b.*\b(you|them)\b", 0.9, "threat"),
+]
+
+
+def test_score_only_change_reaches_delta_clients():
+    async def scenario():
+        service = RuleBundleService(min_pattern_score=0.0)
+        old = await service.publish(RULES)
+        rescored = [(RULES[0][0], 0.75, "insult"), RULES[1]]
+        new = await service.publish(rescored)
+        assert new["version"] != old["version"]
+
+        delta = json.loads(service.payload(service.base_version(f'"{old["version"]}"')).body)
+        assert delta["type"] == "delta"
+        assert not delta["patterns_added"] and not delta["patterns_removed"]
+        [(pid, rule)] = delta["patterns_changed"].items()
+        assert rule["score"] == 0.75
+        assert old["patterns"][pid]["score"] == 0.6
+
+    run(scenario())
+
+
+def test_unknown_base_gets_the_full_bundle():
+    async def scenario():
+        service = RuleBundleService(min_pattern_score=0.0)
+        bundle = await service.publish(RULES)
+        full = json.loads(service.payload(service.base_version('"not-a-version"')).body)
+        assert full["type"] == "full" and full["version"] == bundle["version"]
+
+    run(scenario())
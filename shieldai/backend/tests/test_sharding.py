@@ -0,0 +1,93 @@
+import asyncio
+
+import pytest
+from redis.exceptions import ResponseError
+
+from app.core.memory_backend import InMemoryRedis, MemoryStore
+from app.core.redis import AutoPipeline, RedisManager
+from app.core.sharding import HashRing, ShardedClient
+
+
+def run(coro):
+    return asyncio.run(coro)
+
+
+def make_sharded(nodes: int = 3):
+    stores = [MemoryStore() for _ in range(nodes)]
+    ring = HashRing([f"redis-{i}:6379/0" for i in range(nodes)])
+    client = ShardedClient([InMemoryRedis(store, journal=False) for store in stores], ring)
+    return client, stores
+
+
+def keys_on_distinct_nodes(client, prefix: str, count: int = 2) -> list:
+    keys, nodes = [], set()
+    for i in range(1000):
+        key = f"{prefix}:{i}"
+        node = client.ring.node_for(key)
+        if node not in nodes:
+            nodes.add(node)
+            keys.append(key)
+            if len(keys) == count:
+                return keys
+    raise AssertionError("ring put every key on one node")
+
+
+def test_scan_iter_walks_every_shard_with_auto_pipelining():
+    async def scenario():
+        client, stores = make_sharded()
+        manager = RedisManager()
+        manager.redis_client = client
+        manager.raw_client = client
+        manager.breaker.record_success()
+        manager.auto_pipeline = AutoPipeline(lambda: manager.redis_client)
+
+        for i in range(60):
+            await manager.set(f"analytics:platform:p{i}", i)
+        assert all(store.data for store in stores)
+
+        found = set()
+        async for batch in manager.scan_iter("analytics:platform:*", count=7):
+            found.update(batch)
+        assert len(found) == 60
+        assert len(await manager.keys("analytics:platform:*")) == 60
+
+    run(scenario())
+
+
+def test_cross_node_multi_key_commands_are_refused():
+    async def scenario():
+        client, _ = make_sharded()
+        first, second = keys_on_distinct_nodes(client, "hll")
+        await client.pfadd(first, "a")
+        await client.pfadd(second, "b")
+        with pytest.raises(ResponseError, match="CROSSSLOT"):
+            await client.pfcount(first, second)
+        with pytest.raises(ResponseError, match="CROSSSLOT"):
+            await client.pfmerge("hll:merged", first, second)
+
+        # Keys sharing a hash tag stay on one node, so the same commands work
+        await client.pfadd("hll:{users}:2026-01-01", "a", "b")
+        await client.pfadd("hll:{users}:2026-01-02", "b", "c")
+        assert await client.pfcount("hll:{users}:2026-01-01", "hll:{users}:2026-01-02") == 3
+
+    run(scenario())
+
+
+def test_unroutable_command_fails_alone_in_a_pipeline():
+    async def scenario():
+        client, _ = make_sharded()
+        first, second = keys_on_distinct_nodes(client, "set")
+        pipeline = client.pipeline(transaction=False)
+        pipeline.set(first, "1")
+        pipeline.pfcount(first, second)
+        pipeline.get(first)
+        results = await pipeline.execute(raise_on_error=False)
+        assert results[0] is True and results[2] == "1"
+        assert isinstance(results[1], ResponseError)
+
+        pipeline = client.pipeline(transaction=False)
+        pipeline.scan(cursor=0)
+        with pytest.raises(ResponseError):
+            await pipeline.execute()
+
+    run(scenario())
@@ -0,0 +1,56 @@
+import asyncio
+import time
+
+from app.core.timeseries import Resolution, Rollups, group_points
+from app.services.analytics import AnalyticsService
+
+
+def run(coro):
+    return asyncio.run(coro)
+
+
+def test_resolution_choice_follows_range_and_retention():
+    rollups = Rollups("ts", [
+        Resolution("day", 86400, 365 * 86400),
+        Resolution("minute", 60, 24 * 3600),
+        Resolution("hour", 3600, 30 * 86400),
+    ], max_points=400)
+    now = 1_700_000_000
+    assert rollups.resolution_for(now - 3600, now, now).name == "minute"
+    # 48h is past the minute retention; 60 days is past the hour retention
+    assert rollups.resolution_for(now - 48 * 3600, now, now).name == "hour"
+    assert rollups.resolution_for(now - 60 * 86400, now, now).name == "day"
+
+
+def test_rollups_record_every_resolution_with_its_ttl(memory_redis):
+    async def scenario():
+        service = AnalyticsService()
+        now = time.time()
+        for offset, toxic in ((0, True), (0, False), (2 * 3600, False), (3 * 86400, True)):
+            service.rollups.record(service.aggregator, now - offset, {"total": 1, **({"toxic": 1} if toxic else {})})
+            service.aggregator.event()
+        await service.aggregator.flush()
+
+        for resolution in service.rollups.resolutions:
+            key = service.rollups.key(resolution, resolution.bucket(now))
+            assert 0 < await memory_redis.ttl(key) <= resolution.ttl
+
+        hour = await service.get_timeseries(window_hours=1)
+        assert hour["resolution"] == "minute"
+        assert (hour["total_requests"], hour["total_toxic"]) == (2, 1)
+
+        three_hours = await service.get_timeseries(window_hours=3, resolution="hour")
+        assert three_hours["total_requests"] == 3
+
+        daily = await service.get_daily_stats(7)
+        assert daily["total_requests"] == 4 and daily["total_toxic"] == 2
+
+    run(scenario())
+
+
+def test_group_points_sums_calendar_periods():
+    day = 86400
+    monday = 1_704_067_200  # 2024-01-01, a Monday (UTC)
+    points = [(monday + i * day, {"total": 1}) for i in range(9)]
+    assert group_points(points, "week") == {"2024-W01": {"total": 7}, "2024-W02": {"total": 2}}
+    assert group_points(points, "month") == {"2024-01": {"total": 9}}
@@ -0,0 +1,81 @@
+import asyncio
+import random
+from collections import Counter
+
+from app.core.sketches import CountMinSketch, TopK
+from app.services.analytics import AnalyticsAggregator
+from app.services.trending import TrendingTracker
+
+
+def run(coro):
+    return asyncio.run(coro)
+
+
+def test_count_min_never_undercounts():
+    rng = random.Random(3)
+    sketch = CountMinSketch(width=64, depth=4)
+    exact = Counter()
+    for _ in range(5000):
+        item = f"item-{int(rng.paretovariate(1.2))}"
+        sketch.add(item)
+        exact[item] += 1
+    for item, count in exact.items():
+        assert sketch.estimate(item) >= count
+    assert sketch.total == 5000
+
+
+def test_top_k_keeps_the_heavy_hitters():
+    rng = random.Random(5)
+    top = TopK(capacity=5, width=512, depth=4)
+    stream = [f"heavy-{i}" for i in range(3) for _ in range(300)] + [f"noise-{rng.randrange(500)}" for _ in range(2000)]
+    rng.shuffle(stream)
+    for item in stream:
+        top.add(item)
+    assert {item for item, _ in top.top(3)} == {"heavy-0", "heavy-1", "heavy-2"}
+    assert len(top.candidates) == 5
+
+
+def test_drain_sends_growth_only_and_workers_add_up(memory_redis):
+    async def scenario():
+        workers = []
+        for _ in range(2):
+            aggregator = AnalyticsAggregator(memory_redis)
+            workers.append((aggregator, TrendingTracker(aggregator, memory_redis)))
+
+        for aggregator, tracker in workers:
+            for _ in range(3):
+                tracker.record("twitter", ["insult"], ["rule-a"], None)
+                aggregator.event()
+            await aggregator.flush()
+            # Nothing new since the last drain: nothing is re-sent
+            tracker.record("twitter", ["insult"], [], None)
+            aggregator.event()
+            await aggregator.flush()
+
+        trending = await workers[0][1].get_trending("category", window_minutes=5)
+        assert trending["items"][0] == {"item": "insult", "count": 8, "previous": 0, "growth": 8.0}
+        per_platform = await workers[0][1].get_trending("rule", platform="twitter", window_minutes=5)
+        assert per_platform["items"][0]["count"] == 6
+        assert (await workers[0][1].get_trending("platform"))["items"][0]["item"] == "twitter"
+
+    run(scenario())
+
+
+def test_readmitted_candidate_is_not_counted_twice(memory_redis):
+    async def scenario():
+        aggregator = AnalyticsAggregator(memory_redis)
+        tracker = TrendingTracker(aggregator, memory_redis)
+        tracker.capacity = 1
+        tracker._sketches.clear()
+
+        for item, times in (("a", 3), ("b", 4), ("a", 2)):
+            for _ in range(times):
+                tracker.record("twitter", [], [], item)
+                aggregator.event()
+            await aggregator.flush()
+
+        counts = {entry["item"]: entry["count"] for entry in (await tracker.get_trending("text"))["items"]}
+        # The sketch never undercounts, and "a" is not re-sent in full after being re-admitted
+        assert counts["a"] == 5 and counts["b"] == 4
+
+    run(scenario())
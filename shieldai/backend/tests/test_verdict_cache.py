@@ -0,0 +1,78 @@
+import asyncio
+from datetime import datetime, timezone
+
+import pytest
+
+from app.core.redis import RedisManager
+from app.services.analytics import AnalyticsService
+from app.services.results import AnalysisRecord, NO_ISSUES, SAFE_CATEGORIES
+from app.services.verdict_cache import VerdictCache
+
+
+def run(coro):
+    return asyncio.run(coro)
+
+
+class CountingEngine:
+    rules_version = "v1"
+
+    def __init__(self):
+        self.analyzed = []
+
+    def _record(self, text: str) -> AnalysisRecord:
+        self.analyzed.append(text)
+        return AnalysisRecord(0.1, False, SAFE_CATEGORIES, "none", 250.0, NO_ISSUES)
+
+    async def analyze_optimized(self, text, platform, context=None):
+        return self._record(text)
+
+    async def batch_analyze(self, texts, platform, context=None):
+        return [self._record(text) for text in texts]
+
+
+@pytest.fixture
+def verdicts(monkeypatch):
+    # The verdict cache only runs against a live Redis; the in-memory backend stands in for it
+    monkeypatch.setattr(RedisManager, "is_connected", property(lambda self: True))
+    return VerdictCache(ttl=60)
+
+
+def test_single_and_batch_lookups_share_entries(verdicts):
+    async def scenario():
+        engine = CountingEngine()
+        first = await verdicts.analyze(engine, "hello", "twitter")
+        assert first.cached is None
+
+        results = await verdicts.batch_analyze(engine, ["hello", "world"], "twitter")
+        assert engine.analyzed == ["hello", "world"]
+        assert results[0].cached and results[1].cached is None
+
+        again = await verdicts.analyze(engine, "world", "twitter")
+        assert again.cached
+        assert engine.analyzed == ["hello", "world"]
+
+    run(scenario())
+
+
+def test_hits_report_lookup_time_and_skip_engine_latency(verdicts):
+    async def scenario():
+        engine = CountingEngine()
+        await verdicts.analyze(engine, "hello", "twitter")
+        hit = await verdicts.analyze(engine, "hello", "twitter")
+        assert hit.processing_time < 250.0
+        assert b'"cached":true' in hit.to_json()
+
+        analytics = AnalyticsService()
+        now = datetime.now(timezone.utc)
+        analytics._record(hit, "twitter", None, None, int(now.timestamp()), now)
+        await analytics.aggregator.flush()
+        assert (await analytics.get_latency("stage:engine"))["count"] == 0
+
+        analytics._record(engine._record("fresh"), "twitter", None, None, int(now.timestamp()), now)
+        await analytics.aggregator.flush()
+        latency = await analytics.get_latency("stage:engine")
+        assert latency["count"] == 1
+        assert 240 <= latency["max_ms"] <= 260
+
+    run(scenario())
+
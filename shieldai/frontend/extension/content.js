@@ -8,9 +8,61 @@ class ShieldAIKenya {
         this.isEnabled = true;
         this.protectedCount = 0;
         this.blockedCount = 0;
+        this.ruleBundle = null;
+        this.prescreenPatterns = [];
+        this.bundleReady = this.loadRuleBundle();
         this.init();
     }
 
+    async loadRuleBundle() {
+        // Cached bundle is revalidated with its version as ETag; the server answers
+        // 304, a small delta, or a full bundle when our version is too old
+        try {
+            const stored = await chrome.storage.local.get('shieldaiRuleBundle');
+            let bundle = stored.shieldaiRuleBundle || null;
+
+            const headers = bundle ? { 'If-None-Match': `"${bundle.version}"` } : {};
+            const response = await fetch(`${this.apiBase}/rules/bundle`, { headers });
+
+            if (response.status === 200) {
+                const update = await response.json();
+                bundle = update.type === 'delta' && bundle ? this.applyBundleDelta(bundle, update) : update;
+                await chrome.storage.local.set({ shieldaiRuleBundle: bundle });
+            } else if (response.status !== 304) {
+                throw new Error('Rule bundle response not ok');
+            }
+
+            this.setRuleBundle(bundle);
+        } catch (error) {
+            console.log('ShieldAI rule bundle unavailable, sending all content for analysis:', error);
+        }
+    }
+
+    applyBundleDelta(bundle, delta) {
+        const keywords = new Set(bundle.keywords);
+        delta.keywords_removed.forEach(keyword => keywords.delete(keyword));
+        delta.keywords_added.forEach(keyword => keywords.add(keyword));
+
+        const patterns = { ...bundle.patterns, ...delta.patterns_added, ...(delta.patterns_changed || {}) };
+        delta.patterns_removed.forEach(id => delete patterns[id]);
+
+        return { ...bundle, version: delta.version, created_at: delta.created_at, keywords: [...keywords], patterns };
+    }
+
+    setRuleBundle(bundle) {
+        if (!bundle) return;
+        this.ruleBundle = bundle;
+        this.prescreenPatterns = Object.values(bundle.patterns).map(rule => new RegExp(rule.pattern, rule.flags));
+    }
+
+    isCandidate(text) {
+        // Without a bundle we cannot prescreen, so everything goes to the server
+        if (!this.ruleBundle) return true;
+        const lower = text.toLowerCase();
+        return this.ruleBundle.keywords.some(keyword => lower.includes(keyword))
+            || this.prescreenPatterns.some(pattern => pattern.test(lower));
+    }
+
     init() {
         console.log('🛡️ ShieldAI Kenya Protection Activated');
         this.injectShieldBadge();
@@ -107,6 +159,14 @@ class ShieldAIKenya {
     async analyzeText(text, element) {
         if (!this.isEnabled || text.length < 5) return;
 
+        await this.bundleReady;
+        if (!this.isCandidate(text.substring(0, 1000))) {
+            // No prescreen rule can match - skip the round trip
+            this.protectedCount++;
+            this.markSafeContent(element);
+            return;
+        }
+
         try {
             const response = await fetch(`${this.apiBase}/analyze`, {
                 method: 'POST',